@@ -0,0 +1 @@
+# Briques réutilisables de l'assistant d'analyse de contrats d'assurance santé
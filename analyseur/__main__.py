@@ -0,0 +1,21 @@
+# Point d'entrée en ligne de commande : python -m analyseur <commande> ...
+import sys
+
+COMMANDES = {
+    "lot": "analyseur.lot",
+    "rapport": "analyseur.rapport",
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDES:
+        print("Usage : python -m analyseur {" + ",".join(COMMANDES) + "} [options]", file=sys.stderr)
+        return 2
+    import importlib
+
+    return importlib.import_module(COMMANDES[argv[0]]).main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+# --- Préparation de l'analyse IA : faits relevés par le petit modèle, ou contrat entier
+# (map-reduce s'il est trop long) quand le routage des modèles est désactivé ---
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .decoupage import decouper
+from .jetons import compter_jetons, compter_jetons_messages, contexte_modele, couper_jetons
+from .llm import budget_jetons, cache_reponses, cle_faits, completion
+from .prompts import (
+    messages_analyse, messages_analyse_faits, messages_condensation, messages_extraction, messages_faits,
+    messages_synthese
+)
+
+CONDENSATIONS_MAX = 3
+
+
+def _tient_dans_le_contexte(messages, model, jetons_reponse=None):
+    return compter_jetons_messages(messages, model) + (jetons_reponse or config.JETONS_REPONSE) <= contexte_modele(model)
+
+
+def _completions_paralleles(client, liste_messages, model, route, max_tokens=None, format_json=False):
+    max_tokens = max_tokens or config.JETONS_NOTES_MORCEAU
+
+    def appel(messages):
+        taille = compter_jetons_messages(messages, model) + max_tokens
+        with budget_jetons.reserver(taille):
+            return completion(client, messages, model, max_tokens=max_tokens, route=route, format_json=format_json)
+
+    with ThreadPoolExecutor(max_workers=config.LLM_CONCURRENCE) as executeur:
+        futures = [executeur.submit(contextvars.copy_context().run, appel, m) for m in liste_messages]
+        return [future.result() for future in futures]
+
+
+def extraire_notes(client, morceaux, model):
+    reponses = _completions_paralleles(client, [messages_extraction(m) for m in morceaux], model, "extraction")
+    return [
+        f"Pages {m['page_debut']}–{m['page_fin']} :\n{r.strip()}"
+        for m, r in zip(morceaux, reponses)
+        if r and r.strip().upper() != "RAS"
+    ]
+
+
+def condenser(client, notes, model):
+    # Regroupe les notes par paquets tenant dans un morceau puis fusionne chaque paquet
+    paquets, courant, jetons_courant = [], [], 0
+    for note in notes:
+        jetons = compter_jetons(note, model)
+        if courant and jetons_courant + jetons > config.MORCEAU_JETONS:
+            paquets.append("\n\n".join(courant))
+            courant, jetons_courant = [], 0
+        courant.append(note)
+        jetons_courant += jetons
+    if courant:
+        paquets.append("\n\n".join(courant))
+    return _completions_paralleles(client, [messages_condensation(p) for p in paquets], model, "condensation")
+
+
+def lire_faits(reponse):
+    # Réponse JSON du petit modèle ; une réponse illisible est gardée comme note
+    texte = (reponse or "").strip()
+    if texte.startswith("```"):
+        texte = texte.strip("`").removeprefix("json").strip()
+    try:
+        faits = json.loads(texte)
+    except ValueError:
+        faits = None
+    return faits if isinstance(faits, dict) else {"autres": [texte] if texte else []}
+
+
+def fusionner_faits(liste_faits):
+    # Faits des morceaux d'un contrat long : premier renseignement de chaque champ, listes réunies
+    faits = {"lamal": {}, "lca": [], "hospitalisation": {}, "autres": []}
+    for morceau in liste_faits:
+        for section in ("lamal", "hospitalisation"):
+            valeurs = morceau.get(section)
+            for cle, valeur in (valeurs.items() if isinstance(valeurs, dict) else ()):
+                if valeur not in (None, "", []) and faits[section].get(cle) in (None, ""):
+                    faits[section][cle] = valeur
+        for section in ("lca", "autres"):
+            valeurs = morceau.get(section)
+            for element in (valeurs if isinstance(valeurs, list) else ()):
+                if element and element not in faits[section]:
+                    faits[section].append(element)
+    return faits
+
+
+def extraire_faits(client, pages, model=None):
+    # Faits de couverture du contrat (dict), relevés par le petit modèle et mis en cache
+    # par texte : changer d'objectif ne refait que la rédaction
+    model = model or config.MODELE_FAITS
+    texte = "\n".join(pages)
+    cle = cle_faits(texte, model)
+    en_cache = cache_reponses.get(cle)
+    if en_cache is not None:
+        return en_cache
+    messages = messages_faits(texte)
+    if _tient_dans_le_contexte(messages, model, config.JETONS_FAITS):
+        reponses = [completion(client, messages, model, max_tokens=config.JETONS_FAITS, route="faits", format_json=True)]
+    else:
+        morceaux = decouper(pages, config.MORCEAU_FAITS_JETONS, model)
+        reponses = _completions_paralleles(
+            client, [messages_faits(m["texte"], m) for m in morceaux], model, "faits",
+            max_tokens=config.JETONS_FAITS, format_json=True
+        )
+    faits = fusionner_faits([lire_faits(r) for r in reponses])
+    cache_reponses.set(cle, faits)
+    return faits
+
+
+def preparer_messages(client, pages, objectif, travail, model, comparaison=""):
+    # Renvoie les messages de la requête finale (streamée) pour le grand modèle `model`.
+    # Avec un modèle de faits, il ne reçoit que les faits de couverture (JSON compact).
+    if config.MODELE_FAITS:
+        faits = json.dumps(extraire_faits(client, pages), ensure_ascii=False, separators=(",", ":"))
+        messages = messages_analyse_faits(faits, objectif, travail, comparaison)
+        if _tient_dans_le_contexte(messages, model):
+            return messages
+        place = contexte_modele(model) - config.JETONS_REPONSE - compter_jetons_messages(
+            messages_analyse_faits("", objectif, travail, comparaison), model
+        )
+        return messages_analyse_faits(couper_jetons(faits, max(place, 1), model)[0], objectif, travail, comparaison)
+    return messages_texte(client, pages, objectif, travail, model, comparaison)
+
+
+def messages_texte(client, pages, objectif, travail, model, comparaison=""):
+    # Texte du contrat entier ; pour un contrat trop long pour la fenêtre du modèle,
+    # les morceaux sont d'abord résumés en parallèle.
+    messages = messages_analyse("\n".join(pages), objectif, travail, comparaison)
+    if _tient_dans_le_contexte(messages, model):
+        return messages
+
+    notes = extraire_notes(client, decouper(pages, config.MORCEAU_JETONS, model), model)
+    for _ in range(CONDENSATIONS_MAX):
+        messages = messages_synthese("\n\n".join(notes), objectif, travail, comparaison)
+        if _tient_dans_le_contexte(messages, model) or len(notes) <= 1:
+            break
+        notes = condenser(client, notes, model)
+
+    if not _tient_dans_le_contexte(messages, model):
+        # Dernier recours : on coupe les notes à la place restante
+        place = contexte_modele(model) - config.JETONS_REPONSE - compter_jetons_messages(
+            messages_synthese("", objectif, travail, comparaison), model
+        )
+        notes_tronquees = couper_jetons("\n\n".join(notes), max(place, 1), model)[0]
+        messages = messages_synthese(notes_tronquees, objectif, travail, comparaison)
+    return messages
@@ -0,0 +1,463 @@
+# --- Base interne des prestations LCA par produit, compilée en tableaux pour la comparaison ---
+import math
+import re
+
+import numpy as np
+
+from .mots_cles import normaliser
+
+# --- Données LCA structurées pour enrichir l'analyse IA ---
+base_lca_prestations = {
+    "Global Niveau 1": {
+        "lunettes": None,
+        "etranger": "100000 CHF/an (MUNDO)",
+        "checkup": None,
+        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
+        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
+        "transport_sauvetage": "60% jusqu’à 1000 CHF",
+        "hospitalisation": "Chambre commune",
+        "medicaments": "70% jusqu’à 800 CHF (hors-liste)",
+        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Global Niveau 2": {
+        "lunettes": None,
+        "etranger": "100000 CHF/an (MUNDO)",
+        "checkup": None,
+        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
+        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
+        "transport_sauvetage": "80% jusqu’à 1000 CHF",
+        "hospitalisation": "Chambre commune",
+        "medicaments": "90% jusqu’à 800 CHF (hors-liste)",
+        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Global Niveau 3": {
+        "lunettes": None,
+        "etranger": "100000 CHF/an (MUNDO)",
+        "checkup": None,
+        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
+        "medecine_alternative": "70 CHF/séance, max 3000 CHF/an",
+        "transport_sauvetage": "80% jusqu’à 2500 CHF",
+        "hospitalisation": "Mi-privée",
+        "medicaments": "90% illimité (hors-liste)",
+        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Global Niveau 4": {
+        "lunettes": None,
+        "etranger": "100000 CHF/an (MUNDO)",
+        "checkup": None,
+        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
+        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
+        "transport_sauvetage": "80% jusqu’à 5000 CHF",
+        "hospitalisation": "Privée",
+        "medicaments": "90% illimité (hors-liste)",
+        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
+        "dentaire": None,
+        "orthodontie": None
+    }
+}
+base_lca_prestations.update({
+    "Global Mi-Privé": {
+        "lunettes": None,
+        "etranger": "100000 CHF/an (MUNDO)",
+        "checkup": "90% illimité",
+        "promotion_sante": "30 CHF/an",
+        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
+        "transport_sauvetage": "80% jusqu’à 5000 CHF",
+        "hospitalisation": "Mi-privée (90%)",
+        "medicaments": "90% illimité",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Global Privé": {
+        "lunettes": None,
+        "etranger": "100000 CHF/an (MUNDO)",
+        "checkup": "100% illimité",
+        "promotion_sante": "30 CHF/an",
+        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
+        "transport_sauvetage": "80% jusqu’à 5000 CHF",
+        "hospitalisation": "Privée (90%)",
+        "medicaments": "90% illimité",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Global Classic Plus": {
+        "lunettes": "150 CHF/3 ans",
+        "etranger": None,
+        "checkup": "90% tous les 3 ans",
+        "promotion_sante": "50% jusqu’à 200 CHF",
+        "medecine_alternative": "80% jusqu’à 10000 CHF",
+        "transport_sauvetage": "5000 CHF/an",
+        "hospitalisation": "Commune Suisse",
+        "medicaments": "90% illimité",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    }
+})
+base_lca_prestations.update({
+    "Helsana Top": {
+        "lunettes": "90% jusqu’à 150 CHF/an",
+        "etranger": "100000 CHF",
+        "checkup": "100% max 8 semaines/an",
+        "promotion_sante": None,
+        "medecine_alternative": "75% jusqu’à 5000 CHF (avec prescription)",
+        "transport_sauvetage": None,
+        "hospitalisation": "90% jusqu’à 1000 CHF",
+        "medicaments": "75% jusqu’à 10000 CHF",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Completa": {
+        "lunettes": None,
+        "etranger": None,
+        "checkup": "90% jusqu’à 300 CHF/an",
+        "promotion_sante": "100% illimité",
+        "medecine_alternative": "75% jusqu’à 5000 CHF (avec prescription)",
+        "transport_sauvetage": "100000 CHF",
+        "hospitalisation": "90% jusqu’à 1000 CHF",
+        "medicaments": "90% jusqu’à 1500 CHF",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Completa Extra": {
+        "lunettes": None,
+        "etranger": None,
+        "checkup": None,
+        "promotion_sante": None,
+        "medecine_alternative": "90% jusqu’à 1000 CHF (surplus)",
+        "transport_sauvetage": "100% transport, 20000 CHF sauvetage",
+        "hospitalisation": "50% jusqu’à 300 CHF/an",
+        "medicaments": "90% jusqu’à 500 CHF (surplus)",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    }
+})
+base_lca_prestations.update({
+    "Medna": {
+        "lunettes": None,
+        "etranger": None,
+        "checkup": None,
+        "promotion_sante": None,
+        "medecine_alternative": "80 CHF/séance, illimité, franchise 200 CHF",
+        "transport_sauvetage": None,
+        "hospitalisation": None,
+        "medicaments": "80% jusqu’à 2000 CHF (Swissmedic)",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Visana": {
+        "lunettes": None,
+        "etranger": None,
+        "checkup": "90% jusqu’à 200 CHF/an enfants, 300 CHF/3 ans adultes",
+        "promotion_sante": "100% max 8 semaines/an",
+        "medecine_alternative": None,
+        "transport_sauvetage": "90% jusqu’à 4000 CHF",
+        "hospitalisation": "90% jusqu’à 20000 CHF",
+        "medicaments": "90% jusqu’à 1000 CHF",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Diversa": {
+        "lunettes": None,
+        "etranger": None,
+        "checkup": None,
+        "promotion_sante": None,
+        "medecine_alternative": None,
+        "transport_sauvetage": "Illimité transport, 20000 CHF sauvetage",
+        "hospitalisation": {
+            "Care": "15000 CHF",
+            "Plus": "20000 CHF",
+            "Premium": "25000 CHF",
+            "Diversa": "10000 CHF"
+        },
+        "medicaments": None,
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    }
+})
+base_lca_prestations.update({
+    "Natura": {
+        "lunettes": None,
+        "etranger": None,
+        "checkup": None,
+        "promotion_sante": "90% jusqu’à 500 CHF/an, 50%/200 CHF/sport (max 500 CHF)",
+        "medecine_alternative": {
+            "Natura": "75% jusqu’à 4000 CHF/an",
+            "Natura Plus": "75% jusqu’à 6000 CHF/an"
+        },
+        "transport_sauvetage": None,
+        "hospitalisation": None,
+        "medicaments": None,
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Santé Vital": {
+        "lunettes": None,
+        "etranger": None,
+        "checkup": "100% jusqu’à 300 CHF/3 ans",
+        "promotion_sante": "100% illimité",
+        "medecine_alternative": "80% jusqu’à 500 CHF",
+        "transport_sauvetage": None,
+        "hospitalisation": "100% illimité / 90% illimité / 50% jusqu’à 10000 CHF avant 20 ans",
+        "medicaments": None,
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Sympany Plus": {
+        "lunettes": "270 CHF <18 ans, 300 CHF/an adultes",
+        "etranger": None,
+        "checkup": "100% illimité",
+        "promotion_sante": "50% jusqu’à 3000 CHF / 6000 CHF avec Natura",
+        "medecine_alternative": None,
+        "transport_sauvetage": "100% illimité",
+        "hospitalisation": None,
+        "medicaments": None,
+        "moyens_auxiliaires": "50%/250 CHF pour contrôle, 90% dents de sagesse",
+        "dentaire": "70% jusqu’à 10000 CHF jusqu’à 25 ans",
+        "orthodontie": None
+    },
+    "Sympany Premium": {
+        "lunettes": "420 CHF <18 ans, 600 CHF/an adultes",
+        "etranger": None,
+        "checkup": "100% jusqu’à 600 CHF/3 ans",
+        "promotion_sante": "80% jusqu’à 1500 CHF",
+        "medecine_alternative": "400 CHF/sport jusqu’à 800 CHF",
+        "transport_sauvetage": None,
+        "hospitalisation": "70% jusqu’à 15000 CHF jusqu’à 25 ans",
+        "medicaments": None,
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    },
+    "Assura Completa Extra": {
+        "lunettes": None,
+        "etranger": "100 CHF/an, cumulable jusqu’à 500 CHF",
+        "checkup": None,
+        "promotion_sante": None,
+        "medecine_alternative": "100% transport, 20000 CHF sauvetage",
+        "transport_sauvetage": None,
+        "hospitalisation": "Division commune en Suisse, plafond 50000 CHF total",
+        "medicaments": "1000 CHF/an avec franchise 500 CHF",
+        "moyens_auxiliaires": None,
+        "dentaire": None,
+        "orthodontie": None
+    }
+})
+
+
+# --- Index compilé de la base : un tableau par caractéristique (produit × prestation) ---
+
+PRESTATIONS_BASE = [
+    "lunettes", "etranger", "checkup", "promotion_sante", "medecine_alternative",
+    "transport_sauvetage", "hospitalisation", "medicaments", "moyens_auxiliaires",
+    "dentaire", "orthodontie"
+]
+
+# Mots-clés (cf. mots_cles.py) qui signalent chaque prestation dans un contrat
+MOTS_PAR_PRESTATION = {
+    "lunettes": ["lunettes", "optique"],
+    "etranger": ["étranger"],
+    "checkup": ["check-up", "bilan santé"],
+    "promotion_sante": ["promotion de la santé", "fitness"],
+    "medecine_alternative": ["médecine alternative", "médecines douces"],
+    "transport_sauvetage": ["ambulance", "transport", "sauvetage"],
+    "hospitalisation": ["hospitalisation", "chambre", "privée", "mi-privée"],
+    "medicaments": ["médicaments"],
+    "moyens_auxiliaires": ["moyens auxiliaires"],
+    "dentaire": ["dentaire"],
+    "orthodontie": ["orthodontie"],
+}
+
+LIBELLES_PRESTATIONS = {
+    "lunettes": "lunettes",
+    "etranger": "couverture à l’étranger",
+    "checkup": "check-up",
+    "promotion_sante": "promotion de la santé",
+    "medecine_alternative": "médecine alternative",
+    "transport_sauvetage": "transport et sauvetage",
+    "hospitalisation": "hospitalisation",
+    "medicaments": "médicaments hors liste",
+    "moyens_auxiliaires": "moyens auxiliaires",
+    "dentaire": "dentaire",
+    "orthodontie": "orthodontie",
+}
+
+# Division hospitalière : 1 commune, 2 mi-privée, 3 privée (0 = non précisée)
+DIVISIONS = [("mi-priv", 2), ("semi-priv", 2), ("priv", 3), ("commune", 1)]
+
+_NOMBRE = r"(\d[\d'’ ]*\d|\d)"
+_TAUX = re.compile(r"(\d{1,3})\s*%")
+_PLAFOND = re.compile(r"(?:jusqu.{1,2}a|max(?:imum)?|plafond)\s*" + _NOMBRE + r"\s*chf")
+_MONTANT = re.compile(_NOMBRE + r"\s*chf")
+_PERIODE = re.compile(r"(?:/|par |tous les )\s*(\d+)?\s*ans?\b")
+
+
+def _nombre(texte):
+    return float(re.sub(r"[^\d]", "", texte))
+
+
+def analyser_valeur(valeur):
+    # « 80% jusqu’à 5000 CHF/an » -> (taux 0.8, plafond 5000, période 1 an, division 0).
+    # Valeurs absentes : nan ; « illimité » : plafond infini.
+    texte = normaliser(valeur)
+    taux = _TAUX.search(texte)
+    taux = int(taux.group(1)) / 100 if taux else math.nan
+
+    plafond = _PLAFOND.search(texte)
+    if plafond:
+        plafond = _nombre(plafond.group(1))
+    elif "illimite" in texte:
+        plafond = math.inf
+    else:
+        montants = [_nombre(m) for m in _MONTANT.findall(texte)]
+        plafond = max(montants) if montants else math.nan
+
+    periode = _PERIODE.search(texte)
+    periode = float(periode.group(1) or 1) if periode else math.nan
+
+    division = next((niveau for mot, niveau in DIVISIONS if mot in texte), 0)
+    return taux, plafond, periode, division
+
+
+def _aplatir(base):
+    # Les valeurs imbriquées (variantes d'un même produit) deviennent des produits distincts
+    for produit, prestations in base.items():
+        variantes = {v for valeur in prestations.values() if isinstance(valeur, dict) for v in valeur}
+        if not variantes:
+            yield produit, prestations
+            continue
+        for variante in sorted(variantes):
+            nom = variante if variante.startswith(produit) else f"{produit} {variante}"
+            yield nom, {
+                cle: (valeur.get(variante) if isinstance(valeur, dict) else valeur)
+                for cle, valeur in prestations.items()
+            }
+
+
+class IndexLCA:
+    def __init__(self, base):
+        produits = list(_aplatir(base))
+        self.produits = [nom for nom, _ in produits]
+        self.prestations = PRESTATIONS_BASE
+        forme = (len(self.produits), len(self.prestations))
+        self.couvert = np.zeros(forme, dtype=bool)
+        self.taux = np.full(forme, np.nan, dtype=np.float32)
+        self.plafond = np.full(forme, np.nan, dtype=np.float32)
+        self.periode = np.full(forme, np.nan, dtype=np.float32)
+        self.division = np.zeros(len(self.produits), dtype=np.int8)
+        for i, (_, prestations) in enumerate(produits):
+            for j, prestation in enumerate(self.prestations):
+                valeur = prestations.get(prestation)
+                if not valeur:
+                    continue
+                self.couvert[i, j] = True
+                self.taux[i, j], self.plafond[i, j], self.periode[i, j], division = analyser_valeur(valeur)
+                if prestation == "hospitalisation":
+                    self.division[i] = division
+
+    def proches(self, contrat, n=3):
+        # Distance de chaque produit au contrat, calculée pour tous les produits à la fois :
+        # 1 par prestation couverte d'un côté seulement, puis pour les prestations
+        # couvertes des deux côtés l'écart de taux (0-1) et l'écart d'ordre de grandeur
+        # du plafond, et enfin l'écart de division hospitalière.
+        present = contrat["couvert"][None, :]
+        distance = (self.couvert != present).sum(axis=1).astype(np.float32)
+
+        communs = self.couvert & present
+        ecart_taux = np.abs(self.taux - contrat["taux"][None, :])
+        distance += np.where(communs & ~np.isnan(ecart_taux), ecart_taux, 0).sum(axis=1)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            log_produit = np.log10(np.where(np.isinf(self.plafond), 1e7, self.plafond))
+            log_contrat = np.log10(np.where(np.isinf(contrat["plafond"]), 1e7, contrat["plafond"]))[None, :]
+            ecart_plafond = np.minimum(np.abs(log_produit - log_contrat) / 2, 1)
+        distance += np.where(communs & ~np.isnan(ecart_plafond), ecart_plafond, 0).sum(axis=1)
+
+        if contrat["division"]:
+            connue = self.division > 0
+            distance += np.where(connue, np.abs(self.division - contrat["division"]) / 2, 0)
+
+        ordre = np.argsort(distance, kind="stable")[:n]
+        return [(self.produits[i], float(distance[i])) for i in ordre]
+
+    def ecarts(self, produit, contrat):
+        # Prestations du produit absentes du contrat, et inversement
+        i = self.produits.index(produit)
+        manquantes = [p for j, p in enumerate(self.prestations) if self.couvert[i, j] and not contrat["couvert"][j]]
+        en_plus = [p for j, p in enumerate(self.prestations) if contrat["couvert"][j] and not self.couvert[i, j]]
+        return manquantes, en_plus
+
+
+index_lca = IndexLCA(base_lca_prestations)
+
+FENETRE_VALEUR = 120
+
+
+def profil_contrat(texte, occurrences):
+    # Vecteur de couverture du contrat, dans le même format qu'une ligne de l'index :
+    # présence d'après les mots-clés, taux/plafond lus juste après la première mention
+    texte = normaliser(texte)
+    k = len(PRESTATIONS_BASE)
+    profil = {
+        "couvert": np.zeros(k, dtype=bool),
+        "taux": np.full(k, np.nan, dtype=np.float32),
+        "plafond": np.full(k, np.nan, dtype=np.float32),
+        "division": 0,
+    }
+    for j, prestation in enumerate(PRESTATIONS_BASE):
+        positions = [p for mot in MOTS_PAR_PRESTATION[prestation] for p in occurrences.get(mot, [])]
+        if not positions:
+            continue
+        profil["couvert"][j] = True
+        debut = min(positions)
+        taux, plafond, _, _ = analyser_valeur(texte[debut:debut + FENETRE_VALEUR])
+        profil["taux"][j], profil["plafond"][j] = taux, plafond
+    if occurrences.get("mi-privée"):
+        profil["division"] = 2
+    elif occurrences.get("privée"):
+        profil["division"] = 3
+    elif "hospitalisation" in occurrences or "chambre" in occurrences:
+        profil["division"] = 1 if re.search(r"\b(?:division |chambre )commune", texte) else 0
+    return profil
+
+
+def comparer_contrat(texte, occurrences):
+    # Niveau standard le plus proche et différences de prestations, en texte court
+    # (affiché dans le résumé et transmis au modèle)
+    profil = profil_contrat(texte, occurrences)
+    (produit, distance), *autres = index_lca.proches(profil)
+    manquantes, en_plus = index_lca.ecarts(produit, profil)
+    return {
+        "produit": produit,
+        "distance": distance,
+        "alternatives": [nom for nom, _ in autres],
+        "manquantes": [LIBELLES_PRESTATIONS[p] for p in manquantes],
+        "en_plus": [LIBELLES_PRESTATIONS[p] for p in en_plus],
+    }
+
+
+def decrire_comparaison(comparaison):
+    lignes = [f"Niveau standard le plus proche dans la base interne : {comparaison['produit']}"]
+    if comparaison["manquantes"]:
+        lignes.append("Prestations de ce niveau absentes du contrat : " + ", ".join(comparaison["manquantes"]))
+    if comparaison["en_plus"]:
+        lignes.append("Prestations du contrat absentes de ce niveau : " + ", ".join(comparaison["en_plus"]))
+    if comparaison["alternatives"]:
+        lignes.append("Autres niveaux proches : " + ", ".join(comparaison["alternatives"]))
+    return "\n".join(lignes)
@@ -0,0 +1,179 @@
+# --- Cache à deux niveaux : LRU en mémoire + répertoire sur disque borné en taille ---
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def empreinte(*parties):
+    # Hash stable d'une suite de morceaux (bytes, texte ou objets JSON)
+    h = hashlib.sha256()
+    for partie in parties:
+        if isinstance(partie, (bytes, bytearray, memoryview)):
+            h.update(partie)
+        elif isinstance(partie, str):
+            h.update(partie.encode("utf-8"))
+        else:
+            h.update(json.dumps(partie, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class CacheLRU:
+    def __init__(self, capacite, ttl=None):
+        self.capacite = capacite
+        self.ttl = ttl
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def get(self, cle):
+        with self._verrou:
+            if cle not in self._entrees:
+                return None
+            cree, valeur = self._entrees[cle]
+            if self.ttl is not None and time.time() - cree > self.ttl:
+                del self._entrees[cle]
+                return None
+            self._entrees.move_to_end(cle)
+            return valeur
+
+    def set(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = (time.time(), valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.capacite:
+                self._entrees.popitem(last=False)
+
+
+class CacheDisque:
+    # Un fichier JSON par clé ; écriture atomique (tmp + os.replace) pour que
+    # plusieurs workers Streamlit puissent partager le même répertoire.
+    # L'éviction supprime les fichiers les moins récemment lus (mtime) une fois
+    # la taille maximale dépassée ; les entrées plus vieilles que `ttl` secondes
+    # (date d'écriture) sont ignorées puis supprimées.
+    RESCAN_TOUTES_LES = 50
+
+    def __init__(self, repertoire, taille_max, ttl=None):
+        self.repertoire = repertoire
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._verrou = threading.Lock()
+        self._taille_estimee = None
+        self._ecritures = 0
+
+    def _chemin(self, cle):
+        return os.path.join(self.repertoire, cle[:2], cle + ".json")
+
+    def get(self, cle):
+        chemin = self._chemin(cle)
+        try:
+            with open(chemin, encoding="utf-8") as f:
+                entree = json.load(f)
+            cree, valeur = entree["cree"], entree["valeur"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if self.ttl is not None and time.time() - cree > self.ttl:
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(chemin)
+        except OSError:
+            pass
+        return valeur
+
+    def set(self, cle, valeur):
+        chemin = self._chemin(cle)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(chemin), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"cree": time.time(), "valeur": valeur}, f, ensure_ascii=False)
+            taille = os.path.getsize(tmp)
+            os.replace(tmp, chemin)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        with self._verrou:
+            self._ecritures += 1
+            if self._taille_estimee is None or self._ecritures % self.RESCAN_TOUTES_LES == 0:
+                self._taille_estimee = self._taille_totale()
+            else:
+                self._taille_estimee += taille
+            if self._taille_estimee > self.taille_max:
+                self._evincer()
+
+    def _fichiers(self):
+        for racine, _, noms in os.walk(self.repertoire):
+            for nom in noms:
+                if nom.endswith(".json"):
+                    chemin = os.path.join(racine, nom)
+                    try:
+                        stat = os.stat(chemin)
+                    except OSError:
+                        continue
+                    yield chemin, stat.st_size, stat.st_mtime
+
+    def _taille_totale(self):
+        return sum(taille for _, taille, _ in self._fichiers())
+
+    def _evincer(self):
+        # On redescend à 90 % de la limite pour ne pas évincer à chaque écriture
+        fichiers = sorted(self._fichiers(), key=lambda f: f[2])
+        total = sum(taille for _, taille, _ in fichiers)
+        cible = int(self.taille_max * 0.9)
+        for chemin, taille, _ in fichiers:
+            if total <= cible:
+                break
+            try:
+                os.remove(chemin)
+                total -= taille
+            except OSError:
+                pass
+        self._taille_estimee = total
+
+
+class CacheDeuxNiveaux:
+    def __init__(self, memoire, disque):
+        self.memoire = memoire
+        self.disque = disque
+        self._verrou = threading.Lock()
+        self._compteurs = {"memoire": 0, "disque": 0, "absent": 0}
+
+    def _compter(self, niveau):
+        with self._verrou:
+            self._compteurs[niveau] += 1
+
+    def statistiques(self):
+        with self._verrou:
+            stats = dict(self._compteurs)
+        stats["succes"] = stats["memoire"] + stats["disque"]
+        return stats
+
+    def get(self, cle):
+        valeur = self.memoire.get(cle)
+        if valeur is not None:
+            self._compter("memoire")
+            return valeur
+        valeur = self.disque.get(cle)
+        if valeur is not None:
+            self._compter("disque")
+            self.memoire.set(cle, valeur)
+        else:
+            self._compter("absent")
+        return valeur
+
+    def set(self, cle, valeur):
+        self.memoire.set(cle, valeur)
+        try:
+            self.disque.set(cle, valeur)
+        except OSError:
+            # Disque plein ou en lecture seule : le niveau mémoire suffit
+            pass
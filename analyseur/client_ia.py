@@ -0,0 +1,26 @@
+# --- Client OpenAI avec pool de connexions HTTP keep-alive, à partager dans tout le processus ---
+from . import config
+
+
+def creer_client(api_key=None):
+    # À créer une fois par processus (st.cache_resource côté app) : les connexions TLS
+    # vers l'API restent ouvertes d'un rerun, d'une session et d'un appel à l'autre.
+    # Les retries sont faits par llm (backoff, Retry-After) : pas de second niveau ici.
+    import httpx
+    from openai import DefaultHttpxClient, OpenAI
+
+    http = DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=config.LLM_CONNEXIONS,
+            max_keepalive_connections=config.LLM_CONNEXIONS,
+            keepalive_expiry=config.LLM_KEEPALIVE
+        ),
+        timeout=httpx.Timeout(config.LLM_TIMEOUT, connect=10.0)
+    )
+    return OpenAI(
+        api_key=api_key or config.secret("openai_api_key"),
+        # OPENAI_BASE_URL (ou openai_base_url dans les secrets) : proxy, serveur de test
+        base_url=config.secret("openai_base_url") or None,
+        http_client=http,
+        max_retries=0
+    )
@@ -0,0 +1,127 @@
+# --- Configuration centrale (surchargeable par variables d'environnement) ---
+import os
+
+
+def _env_int(nom, defaut):
+    valeur = os.environ.get(nom)
+    return int(valeur) if valeur else defaut
+
+
+def secret(nom, defaut=None):
+    # Hors Streamlit (mode lot, scripts) : variable d'environnement en majuscules
+    # (ex. OPENAI_API_KEY), sinon .streamlit/secrets.toml du répertoire courant
+    valeur = os.environ.get(nom.upper())
+    if valeur:
+        return valeur
+    import tomllib
+
+    try:
+        with open(os.path.join(".streamlit", "secrets.toml"), "rb") as f:
+            return tomllib.load(f).get(nom, defaut)
+    except (OSError, tomllib.TOMLDecodeError):
+        return defaut
+
+
+# Paramètres OCR (font partie de la clé du cache d'extraction)
+OCR_CONFIG = '--oem 3 --psm 6'
+OCR_LANGUE = 'fra+eng'
+# Nombre de processus Tesseract en parallèle (par défaut : un par cœur)
+OCR_WORKERS = _env_int("ANALYSEUR_OCR_WORKERS", os.cpu_count() or 1)
+# Pages PDF scannées : en dessous de ce nombre de caractères visibles, la page
+# est rastérisée à OCR_DPI puis passée à Tesseract
+OCR_SEUIL_CARACTERES = _env_int("ANALYSEUR_OCR_SEUIL_CARACTERES", 25)
+OCR_DPI = _env_int("ANALYSEUR_OCR_DPI", 300)
+# Préparation des images avant OCR (niveaux de gris, réduction à OCR_DPI_CIBLE,
+# binarisation, redressement, recadrage) et second essai en segmentation automatique
+# (--psm OCR_PSM_REPLI) quand la confiance moyenne de Tesseract reste sous OCR_CONFIANCE_MIN
+OCR_PRETRAITEMENT = os.environ.get("ANALYSEUR_OCR_PRETRAITEMENT", "1") != "0"
+OCR_DPI_CIBLE = _env_int("ANALYSEUR_OCR_DPI_CIBLE", 300)
+OCR_CONFIANCE_MIN = _env_int("ANALYSEUR_OCR_CONFIANCE_MIN", 60)
+OCR_PSM_REPLI = _env_int("ANALYSEUR_OCR_PSM_REPLI", 3)
+# Images soumises au pool OCR à la fois (les pages scannées sont rendues au fur et à
+# mesure : la mémoire dépend de ce nombre, pas de la taille du document)
+OCR_EN_VOL = _env_int("ANALYSEUR_OCR_EN_VOL", 2 * OCR_WORKERS)
+
+# Retrait des en-têtes, pieds de page et clauses répétées avant détection et prompt ("0" : désactivé)
+NETTOYAGE = os.environ.get("ANALYSEUR_NETTOYAGE", "1") != "0"
+
+# Limites par fichier téléversé, vérifiées avant toute extraction
+EXTRACTION_PAGES_MAX = _env_int("ANALYSEUR_EXTRACTION_PAGES_MAX", 300)
+EXTRACTION_OCTETS_MAX = _env_int("ANALYSEUR_EXTRACTION_OCTETS_MAX", 50 * 1024 * 1024)
+
+# Cache d'extraction : un niveau mémoire (LRU) par processus, un niveau disque partagé entre workers
+REPERTOIRE_CACHE = os.environ.get(
+    "ANALYSEUR_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "analyseur-pdf")
+)
+CACHE_MEMOIRE_ENTREES = _env_int("ANALYSEUR_CACHE_MEMOIRE_ENTREES", 256)
+CACHE_DISQUE_OCTETS = _env_int("ANALYSEUR_CACHE_DISQUE_OCTETS", 512 * 1024 * 1024)
+# Archivage par email : un contrat déjà envoyé (même contenu) n'est pas renvoyé pendant ce délai
+ENVOI_MARQUEUR_TTL = _env_int("ANALYSEUR_ENVOI_MARQUEUR_TTL", 7 * 24 * 3600)
+
+# Modèles par route : un petit modèle rapide relève les faits de couverture du contrat
+# (JSON compact), le grand modèle ne rédige que l'analyse et la recommandation à partir
+# de ces faits. MODELE_FAITS vide : le grand modèle reçoit le texte du contrat.
+MODELE_ANALYSE = os.environ.get("ANALYSEUR_MODELE_ANALYSE", "gpt-4")
+MODELE_FAITS = os.environ.get("ANALYSEUR_MODELE_FAITS", "gpt-4o-mini")
+MODELE_QUESTION = os.environ.get("ANALYSEUR_MODELE_QUESTION", "gpt-4o")
+# Relevé des faits : réponse maximale et taille des morceaux d'un contrat trop long
+# pour la fenêtre du petit modèle
+JETONS_FAITS = _env_int("ANALYSEUR_JETONS_FAITS", 1500)
+MORCEAU_FAITS_JETONS = _env_int("ANALYSEUR_MORCEAU_FAITS_JETONS", 60000)
+
+# Appels au modèle : requêtes simultanées maximum et politique de retry
+LLM_CONCURRENCE = _env_int("ANALYSEUR_LLM_CONCURRENCE", 4)
+LLM_TENTATIVES = _env_int("ANALYSEUR_LLM_TENTATIVES", 5)
+LLM_BACKOFF_BASE = 1.0
+LLM_BACKOFF_MAX = 30.0
+# Client HTTP partagé : connexions ouvertes vers l'API (toutes sessions confondues),
+# durée de maintien d'une connexion inactive et délai de lecture d'une réponse (secondes)
+LLM_CONNEXIONS = _env_int("ANALYSEUR_LLM_CONNEXIONS", 32)
+LLM_KEEPALIVE = _env_int("ANALYSEUR_LLM_KEEPALIVE", 90)
+LLM_TIMEOUT = _env_int("ANALYSEUR_LLM_TIMEOUT", 120)
+# Volume maximal de jetons (prompt + réponse) en vol pour les extractions par morceau
+LLM_BUDGET_JETONS = _env_int("ANALYSEUR_LLM_BUDGET_JETONS", 60000)
+
+# Admission des travaux, toutes sessions confondues : images en cours d'OCR et requêtes
+# IA simultanées pour le processus, attribuées à tour de rôle entre sessions
+ORDO_OCR_CAPACITE = _env_int("ANALYSEUR_ORDO_OCR_CAPACITE", OCR_WORKERS)
+ORDO_LLM_CAPACITE = _env_int("ANALYSEUR_ORDO_LLM_CAPACITE", 8)
+
+# Contrats longs : taille des morceaux, réponse maximale par morceau et réserve
+# laissée à la réponse finale dans la fenêtre de contexte du modèle
+MORCEAU_JETONS = _env_int("ANALYSEUR_MORCEAU_JETONS", 2500)
+JETONS_NOTES_MORCEAU = _env_int("ANALYSEUR_JETONS_NOTES_MORCEAU", 400)
+JETONS_REPONSE = _env_int("ANALYSEUR_JETONS_REPONSE", 1500)
+
+# Cache des réponses du modèle (disque partagé, expiration et taille bornées)
+CACHE_REPONSES_TTL = _env_int("ANALYSEUR_CACHE_REPONSES_TTL", 30 * 24 * 3600)
+CACHE_REPONSES_OCTETS = _env_int("ANALYSEUR_CACHE_REPONSES_OCTETS", 128 * 1024 * 1024)
+
+# Contrats quasi identiques : contrats analysés gardés dans l'index du processus,
+# similarité minimale (Jaccard estimée) avec un contrat déjà analysé, et part maximale
+# du texte modifiée pour n'envoyer au modèle que les différences
+SIMILARITE_ENTREES = _env_int("ANALYSEUR_SIMILARITE_ENTREES", 2000)
+SIMILARITE_MIN = float(os.environ.get("ANALYSEUR_SIMILARITE_MIN", "0.6"))
+SIMILARITE_PART_MODIFIEE = float(os.environ.get("ANALYSEUR_SIMILARITE_PART_MODIFIEE", "0.4"))
+
+# Historique des analyses (base SQLite, chaîne vide : désactivé) et rapports PDF
+# produits en arrière-plan (threads dédiés, hors du script de la page)
+STOCKAGE = os.environ.get(
+    "ANALYSEUR_STOCKAGE",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "analyseur-pdf", "analyses.sqlite3")
+)
+RAPPORT_WORKERS = _env_int("ANALYSEUR_RAPPORT_WORKERS", 2)
+
+# Question à l'assistant : passages indexés (en mots) et nombre d'extraits envoyés
+RECHERCHE_MOTS_PASSAGE = _env_int("ANALYSEUR_RECHERCHE_MOTS_PASSAGE", 120)
+RECHERCHE_MOTS_RECOUVREMENT = _env_int("ANALYSEUR_RECHERCHE_MOTS_RECOUVREMENT", 30)
+RECHERCHE_EXTRAITS = _env_int("ANALYSEUR_RECHERCHE_EXTRAITS", 6)
+
+# Mesures : conversion du coût des appels IA, export Prometheus (fichier texte et/ou
+# point HTTP /metrics, désactivés par défaut)
+TAUX_USD_CHF = float(os.environ.get("ANALYSEUR_TAUX_USD_CHF", "0.9"))
+METRIQUES_FICHIER = os.environ.get("ANALYSEUR_METRIQUES_FICHIER", "")
+METRIQUES_PORT = _env_int("ANALYSEUR_METRIQUES_PORT", 0)
+# Adresse d'écoute de /metrics : locale par défaut (coûts, jetons et latences par session)
+METRIQUES_HOTE = os.environ.get("ANALYSEUR_METRIQUES_HOTE", "127.0.0.1")
@@ -0,0 +1,59 @@
+# --- Découpage des contrats longs en morceaux (pages puis sections) sous budget de jetons ---
+import re
+
+from .jetons import compter_jetons, couper_jetons
+
+# Débuts de section typiques des conditions d'assurance : « Art. 12 », « Chapitre 3 »,
+# « 4.2 Hospitalisation », « B. Prestations », ou une ligne entièrement en majuscules
+_TITRE_SECTION = re.compile(
+    r"^\s*(?:"
+    r"(?i:art(?:icle)?\.?|chapitre|section|titre|annexe)\s+\w+"
+    r"|\d+(?:\.\d+)*\.?\s+[A-ZÀ-Ý]"
+    r"|[A-Z]\.\s+[A-ZÀ-Ý]"
+    r"|[A-ZÀ-Ý][A-ZÀ-Ý '’\-]{5,}$"
+    r")",
+    re.MULTILINE
+)
+
+
+def sections(texte):
+    debuts = [m.start() for m in _TITRE_SECTION.finditer(texte)]
+    if not debuts or debuts[0] != 0:
+        debuts.insert(0, 0)
+    debuts.append(len(texte))
+    return [texte[a:b] for a, b in zip(debuts, debuts[1:]) if texte[a:b].strip()]
+
+
+def decouper(pages, budget_jetons, model="gpt-4"):
+    # Regroupe les sections de pages consécutives en morceaux d'au plus `budget_jetons`.
+    # Renvoie une liste de dicts {"texte", "page_debut", "page_fin"} (pages numérotées à partir de 1).
+    morceaux = []
+    courant, jetons_courant, page_debut = [], 0, None
+
+    def fermer(page_fin):
+        nonlocal courant, jetons_courant, page_debut
+        if courant:
+            morceaux.append({"texte": "".join(courant), "page_debut": page_debut, "page_fin": page_fin})
+        courant, jetons_courant, page_debut = [], 0, None
+
+    derniere_page = 1
+    for numero, page in enumerate(pages, start=1):
+        for section in sections(page):
+            jetons = compter_jetons(section, model)
+            if jetons > budget_jetons:
+                # Section trop longue : coupée à la frontière de jetons
+                fermer(derniere_page)
+                for partie in couper_jetons(section, budget_jetons, model):
+                    morceaux.append({"texte": partie, "page_debut": numero, "page_fin": numero})
+                continue
+            if jetons_courant + jetons > budget_jetons:
+                fermer(derniere_page)
+            if page_debut is None:
+                page_debut = numero
+            courant.append(section)
+            jetons_courant += jetons
+            derniere_page = numero
+        if courant and not courant[-1].endswith("\n"):
+            courant.append("\n")
+    fermer(derniere_page)
+    return morceaux
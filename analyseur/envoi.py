@@ -0,0 +1,192 @@
+# --- Archivage des contrats par email : file d'attente en arrière-plan, connexion SMTP réutilisée ---
+import contextvars
+import hashlib
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+from . import config
+from .mesures import etape
+
+logger = logging.getLogger(__name__)
+
+
+class FileEnvoi:
+    # Un thread unique vide la file et garde une connexion SMTP authentifiée
+    # ouverte tant qu'il y a du travail (fermée après `inactivite` secondes).
+    # Les fichiers envoyés depuis moins de `ttl` secondes (même contenu) sont ignorés, y
+    # compris entre workers grâce à un marqueur par hash dans `repertoire_envois`, écrit
+    # seulement une fois l'envoi réussi : un envoi perdu (échec, arrêt du worker) sera refait.
+    def __init__(self, hote, port, utilisateur, mot_de_passe, ssl=True, destinataire=None,
+                 regrouper=True, inactivite=60, repertoire_envois=None, ttl=None):
+        self.hote = hote
+        self.port = port
+        self.utilisateur = utilisateur
+        self.mot_de_passe = mot_de_passe
+        self.ssl = ssl
+        self.destinataire = destinataire or utilisateur
+        self.regrouper = regrouper
+        self.inactivite = inactivite
+        self.repertoire_envois = repertoire_envois
+        self.ttl = config.ENVOI_MARQUEUR_TTL if ttl is None else ttl
+        self._file = queue.Queue()
+        self._smtp = None
+        self._en_cours = set()
+        self._envoyes = {}  # hash -> instant de l'envoi (marqueurs du processus)
+        self._verrou = threading.Lock()
+        self._thread = threading.Thread(target=self._boucle, name="file-envoi-smtp", daemon=True)
+        self._thread.start()
+
+    # --- Côté page : ne bloque jamais ---
+
+    def soumettre(self, pieces, sujet="Analyse contrat santé"):
+        # pieces : liste de (nom_fichier, type_mime, donnees). Renvoie le nombre de pièces mises en file.
+        nouvelles = [(nom, mime, donnees, h) for nom, mime, donnees in pieces
+                     for h in [hashlib.sha256(donnees).hexdigest()] if self._reserver(h)]
+        if not nouvelles:
+            return 0
+        # L'envoi est mesuré dans le contexte de la session qui l'a demandé
+        contexte = contextvars.copy_context()
+        if self.regrouper:
+            self._file.put((f"{sujet} - {len(nouvelles)} contrat(s)", nouvelles, contexte))
+        else:
+            for i, piece in enumerate(nouvelles, start=1):
+                self._file.put((f"{sujet} - Contrat {i}", [piece], contexte))
+        return len(nouvelles)
+
+    def attendre(self, delai=None):
+        # Utile pour les scripts et les tests : attend que la file soit vidée
+        fin = threading.Event()
+        self._file.put(fin)
+        return fin.wait(delai)
+
+    def _marqueur(self, h):
+        return os.path.join(self.repertoire_envois, h) if self.repertoire_envois else None
+
+    def _envoye_le(self, h):
+        # Instant du dernier envoi réussi connu (ce processus ou un autre worker), sinon None
+        envoye = self._envoyes.get(h)
+        marqueur = self._marqueur(h)
+        if envoye is None and marqueur:
+            try:
+                envoye = os.path.getmtime(marqueur)
+            except OSError:
+                pass
+        return envoye
+
+    def _reserver(self, h):
+        # Déjà en file dans ce processus ou envoyé récemment : ignoré
+        with self._verrou:
+            if h in self._en_cours:
+                return False
+            envoye = self._envoye_le(h)
+            if envoye is not None and time.time() - envoye < self.ttl:
+                return False
+            self._en_cours.add(h)
+        return True
+
+    def _terminer(self, h, reussi):
+        # Marqueur écrit après l'envoi seulement ; après un échec, un nouvel envoi est possible
+        with self._verrou:
+            self._en_cours.discard(h)
+            if reussi:
+                self._envoyes[h] = time.time()
+        marqueur = self._marqueur(h)
+        if reussi and marqueur:
+            try:
+                os.makedirs(self.repertoire_envois, exist_ok=True)
+                with open(marqueur, "w"):
+                    pass
+                os.utime(marqueur)
+            except OSError:
+                logger.warning("marqueur d'envoi non écrit : %s", marqueur)
+
+    # --- Côté worker ---
+
+    def _connexion(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except smtplib.SMTPException:
+                pass
+            self._fermer()
+        classe = smtplib.SMTP_SSL if self.ssl else smtplib.SMTP
+        self._smtp = classe(self.hote, self.port, timeout=30)
+        if self.mot_de_passe:
+            self._smtp.login(self.utilisateur, self.mot_de_passe)
+        return self._smtp
+
+    def _fermer(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def _message(self, sujet, pieces):
+        msg = EmailMessage()
+        msg["Subject"] = sujet
+        msg["From"] = self.utilisateur
+        msg["To"] = self.destinataire
+        msg.set_content("Une analyse IA d’un contrat d’assurance a été effectuée. Voir fichier(s) joint(s).")
+        for nom, mime, donnees, _ in pieces:
+            maintype, _, subtype = (mime or "application/octet-stream").partition("/")
+            msg.add_attachment(donnees, maintype=maintype, subtype=subtype, filename=nom)
+        return msg
+
+    def _boucle(self):
+        while True:
+            try:
+                travail = self._file.get(timeout=self.inactivite)
+            except queue.Empty:
+                self._fermer()
+                continue
+            if isinstance(travail, threading.Event):
+                travail.set()
+                continue
+            sujet, pieces, contexte = travail
+            reussi = False
+            try:
+                contexte.run(self._envoyer_mesure, sujet, pieces)
+                reussi = True
+            except Exception:
+                logger.exception("échec de l'envoi de l'email « %s »", sujet)
+            for *_, h in pieces:
+                self._terminer(h, reussi)
+
+    def _envoyer_mesure(self, sujet, pieces):
+        with etape("email", pieces=len(pieces), octets=sum(len(donnees) for _, _, donnees, _ in pieces)):
+            self._envoyer(self._message(sujet, pieces))
+
+    def _envoyer(self, msg):
+        for tentative in range(2):
+            try:
+                self._connexion().send_message(msg)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Connexion coupée par le serveur : une reconnexion puis on abandonne
+                self._fermer()
+                if tentative == 1:
+                    raise
+
+
+_files = {}
+_verrou_files = threading.Lock()
+
+
+def file_envoi(hote, port, utilisateur, mot_de_passe, ssl=True, regrouper=True):
+    # Une file (et donc une connexion) par processus et par compte SMTP
+    cle = (hote, port, utilisateur, ssl, regrouper)
+    with _verrou_files:
+        if cle not in _files:
+            _files[cle] = FileEnvoi(
+                hote, port, utilisateur, mot_de_passe, ssl=ssl, regrouper=regrouper,
+                repertoire_envois=os.path.join(config.REPERTOIRE_CACHE, "envois")
+            )
+        return _files[cle]
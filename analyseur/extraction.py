@@ -0,0 +1,226 @@
+# --- Extraction du texte des contrats (PDF ou image) avec cache par contenu ---
+import collections
+import functools
+import time
+
+import fitz  # PyMuPDF
+
+from . import config
+from .cache import CacheDeuxNiveaux, CacheDisque, CacheLRU, empreinte
+from .mesures import enregistrer, etape
+from .nettoyage import MARGE_RELATIVE, nettoyer_pages
+from .ocr import iterer_ocr, parametres_ocr
+
+VERSION_EXTRACTION = 6
+
+_cache = CacheDeuxNiveaux(
+    CacheLRU(config.CACHE_MEMOIRE_ENTREES),
+    CacheDisque(config.REPERTOIRE_CACHE + "/extraction", config.CACHE_DISQUE_OCTETS)
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _version_tesseract():
+    # pytesseract (et PIL) ne servent que dans les workers OCR : import local
+    import pytesseract
+
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "inconnue"
+
+
+def parametres_extraction():
+    # Tout ce qui peut changer le texte produit doit figurer ici
+    return {
+        "version": VERSION_EXTRACTION,
+        "ocr_config": config.OCR_CONFIG,
+        "ocr_langue": config.OCR_LANGUE,
+        "ocr_seuil_caracteres": config.OCR_SEUIL_CARACTERES,
+        "ocr_dpi": config.OCR_DPI,
+        "ocr_pretraitement": parametres_ocr(),
+        "nettoyage": config.NETTOYAGE,
+        "pymupdf": fitz.VersionBind,
+        "tesseract": _version_tesseract(),
+    }
+
+
+def cle_extraction(donnees, type_fichier):
+    est_image = type_fichier.startswith("image")
+    return empreinte("extraction", "image" if est_image else "pdf", parametres_extraction(), donnees)
+
+
+def couche_texte_suffisante(texte):
+    return len("".join(texte.split())) >= config.OCR_SEUIL_CARACTERES
+
+
+class DocumentTropVolumineux(ValueError):
+    pass
+
+
+def verifier_taille(donnees):
+    if len(donnees) > config.EXTRACTION_OCTETS_MAX:
+        raise DocumentTropVolumineux(
+            f"fichier de {len(donnees) / 1024 / 1024:.1f} Mo "
+            f"(maximum {config.EXTRACTION_OCTETS_MAX / 1024 / 1024:.0f} Mo)"
+        )
+
+
+def texte_page(page):
+    # Texte des blocs dans l'ordre de lecture, et nombre de lignes d'en-tête et de pied
+    # (blocs entièrement dans la marge haute ou basse de la page)
+    hauteur = page.rect.height
+    blocs = [b for b in page.get_text("blocks", sort=True) if b[6] == 0]  # 0 : bloc de texte
+    zones = [
+        "haut" if y1 <= hauteur * MARGE_RELATIVE else "bas" if y0 >= hauteur * (1 - MARGE_RELATIVE) else "corps"
+        for _, y0, _, y1, *_ in blocs
+    ]
+    lignes = [len(b[4].splitlines()) for b in blocs]
+    haut = bas = 0
+    for zone, n in zip(zones, lignes):
+        if zone != "haut":
+            break
+        haut += n
+    for zone, n in zip(reversed(zones), reversed(lignes)):
+        if zone != "bas":
+            break
+        bas += n
+    texte = "".join(b[4] if b[4].endswith("\n") else b[4] + "\n" for b in blocs)
+    return texte, (haut, bas)
+
+
+def iterer_pdf(donnees):
+    # Produit (numero, texte, png, marges) page par page. Le PNG n'est rendu que pour les
+    # pages sans couche texte exploitable (texte vide, marges None), au moment où l'appelant
+    # les demande. `donnees` peut être une vue mémoire sur le fichier téléversé : aucune copie.
+    verifier_taille(donnees)
+    with fitz.open(stream=donnees, filetype="pdf") as doc:
+        if doc.page_count > config.EXTRACTION_PAGES_MAX:
+            raise DocumentTropVolumineux(f"{doc.page_count} pages (maximum {config.EXTRACTION_PAGES_MAX})")
+        for numero, page in enumerate(doc):
+            with etape("extraction.page", page=numero + 1) as attributs:
+                texte, marges = texte_page(page)
+                attributs["ocr"] = not couche_texte_suffisante(texte)
+                png = None
+                if attributs["ocr"]:
+                    # Niveaux de gris : PNG trois fois plus léger, et Tesseract n'utilise pas la couleur
+                    png = page.get_pixmap(dpi=config.OCR_DPI, colorspace=fitz.csGRAY).tobytes("png")
+            yield numero, "" if png else texte, png, None if png else marges
+
+
+def lire_pdf(donnees):
+    # Version non paresseuse : texte de chaque page et {numero_page: png} des pages à OCR
+    pages = []
+    a_ocr = {}
+    for numero, texte, png, _ in iterer_pdf(donnees):
+        pages.append(texte)
+        if png:
+            a_ocr[numero] = png
+    return pages, a_ocr
+
+
+def extraire_texte(donnees, type_fichier):
+    return "\n".join(extraire_pages([(donnees, type_fichier)])[0])
+
+
+def iterer_pages(documents, attente=None):
+    # documents : liste de (donnees, type_fichier). Produit au fil de l'eau :
+    #   (i, numero, texte) pour chaque page extraite (ordre quelconque, pas pour un document en cache) ;
+    #   (i, None, pages) quand le document i est complet (texte de toutes ses pages, dans l'ordre).
+    # Les documents sont lus page par page : une page avec couche texte est produite dès
+    # sa lecture, sans attendre l'OCR en cours ; une page scannée n'est rendue que lorsqu'il
+    # reste de la place dans le pool (config.OCR_EN_VOL), la lecture s'arrêtant en attendant.
+    # Le nettoyage (et donc la détection) porte sur le document complet : il compte les
+    # répétitions d'une page à l'autre.
+    # attente(position) : rang de la session dans la file OCR du processus, si elle attend.
+    total = len(documents)
+    cles = [cle_extraction(donnees, type_fichier) for donnees, type_fichier in documents]
+    pages = [None] * total
+    marges = [None] * total  # (lignes d'en-tête, lignes de pied) par page, None si inconnues
+    restantes = [0] * total  # pages soumises à l'OCR et pas encore reconnues
+    lus = [False] * total
+    travaux = []  # (i, numero) de chaque image soumise, dans l'ordre de soumission
+    prets = collections.deque()
+
+    def terminer(i, depuis_cache=False):
+        if not depuis_cache:
+            nettoyage = None
+            if config.NETTOYAGE:
+                with etape("nettoyage", caracteres=sum(len(page) for page in pages[i])) as attributs:
+                    pages[i], nettoyage = nettoyer_pages(pages[i], marges[i])
+                    attributs.update(nettoyage)
+            _cache.set(cles[i], {"pages": pages[i], "nettoyage": nettoyage})
+        prets.append((i, None, pages[i]))
+
+    def images():
+        # Consommé par iterer_ocr, qui ne demande une image que lorsqu'il peut la soumettre ;
+        # None lui rend la main pour que les pages prêtes soient produites aussitôt
+        for i, (donnees, type_fichier) in enumerate(documents):
+            entree = _cache.get(cles[i])
+            if entree is not None:
+                pages[i] = entree["pages"]
+                enregistrer("extraction.fichier", 0.0, type=type_fichier, octets=len(donnees), cache=True)
+                terminer(i, depuis_cache=True)
+                yield None
+                continue
+            pages[i] = []
+            marges[i] = []
+            if type_fichier.startswith("image"):
+                verifier_taille(donnees)
+                pages[i].append("")
+                marges[i].append(None)
+                travaux.append((i, 0))
+                restantes[i] += 1
+                yield donnees
+            else:
+                # Durée de lecture seule : le temps passé à attendre l'OCR est exclu
+                lecture = 0.0
+                pages_ocr = 0
+                debut = time.perf_counter()
+                for numero, texte, png, marges_page in iterer_pdf(donnees):
+                    lecture += time.perf_counter() - debut
+                    pages[i].append(texte)
+                    marges[i].append(marges_page)
+                    if png:
+                        travaux.append((i, numero))
+                        restantes[i] += 1
+                        pages_ocr += 1
+                        yield png
+                    else:
+                        prets.append((i, numero, texte))
+                        yield None
+                    debut = time.perf_counter()
+                lecture += time.perf_counter() - debut
+                enregistrer(
+                    "extraction.fichier", lecture, type=type_fichier, octets=len(donnees), cache=False,
+                    pages=len(pages[i]), pages_ocr=pages_ocr
+                )
+            lus[i] = True
+            if restantes[i] == 0:
+                terminer(i)
+                yield None
+
+    for j, texte in iterer_ocr(images(), attente=attente):
+        if j is not None:
+            i, numero = travaux[j]
+            pages[i][numero] = texte
+            restantes[i] -= 1
+            prets.append((i, numero, texte))
+            if lus[i] and restantes[i] == 0:
+                terminer(i)
+        while prets:
+            yield prets.popleft()
+
+
+def extraire_pages(documents, progression=None):
+    # Renvoie pour chaque document la liste du texte de ses pages (une seule « page »
+    # pour une image). progression(faits, total) est appelé à chaque document terminé.
+    resultat = [None] * len(documents)
+    faits = 0
+    for i, numero, donnee in iterer_pages(documents):
+        if numero is None:
+            resultat[i] = donnee
+            faits += 1
+            if progression:
+                progression(faits, len(documents))
+    return resultat
@@ -0,0 +1,43 @@
+# --- Étapes mémorisées par élément (fichier téléversé) avec l'empreinte de leurs entrées ---
+#
+# Chaque résultat est rangé sous (étape, clé d'élément) avec la signature de ses entrées.
+# Une étape en aval inclut la signature de l'étape amont dans la sienne : changer une
+# entrée (paramètre, widget, fichier) invalide exactement les étapes qui en dépendent.
+# Conservé dans st.session_state, le graphe évite de refaire le travail à chaque rerun.
+import threading
+from collections import Counter
+
+from .cache import empreinte
+
+
+class Graphe:
+    def __init__(self):
+        self._resultats = {}  # (étape, clé) -> (signature, valeur)
+        self._verrou = threading.Lock()
+        self.recalculs = Counter()
+        self.reutilisations = Counter()
+
+    def signature(self, etape, cle, *entrees):
+        # entrees : signatures amont ou valeurs simples (texte, nombres, dictionnaires JSON)
+        return empreinte(etape, cle, *entrees)
+
+    def lire(self, etape, cle, signature):
+        # Valeur mémorisée si elle a été calculée avec ces entrées, sinon None
+        with self._verrou:
+            resultat = self._resultats.get((etape, cle))
+            if resultat is not None and resultat[0] == signature:
+                self.reutilisations[etape] += 1
+                return resultat[1]
+        return None
+
+    def ecrire(self, etape, cle, signature, valeur):
+        with self._verrou:
+            self._resultats[(etape, cle)] = (signature, valeur)
+            self.recalculs[etape] += 1
+        return valeur
+
+    def elaguer(self, cles):
+        # Oublie les éléments disparus (fichier retiré) ; les résultats globaux (clé None) restent
+        cles = set(cles)
+        with self._verrou:
+            self._resultats = {k: v for k, v in self._resultats.items() if k[1] is None or k[1] in cles}
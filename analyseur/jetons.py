@@ -0,0 +1,50 @@
+# --- Comptage exact des jetons (tokenizer du modèle via tiktoken) ---
+import functools
+
+import tiktoken
+
+# Fenêtre de contexte par modèle (jetons), pour dimensionner les requêtes
+CONTEXTE_MODELES = {
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+
+# Surcoût fixe par message dans le format chat (rôle, séparateurs)
+JETONS_PAR_MESSAGE = 4
+JETONS_AMORCE_REPONSE = 3
+
+
+@functools.lru_cache(maxsize=None)
+def _encodage(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def compter_jetons(texte, model="gpt-4"):
+    return len(_encodage(model).encode(texte, disallowed_special=()))
+
+
+def compter_jetons_messages(messages, model="gpt-4"):
+    return JETONS_AMORCE_REPONSE + sum(
+        JETONS_PAR_MESSAGE + compter_jetons(message["content"], model) for message in messages
+    )
+
+
+def couper_jetons(texte, maximum, model="gpt-4"):
+    # Découpe un texte en morceaux d'au plus `maximum` jetons
+    encodage = _encodage(model)
+    jetons = encodage.encode(texte, disallowed_special=())
+    return [encodage.decode(jetons[i:i + maximum]) for i in range(0, len(jetons), maximum)]
+
+
+def contexte_modele(model):
+    for prefixe in sorted(CONTEXTE_MODELES, key=len, reverse=True):
+        if model.startswith(prefixe):
+            return CONTEXTE_MODELES[prefixe]
+    return 8192
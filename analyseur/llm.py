@@ -0,0 +1,213 @@
+# --- Appels au modèle : streaming, requêtes concurrentes bornées, retry sur limites de débit ---
+import contextvars
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+
+import openai
+
+from . import config
+from .cache import CacheDeuxNiveaux, CacheDisque, CacheLRU, empreinte
+from .jetons import compter_jetons, compter_jetons_messages
+from .mesures import enregistrer, enregistrer_llm
+from .ordonnanceur import ordonnanceur_llm
+from .prompts import VERSION_PROMPT
+
+# Réponses déjà obtenues pour un même contrat, prompt, modèle et profil
+cache_reponses = CacheDeuxNiveaux(
+    CacheLRU(config.CACHE_MEMOIRE_ENTREES, ttl=config.CACHE_REPONSES_TTL),
+    CacheDisque(config.REPERTOIRE_CACHE + "/reponses", config.CACHE_REPONSES_OCTETS, ttl=config.CACHE_REPONSES_TTL)
+)
+
+
+def cle_analyse(texte, objectif, travail, model, comparaison=""):
+    # Le modèle des faits compte aussi : l'analyse est rédigée à partir de son relevé
+    return empreinte(
+        "analyse", VERSION_PROMPT, model, config.MODELE_FAITS, objectif, travail, comparaison, empreinte(texte)
+    )
+
+
+def cle_faits(texte, model):
+    return empreinte("faits", VERSION_PROMPT, model, empreinte(texte))
+
+
+class BudgetJetons:
+    # Sémaphore comptée en jetons : une requête réserve sa taille (prompt + réponse
+    # maximale) et attend que le volume en vol repasse sous la capacité.
+    def __init__(self, capacite):
+        self.capacite = capacite
+        self._disponible = capacite
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def reserver(self, jetons):
+        jetons = min(jetons, self.capacite)
+        with self._condition:
+            while self._disponible < jetons:
+                self._condition.wait()
+            self._disponible -= jetons
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._disponible += jetons
+                self._condition.notify_all()
+
+
+budget_jetons = BudgetJetons(config.LLM_BUDGET_JETONS)
+
+
+# Erreurs transitoires pour lesquelles on réessaie avec backoff exponentiel
+ERREURS_TRANSITOIRES = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+
+def _delai_avant_retry(tentative, erreur):
+    # Respecte l'en-tête Retry-After quand l'API le fournit, sinon backoff + jitter
+    reponse = getattr(erreur, "response", None)
+    if reponse is not None:
+        try:
+            return float(reponse.headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+    return min(config.LLM_BACKOFF_MAX, config.LLM_BACKOFF_BASE * 2 ** tentative) * (0.5 + random.random())
+
+
+def _jetons(usage, messages, texte, model):
+    # Jetons facturés renvoyés par l'API ; à défaut, estimation locale avec tiktoken
+    if usage is not None and getattr(usage, "prompt_tokens", None) is not None:
+        return usage.prompt_tokens, usage.completion_tokens
+    return compter_jetons_messages(messages, model), compter_jetons(texte or "", model)
+
+
+def completion(client, messages, model="gpt-4", max_tokens=None, route=None, attente=None, format_json=False):
+    # Chaque tentative prend une place IA du processus (relâchée pendant le backoff).
+    # format_json : réponse contrainte à un objet JSON (le prompt doit demander du JSON).
+    options = {"max_tokens": max_tokens} if max_tokens else {}
+    if format_json:
+        options["response_format"] = {"type": "json_object"}
+    debut = time.perf_counter()
+    for tentative in range(config.LLM_TENTATIVES):
+        try:
+            with ordonnanceur_llm.place(attente=attente):
+                reponse = client.chat.completions.create(model=model, messages=messages, **options)
+            texte = reponse.choices[0].message.content
+            enregistrer_llm(
+                "llm.completion", model, time.perf_counter() - debut,
+                *_jetons(getattr(reponse, "usage", None), messages, texte, model),
+                route=route, tentatives=tentative + 1
+            )
+            return texte
+        except ERREURS_TRANSITOIRES as e:
+            if tentative == config.LLM_TENTATIVES - 1:
+                enregistrer("llm.completion", time.perf_counter() - debut, modele=model, route=route,
+                            tentatives=tentative + 1, erreur=type(e).__name__)
+                raise
+            # L'attente ne bloque que le thread de ce contrat
+            time.sleep(_delai_avant_retry(tentative, e))
+
+
+def flux_completion(client, messages, model="gpt-4", mesures=None, route=None, attente=None):
+    # Produit les morceaux de texte au fil de l'eau. On ne réessaie que tant
+    # qu'aucun token n'a été reçu : une réponse entamée ne peut pas être rejouée.
+    # Si `mesures` (dict) est fourni, on y note le temps jusqu'au premier token.
+    # La place IA est tenue pendant tout le flux ; attente(position) est appelé tant
+    # que la requête attend son tour dans la file du processus.
+    mesures = {} if mesures is None else mesures
+    debut = time.perf_counter()
+    for tentative in range(config.LLM_TENTATIVES):
+        recu = False
+        morceaux = []
+        usage = None
+        try:
+            with ordonnanceur_llm.place(attente=attente):
+                flux = client.chat.completions.create(
+                    model=model, messages=messages, stream=True,
+                    # Le dernier morceau du flux porte alors les jetons facturés
+                    stream_options={"include_usage": True}
+                )
+                # Flux abandonné par l'appelant : la connexion est fermée, la génération s'arrête
+                with closing(flux):
+                    for morceau in flux:
+                        usage = getattr(morceau, "usage", None) or usage
+                        if not morceau.choices:
+                            continue
+                        delta = morceau.choices[0].delta.content
+                        if not delta:
+                            continue
+                        if not recu:
+                            recu = True
+                            mesures["premier_token"] = time.perf_counter() - debut
+                        morceaux.append(delta)
+                        yield delta
+            mesures["total"] = time.perf_counter() - debut
+            enregistrer_llm(
+                "llm.flux", model, mesures["total"], *_jetons(usage, messages, "".join(morceaux), model),
+                route=route, tentatives=tentative + 1,
+                premier_token=round(mesures.get("premier_token", mesures["total"]), 3)
+            )
+            return
+        except ERREURS_TRANSITOIRES as e:
+            if recu or tentative == config.LLM_TENTATIVES - 1:
+                enregistrer("llm.flux", time.perf_counter() - debut, modele=model, route=route,
+                            tentatives=tentative + 1, erreur=type(e).__name__)
+                raise
+            time.sleep(_delai_avant_retry(tentative, e))
+
+
+def iterer_flux(client, liste_messages, model="gpt-4", concurrence=None, route=None):
+    # Envoie toutes les requêtes en même temps (au plus `concurrence` en vol) en
+    # streaming : les threads poussent leurs tokens dans une file, consommée par
+    # le thread appelant (seul autorisé à écrire dans la page Streamlit). Un
+    # élément de `liste_messages` peut être une fonction renvoyant les messages :
+    # elle est alors exécutée dans le thread du contrat (ex. phase d'extraction
+    # des contrats longs). Produit des événements :
+    #   (index, "delta", morceau) ; (index, "fin", (texte_complet, mesures)) ; (index, "erreur", exception)
+    #   (index, "attente", position) tant que la requête attend une place IA du processus
+    concurrence = concurrence or config.LLM_CONCURRENCE
+    if not liste_messages:
+        return
+    evenements = queue.Queue()
+    annule = threading.Event()
+
+    def travail(index, messages):
+        morceaux = []
+        mesures = {}
+        try:
+            if callable(messages):
+                messages = messages()
+            attente = lambda position: evenements.put((index, "attente", position))  # noqa: E731
+            with closing(flux_completion(client, messages, model, mesures, route, attente)) as flux:
+                for delta in flux:
+                    if annule.is_set():
+                        return
+                    morceaux.append(delta)
+                    evenements.put((index, "delta", delta))
+            evenements.put((index, "fin", ("".join(morceaux), mesures)))
+        except Exception as e:
+            evenements.put((index, "erreur", e))
+
+    executeur = ThreadPoolExecutor(max_workers=min(concurrence, len(liste_messages)))
+    try:
+        for index, messages in enumerate(liste_messages):
+            # Chaque thread hérite du contexte de l'appelant (trace de la session)
+            executeur.submit(contextvars.copy_context().run, travail, index, messages)
+        restants = len(liste_messages)
+        while restants:
+            evenement = evenements.get()
+            if evenement[1] in ("fin", "erreur"):
+                restants -= 1
+            yield evenement
+    finally:
+        # Générateur abandonné (rerun ou arrêt de la page) : les requêtes pas encore
+        # parties sont annulées, celles en cours s'arrêtent au morceau suivant, sans
+        # que l'appelant les attende
+        annule.set()
+        executeur.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,208 @@
+# --- Mode lot : analyse d'un dossier (ou d'un manifeste) de contrats en ligne de commande ---
+#
+#   python -m analyseur lot contrats/ --sortie resultats.jsonl --workers 8
+#
+# Chaque contrat terminé est ajouté immédiatement au fichier JSONL de sortie, qui sert
+# aussi de point de reprise : relancer la même commande saute les contrats déjà traités.
+import argparse
+import contextvars
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from . import config
+from .cache import empreinte
+from .client_ia import creer_client
+from .extraction import extraire_pages
+from .mesures import Trace, activer_trace, ecrire_prometheus
+from .pipeline import TYPES_MIME, analyser_contrat, detecter_contrat, detecter_doublons, resume_contrat, type_mime
+from .rapport import rapport_lot
+from .stockage import stockage
+
+OBJECTIFS = ["📉 Réduire les coûts", "📈 Améliorer les prestations", "❓ Je ne sais pas encore"]
+
+
+def lister_entrees(source):
+    # Dossier (parcouru récursivement), liste de chemins (.txt) ou manifeste JSONL
+    # ({"chemin": ..., "objectif": ..., "travail": ..., "client": ...} par ligne)
+    if os.path.isdir(source):
+        for racine, dossiers, noms in os.walk(source):
+            dossiers.sort()
+            for nom in sorted(noms):
+                if os.path.splitext(nom)[1].lower() in TYPES_MIME:
+                    yield {"chemin": os.path.join(racine, nom)}
+        return
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if not ligne or ligne.startswith("#"):
+                continue
+            entree = json.loads(ligne) if ligne.startswith("{") else {"chemin": ligne}
+            entree["chemin"] = os.path.join(base, entree["chemin"])
+            yield entree
+
+
+def cle_entree(donnees, objectif, travail, sans_ia):
+    return hashlib.sha256(
+        donnees + json.dumps([objectif, travail, sans_ia], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def deja_traites(sortie):
+    faits = set()
+    if not os.path.exists(sortie):
+        return faits
+    with open(sortie, encoding="utf-8") as f:
+        for ligne in f:
+            try:
+                resultat = json.loads(ligne)
+            except ValueError:
+                continue  # dernière ligne tronquée par une interruption
+            if resultat.get("statut") == "ok":
+                faits.add(resultat["cle"])
+    return faits
+
+
+def traiter(entree, options, client, faits):
+    debut = time.perf_counter()
+    chemin = entree["chemin"]
+    objectif = entree.get("objectif", options.objectif)
+    travail = entree.get("travail", options.travail)
+
+    def echec(erreur):
+        return {"chemin": chemin, "client": entree.get("client"), "statut": "erreur", "erreur": erreur,
+                "duree_s": round(time.perf_counter() - debut, 3)}
+
+    # Fichier absent ou illisible : une ligne d'erreur comme pour les autres contrats
+    try:
+        with open(chemin, "rb") as f:
+            # Un fichier hors limite n'est même pas chargé en mémoire
+            if os.fstat(f.fileno()).st_size > config.EXTRACTION_OCTETS_MAX:
+                return echec(f"DocumentTropVolumineux: plus de {config.EXTRACTION_OCTETS_MAX} octets")
+            donnees = f.read()
+    except OSError as e:
+        return echec(f"{type(e).__name__}: {e}")
+    resultat = {
+        "cle": cle_entree(donnees, objectif, travail, options.sans_ia),
+        "chemin": chemin,
+        "client": entree.get("client"),
+        "sha256": hashlib.sha256(donnees).hexdigest(),
+        "objectif": objectif,
+        "travail": travail,
+    }
+    if resultat["cle"] in faits:
+        return None
+
+    try:
+        mime = type_mime(chemin)
+        if mime is None:
+            raise ValueError("type de fichier non pris en charge")
+        pages = extraire_pages([(donnees, mime)])[0]
+        contrat = detecter_contrat(pages)
+        resultat.update(resume_contrat(contrat), pages=len(pages))
+        if not options.sans_ia:
+            proche = {}
+            resultat["analyse"], resultat["depuis_cache"] = analyser_contrat(
+                client, pages, contrat, objectif, travail, details=proche
+            )
+            if proche:
+                # Contrat quasi identique à un contrat déjà analysé ("identique" ou "differences")
+                resultat["quasi_doublon"] = proche
+        base = stockage()
+        if base is not None:
+            # Historique : le rapport PDF du contrat se retrouve par client (python -m analyseur rapport)
+            _, explications = detecter_doublons([contrat])
+            resultat["lot_id"] = base.enregistrer_lot(
+                [{
+                    "nom": os.path.basename(chemin), "hash_texte": empreinte(contrat["texte"]), "pages": len(pages),
+                    "couverture": contrat["couverture"], "comparaison": contrat["comparaison"],
+                    "modele": None if options.sans_ia else config.MODELE_ANALYSE, "analyse": resultat.get("analyse"),
+                }],
+                explications, client=entree.get("client"), objectif=objectif, travail=travail
+            )
+            rapport_lot(base, resultat["lot_id"])  # produit ici (thread du lot), relu ensuite
+        resultat["statut"] = "ok"
+    except Exception as e:
+        resultat.update(statut="erreur", erreur=f"{type(e).__name__}: {e}")
+    resultat["duree_s"] = round(time.perf_counter() - debut, 3)
+    return resultat
+
+
+def executer_lot(options, client=None, journal=sys.stderr):
+    faits_avant = deja_traites(options.sortie)
+    entrees = list(lister_entrees(options.source))
+    stats = {"ok": 0, "erreur": 0, "sautes": 0}
+    trace = activer_trace(Trace(session="lot"))
+    debut = time.perf_counter()
+
+    with open(options.sortie, "a+", encoding="utf-8") as sortie, \
+            ThreadPoolExecutor(max_workers=options.workers) as executeur:
+        # Une interruption pendant l'écriture peut laisser une ligne incomplète
+        if sortie.tell() > 0:
+            sortie.seek(sortie.tell() - 1)
+            if sortie.read(1) != "\n":
+                sortie.write("\n")
+        futures = [
+            executeur.submit(contextvars.copy_context().run, traiter, entree, options, client, faits_avant)
+            for entree in entrees
+        ]
+        for faits, future in enumerate(as_completed(futures), start=1):
+            resultat = future.result()
+            if resultat is None:
+                stats["sautes"] += 1
+                continue
+            # Écrit depuis ce seul thread, ligne par ligne : la sortie reste lisible pendant le lot
+            sortie.write(json.dumps(resultat, ensure_ascii=False) + "\n")
+            sortie.flush()
+            os.fsync(sortie.fileno())
+            stats[resultat["statut"]] += 1
+            if resultat["statut"] == "erreur":
+                print(f"[{faits}/{len(entrees)}] ❌ {resultat['chemin']} : {resultat['erreur']}", file=journal)
+            else:
+                print(f"[{faits}/{len(entrees)}] ✅ {resultat['chemin']} ({resultat['duree_s']} s)", file=journal)
+
+    duree = time.perf_counter() - debut
+    traites = stats["ok"] + stats["erreur"]
+    stats["duree_s"] = round(duree, 3)
+    stats["contrats_par_minute"] = round(traites / duree * 60, 2) if duree > 0 else 0.0
+    print(
+        f"{traites} contrat(s) traités en {duree:.1f} s ({stats['contrats_par_minute']} contrats/min), "
+        f"{stats['erreur']} erreur(s), {stats['sautes']} déjà traité(s)",
+        file=journal
+    )
+    # Où est passé le temps (somme sur tous les workers) et coût IA estimé
+    for nom, valeurs in trace.repartition().items():
+        cout = f", {valeurs['cout_chf']:.4f} CHF" if valeurs["cout_chf"] else ""
+        print(f"  {nom:20s} {valeurs['nombre']:6d} × {valeurs['secondes']:9.2f} s{cout}", file=journal)
+    # Latence et coût par route (petit modèle pour les faits, grand modèle pour l'analyse)
+    routes = trace.par_route()
+    if routes:
+        print("  route          modèle(s)              appels    p50 (s)    p95 (s)        CHF", file=journal)
+    for nom, valeurs in routes.items():
+        print(
+            f"  {nom:14s} {valeurs['modeles']:22s} {valeurs['appels']:6d} {valeurs['p50_s']:10.2f} "
+            f"{valeurs['p95_s']:10.2f} {valeurs['cout_chf']:10.4f}",
+            file=journal
+        )
+    stats["routes"] = {nom: {**valeurs, "cout_chf": round(valeurs["cout_chf"], 6)} for nom, valeurs in routes.items()}
+    ecrire_prometheus()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m analyseur lot", description="Analyse un lot de contrats.")
+    parser.add_argument("source", help="dossier de contrats, liste de chemins (.txt) ou manifeste JSONL")
+    parser.add_argument("--sortie", default="resultats.jsonl", help="fichier JSONL de résultats (et de reprise)")
+    parser.add_argument("--workers", type=int, default=config.LLM_CONCURRENCE, help="contrats traités en parallèle")
+    parser.add_argument("--objectif", default=OBJECTIFS[2], help="objectif par défaut (surchargé par le manifeste)")
+    parser.add_argument("--travail", default="Oui", choices=["Oui", "Non"])
+    parser.add_argument("--sans-ia", action="store_true", help="extraction et détection seulement, sans appel au modèle")
+    options = parser.parse_args(argv)
+
+    client = None if options.sans_ia else creer_client()
+    stats = executer_lot(options, client)
+    return 1 if stats["erreur"] else 0
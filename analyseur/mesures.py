@@ -0,0 +1,279 @@
+# --- Mesures : durée de chaque étape, jetons et coût des appels IA, export Prometheus ---
+#
+# Chaque étape est un intervalle (`with etape("extraction.fichier", fichier=...)`) qui est
+#   - ajouté à la trace de la session en cours (variable de contexte, propagée aux threads
+#     par `contextvars.copy_context()`), pour le panneau d'administration ;
+#   - agrégé dans le registre du processus (histogrammes, compteurs de jetons et de coût),
+#     exporté au format texte Prometheus (fichier et/ou point HTTP) ;
+#   - journalisé en JSON sur le logger « analyseur.mesures ».
+import collections
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Prix publics en USD par million de jetons : (prompt, réponse)
+PRIX_MODELES = {
+    "gpt-4": (30.0, 60.0),
+    "gpt-4-32k": (60.0, 120.0),
+    "gpt-4-turbo": (10.0, 30.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+
+# Bornes (secondes) des histogrammes de durée
+BORNES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def cout_chf(model, jetons_prompt, jetons_reponse):
+    prix = next(
+        (PRIX_MODELES[p] for p in sorted(PRIX_MODELES, key=len, reverse=True) if model.startswith(p)),
+        PRIX_MODELES["gpt-4"]
+    )
+    usd = (jetons_prompt * prix[0] + jetons_reponse * prix[1]) / 1_000_000
+    return usd * config.TAUX_USD_CHF
+
+
+class Trace:
+    # Étapes d'une session (bornées : une session très longue garde les plus récentes)
+    def __init__(self, session=None, taille_max=5000):
+        self.session = session or uuid.uuid4().hex[:12]
+        self.etapes = collections.deque(maxlen=taille_max)
+        self._verrou = threading.Lock()
+
+    def ajouter(self, mesure):
+        with self._verrou:
+            self.etapes.append(mesure)
+
+    def repartition(self):
+        # {étape: {"nombre", "secondes", "jetons_prompt", "jetons_reponse", "cout_chf"}}, la plus lente d'abord
+        with self._verrou:
+            etapes = list(self.etapes)
+        totaux = {}
+        for mesure in etapes:
+            total = totaux.setdefault(mesure["etape"], {
+                "nombre": 0, "secondes": 0.0, "jetons_prompt": 0, "jetons_reponse": 0, "cout_chf": 0.0
+            })
+            total["nombre"] += 1
+            total["secondes"] += mesure["duree"]
+            for cle in ("jetons_prompt", "jetons_reponse", "cout_chf"):
+                total[cle] += mesure.get(cle, 0)
+        return dict(sorted(totaux.items(), key=lambda e: -e[1]["secondes"]))
+
+    def par_route(self):
+        # Appels IA par route (faits, analyse, question…) : modèles, latence p50/p95,
+        # premier token p50 (flux), jetons et coût
+        with self._verrou:
+            etapes = [m for m in self.etapes if "route" in m and "modele" in m]
+        routes = {}
+        for mesure in etapes:
+            route = routes.setdefault(mesure["route"] or "autre", {
+                "modeles": set(), "durees": [], "premiers_tokens": [], "jetons": 0, "cout_chf": 0.0, "erreurs": 0
+            })
+            route["modeles"].add(mesure["modele"])
+            route["durees"].append(mesure["duree"])
+            if "premier_token" in mesure:
+                route["premiers_tokens"].append(mesure["premier_token"])
+            route["jetons"] += mesure.get("jetons_prompt", 0) + mesure.get("jetons_reponse", 0)
+            route["cout_chf"] += mesure.get("cout_chf", 0.0)
+            route["erreurs"] += "erreur" in mesure
+        return {
+            nom: {
+                "modeles": ", ".join(sorted(route["modeles"])),
+                "appels": len(route["durees"]),
+                "p50_s": quantile(route["durees"], 0.5),
+                "p95_s": quantile(route["durees"], 0.95),
+                "premier_token_p50_s": quantile(route["premiers_tokens"], 0.5),
+                "jetons": route["jetons"],
+                "cout_chf": route["cout_chf"],
+                "erreurs": route["erreurs"],
+            }
+            for nom, route in sorted(routes.items(), key=lambda e: -sum(e[1]["durees"]))
+        }
+
+
+def quantile(valeurs, q):
+    if not valeurs:
+        return None
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(q * len(valeurs)))]
+
+
+_trace = contextvars.ContextVar("trace", default=None)
+
+
+def activer_trace(trace):
+    # À appeler au début de chaque exécution de la page (ou d'un lot)
+    _trace.set(trace)
+    return trace
+
+
+def trace_courante():
+    return _trace.get()
+
+
+class Registre:
+    # Agrégats du processus, toutes sessions confondues
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self.durees = {}  # étape -> [compte par borne..., +Inf, somme]
+        self.durees_routes = {}  # (route, modèle) -> idem, appels IA seulement
+        self.jetons = collections.Counter()  # (modèle, "prompt"|"reponse") -> jetons
+        self.couts = collections.Counter()  # modèle -> CHF
+        self.erreurs = collections.Counter()  # étape -> nombre
+
+    @staticmethod
+    def _histogramme(table, cle, duree):
+        seaux = table.setdefault(cle, [0] * (len(BORNES) + 2))
+        for i, borne in enumerate(BORNES):
+            if duree <= borne:
+                seaux[i] += 1
+        seaux[-2] += 1
+        seaux[-1] += duree
+
+    def observer(self, mesure):
+        with self._verrou:
+            self._histogramme(self.durees, mesure["etape"], mesure["duree"])
+            if "modele" in mesure and "route" in mesure:
+                self._histogramme(self.durees_routes, (mesure["route"] or "autre", mesure["modele"]), mesure["duree"])
+            if "modele" in mesure:
+                self.jetons[mesure["modele"], "prompt"] += mesure.get("jetons_prompt", 0)
+                self.jetons[mesure["modele"], "reponse"] += mesure.get("jetons_reponse", 0)
+                self.couts[mesure["modele"]] += mesure.get("cout_chf", 0.0)
+            if "erreur" in mesure:
+                self.erreurs[mesure["etape"]] += 1
+
+    def prometheus(self):
+        with self._verrou:
+            lignes = [
+                "# HELP analyseur_etape_secondes Durée des étapes du traitement",
+                "# TYPE analyseur_etape_secondes histogram",
+            ]
+            for nom, seaux in sorted(self.durees.items()):
+                for borne, compte in zip(BORNES, seaux):
+                    lignes.append(f'analyseur_etape_secondes_bucket{{etape="{nom}",le="{borne}"}} {compte}')
+                lignes.append(f'analyseur_etape_secondes_bucket{{etape="{nom}",le="+Inf"}} {seaux[-2]}')
+                lignes.append(f'analyseur_etape_secondes_count{{etape="{nom}"}} {seaux[-2]}')
+                lignes.append(f'analyseur_etape_secondes_sum{{etape="{nom}"}} {seaux[-1]:.6f}')
+            lignes += ["# HELP analyseur_llm_route_secondes Durée des appels IA par route et modèle",
+                       "# TYPE analyseur_llm_route_secondes histogram"]
+            for (route, modele), seaux in sorted(self.durees_routes.items()):
+                etiquettes = f'route="{route}",modele="{modele}"'
+                for borne, compte in zip(BORNES, seaux):
+                    lignes.append(f'analyseur_llm_route_secondes_bucket{{{etiquettes},le="{borne}"}} {compte}')
+                lignes.append(f'analyseur_llm_route_secondes_bucket{{{etiquettes},le="+Inf"}} {seaux[-2]}')
+                lignes.append(f'analyseur_llm_route_secondes_count{{{etiquettes}}} {seaux[-2]}')
+                lignes.append(f'analyseur_llm_route_secondes_sum{{{etiquettes}}} {seaux[-1]:.6f}')
+            lignes += ["# HELP analyseur_etape_erreurs_total Étapes terminées en erreur",
+                       "# TYPE analyseur_etape_erreurs_total counter"]
+            lignes += [f'analyseur_etape_erreurs_total{{etape="{nom}"}} {n}' for nom, n in sorted(self.erreurs.items())]
+            lignes += ["# HELP analyseur_llm_jetons_total Jetons consommés par modèle",
+                       "# TYPE analyseur_llm_jetons_total counter"]
+            lignes += [f'analyseur_llm_jetons_total{{modele="{m}",type="{t}"}} {n}'
+                       for (m, t), n in sorted(self.jetons.items())]
+            lignes += ["# HELP analyseur_llm_cout_chf_total Coût estimé des appels IA (CHF)",
+                       "# TYPE analyseur_llm_cout_chf_total counter"]
+            lignes += [f'analyseur_llm_cout_chf_total{{modele="{m}"}} {c:.6f}' for m, c in sorted(self.couts.items())]
+        return "\n".join(lignes) + "\n"
+
+
+registre = Registre()
+_derniere_ecriture = 0.0
+
+
+def ecrire_prometheus(chemin=None):
+    # Écriture atomique (le collecteur node_exporter « textfile » ne doit pas lire un fichier partiel)
+    global _derniere_ecriture
+    chemin = chemin or config.METRIQUES_FICHIER
+    if not chemin:
+        return
+    _derniere_ecriture = time.monotonic()
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "w", encoding="utf-8") as f:
+        f.write(registre.prometheus())
+    os.replace(temporaire, chemin)
+
+
+def enregistrer(nom, duree, **attributs):
+    # Point d'entrée commun : étapes chronométrées ici ou ailleurs (ex. dans un processus OCR)
+    mesure = {"etape": nom, "duree": duree, **attributs}
+    trace = _trace.get()
+    if trace is not None:
+        trace.ajouter(mesure)
+    registre.observer(mesure)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(
+            {"session": trace.session if trace else None, **mesure}, ensure_ascii=False, default=str
+        ))
+    if config.METRIQUES_FICHIER and time.monotonic() - _derniere_ecriture > 5:
+        try:
+            ecrire_prometheus()
+        except OSError:
+            logger.exception("écriture du fichier de métriques impossible")
+    return mesure
+
+
+@contextmanager
+def etape(nom, **attributs):
+    # Les attributs peuvent être complétés dans le bloc (ex. nombre de pages, jetons)
+    debut = time.perf_counter()
+    try:
+        yield attributs
+    except BaseException as e:
+        attributs["erreur"] = type(e).__name__
+        raise
+    finally:
+        enregistrer(nom, time.perf_counter() - debut, **attributs)
+
+
+def enregistrer_llm(nom, model, duree, jetons_prompt, jetons_reponse, **attributs):
+    return enregistrer(
+        nom, duree, modele=model, jetons_prompt=jetons_prompt, jetons_reponse=jetons_reponse,
+        cout_chf=round(cout_chf(model, jetons_prompt, jetons_reponse), 6), **attributs
+    )
+
+
+_serveur = None
+_verrou_serveur = threading.Lock()
+
+
+def servir_prometheus(port=None, hote=None):
+    # Point HTTP /metrics dans un thread du processus (un seul par processus)
+    global _serveur
+    port = port or config.METRIQUES_PORT
+    hote = hote or config.METRIQUES_HOTE
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Gestionnaire(BaseHTTPRequestHandler):
+        def do_GET(self):
+            corps = registre.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def log_message(self, *args):
+            pass
+
+    with _verrou_serveur:
+        if _serveur is None:
+            try:
+                _serveur = ThreadingHTTPServer((hote, port), Gestionnaire)
+            except OSError:
+                # Port déjà pris (ex. autre worker sur la même machine) : pas d'export HTTP ici
+                logger.warning("port de métriques %s indisponible", port)
+                return None
+            threading.Thread(target=_serveur.serve_forever, name="metriques-http", daemon=True).start()
+        return _serveur
@@ -0,0 +1,105 @@
+# --- Détection des mots-clés de couverture en une seule passe par contrat ---
+import re
+import unicodedata
+from collections import defaultdict
+
+PRESTATIONS_RECONNUES = [
+    "dentaire", "orthodontie", "lunettes", "optique",
+    "hospitalisation", "privée", "mi-privée", "chambre",
+    "check-up", "bilan santé", "médecine alternative",
+    "ambulance", "transport", "sauvetage", "étranger"
+]
+
+# Mots servant au résumé synthétique (note sur 10)
+MOTS_LAMAL = ["lamal"]
+MOTS_LCA = ["complémentaire", "lca", "lunettes", "dentaire", "médecine alternative", "orthodontie"]
+MOTS_HOSPITALISATION = ["hospitalisation", "chambre"]
+
+# Autres prestations de la base LCA (comparaison avec les niveaux standards)
+MOTS_COMPLEMENTAIRES = [
+    "promotion de la santé", "fitness", "médecines douces", "médicaments", "moyens auxiliaires"
+]
+
+
+def normaliser(texte):
+    # Minuscules et sans accents ; NFKD peut changer la longueur (ligatures), les
+    # positions renvoyées par le détecteur portent donc sur le texte normalisé
+    texte = unicodedata.normalize("NFKD", texte.lower())
+    return "".join(c for c in texte if not unicodedata.combining(c))
+
+
+class DetecteurMotsCles:
+    # Une seule expression compilée pour tous les mots : recherche uniquement aux
+    # frontières de mots, pluriel en -s/-x accepté, espaces internes souples.
+    # Le motif est dans un lookahead pour que des mots imbriqués soient tous
+    # trouvés (« privée » dans « mi-privée »).
+    def __init__(self, mots):
+        self.libelles = {}
+        for mot in mots:
+            self.libelles.setdefault(normaliser(mot), mot)
+        alternatives = sorted(self.libelles, key=len, reverse=True)
+        motif = "|".join(re.escape(m).replace(r"\ ", r"\s+") for m in alternatives)
+        self._motif = re.compile(r"\b(?=(" + motif + r")(?:s|x)?\b)")
+        self._par_forme = {}
+
+    def _libelle(self, trouve):
+        # Ramène la forme trouvée (espaces variables) au libellé d'origine
+        if trouve not in self._par_forme:
+            self._par_forme[trouve] = self.libelles[" ".join(trouve.split())]
+        return self._par_forme[trouve]
+
+    def positions(self, texte):
+        # {libellé: [positions dans le texte normalisé]} des mots présents
+        resultat = defaultdict(list)
+        for m in self._motif.finditer(normaliser(texte)):
+            resultat[self._libelle(m.group(1))].append(m.start())
+        return dict(resultat)
+
+
+detecteur = DetecteurMotsCles(
+    PRESTATIONS_RECONNUES + MOTS_LAMAL + MOTS_LCA + MOTS_HOSPITALISATION + MOTS_COMPLEMENTAIRES
+)
+
+
+def analyser_mots_cles(texte):
+    return detecteur.positions(texte)
+
+
+def compter(occurrences):
+    return {mot: len(positions) for mot, positions in occurrences.items()}
+
+
+def evaluer_couverture(occurrences):
+    has_lamal = any(m in occurrences for m in MOTS_LAMAL)
+    has_lca = any(m in occurrences for m in MOTS_LCA)
+    has_hospital = any(m in occurrences for m in MOTS_HOSPITALISATION)
+
+    score = 0
+    if has_lamal: score += 2
+    if has_lca: score += 3
+    if has_hospital: score += 1
+    return {"has_lamal": has_lamal, "has_lca": has_lca, "has_hospital": has_hospital, "score": score}
+
+
+def _liste_contrats(numeros):
+    if len(numeros) == 2:
+        return f"à la fois dans le contrat {numeros[0]} et le contrat {numeros[1]}"
+    return "dans les contrats " + ", ".join(str(n) for n in numeros[:-1]) + f" et {numeros[-1]}"
+
+
+def detect_doublons_par_prestation(occurrences_contrats):
+    # Index inversé prestation -> contrats : linéaire en nombre de contrats
+    contrats_par_prestation = defaultdict(list)
+    for index, occurrences in enumerate(occurrences_contrats):
+        for prestation in PRESTATIONS_RECONNUES:
+            if prestation in occurrences:
+                contrats_par_prestation[prestation].append(index + 1)
+
+    doublons = []
+    explications = []
+    for prestation in PRESTATIONS_RECONNUES:
+        contrats = contrats_par_prestation.get(prestation, [])
+        if len(contrats) > 1:
+            doublons.append(prestation)
+            explications.append(f"🔁 Prestation « {prestation} » présente {_liste_contrats(contrats)}")
+    return doublons, explications
@@ -0,0 +1,158 @@
+# --- Nettoyage du texte extrait : en-têtes, pieds de page, numéros de page, mentions
+# légales et paragraphes types répétés, retirés avant les mots-clés et le prompt ---
+#
+# Une ligne est retirée si elle revient sur une bonne part des pages voisines (fenêtre
+# glissante : la partie CGA d'un contrat a souvent d'autres en-têtes que la police), avec
+# un seuil plus bas dans les marges haute et basse de la page. Les clauses juridiques
+# types recopiées sous chaque article (renvoi aux CGA, modifications par écrit…) ne sont
+# gardées qu'une fois ; une phrase qui décrit une prestation (taux, montant, plafond)
+# n'est jamais retirée : répétée sous deux garanties, elle s'applique aux deux.
+import bisect
+import re
+from collections import Counter, defaultdict
+
+from .mots_cles import normaliser
+
+# Part de la hauteur de page considérée comme marge (en-tête en haut, pied en bas)
+MARGE_RELATIVE = 0.08
+# Sans position connue (page OCR, photo) : lignes de début et de fin de page en marge
+# (au plus un cinquième des lignes de la page)
+LIGNES_MARGE = 3
+# Pages voisines (avant et après) prises en compte pour compter les répétitions
+FENETRE = 10
+# Part des pages de la fenêtre où une ligne doit revenir (marge, puis corps de page)
+REPETITION_MARGE = 0.3
+REPETITION_CORPS = 0.6
+# Dans le corps, seules les lignes assez longues et sans couverture (taux, montant) sont
+# candidates (pas les cellules de tableau)
+LONGUEUR_MIN_CORPS = 12
+# Clauses types répétées : longueur minimale et nombre d'occurrences dans le document
+LONGUEUR_MIN_PHRASE = 60
+REPETITION_PHRASE = 3
+
+_CHIFFRES = re.compile(r"\d+")
+_ESPACES = re.compile(r"\s+")
+_PHRASE = re.compile(r"[^.!?;]+[.!?;]")
+# Sur le texte normalisé (minuscules, sans accents)
+NUMERO_PAGE = re.compile(r"^\W*(page|p\.|seite|pagina)?\s*\d{1,4}(\s*(/|sur|de|von|di)\s*\d{1,4})?\W*$")
+MENTIONS = [re.compile(motif) for motif in (
+    r"^\W*(www\.|https?://)\S+\W*$",
+    r"\bche[-\s]?\d{3}\.?\d{3}\.?\d{3}\b",  # numéro IDE de l'entreprise
+    r"^\W*(tel|telephone|fax)\.?\s*:?\s*\+?[\d\s().-]{9,}$",
+    r"^\W*(imprime|edite|document genere) le\b",
+)]
+# Clauses juridiques types (texte normalisé) pouvant n'être gardées qu'une fois...
+CLAUSES_TYPES = [re.compile(motif) for motif in (
+    r"\bconditions (generales|particulieres|complementaires)\b",
+    r"\b(cga|cgaa|cca)\b",
+    r"\ben cas de divergence\b",
+    r"\btoute modification\b",
+    r"\bfont partie integrante\b",
+    r"\bsous reserve (des|de la|du)\b",
+)]
+# ... sauf si elles portent une couverture : taux, montant, plafond, franchise
+COUVERTURE = re.compile(
+    r"\d\s*%|\b(chf|fr)\b|\bfranchise|\bplafond|\brembours|\bprise en charge\b|\bquote-part\b|\bmaximum\b"
+)
+
+
+def clause_type(phrase):
+    normalisee = normaliser(phrase)
+    return any(motif.search(normalisee) for motif in CLAUSES_TYPES) and COUVERTURE.search(normalisee) is None
+
+
+def cles_ligne(ligne):
+    # (texte normalisé, même texte sans les nombres) : dans les marges, les numéros de page
+    # et les dates varient d'une page à l'autre ; dans le corps, un montant différent compte
+    exacte = _ESPACES.sub(" ", normaliser(ligne)).strip()
+    return exacte, _CHIFFRES.sub("#", exacte)
+
+
+def _repetitions(cles_pages):
+    # {clé: pages où elle figure (triées)}
+    pages_par_cle = defaultdict(list)
+    for numero, cles in enumerate(cles_pages):
+        for cle in set(cles):
+            if cle:
+                pages_par_cle[cle].append(numero)
+    return pages_par_cle
+
+
+def _repetee(pages_cle, numero, total, part, minimum):
+    debut, fin = max(0, numero - FENETRE), min(total, numero + FENETRE + 1)
+    presences = bisect.bisect_left(pages_cle, fin) - bisect.bisect_left(pages_cle, debut)
+    return presences >= max(minimum, part * (fin - debut))
+
+
+def _phrases_repetees(pages):
+    compteur = Counter()
+    for page in pages:
+        for phrase in _PHRASE.findall(_ESPACES.sub(" ", page)):
+            phrase = phrase.strip()
+            if len(phrase) >= LONGUEUR_MIN_PHRASE and clause_type(phrase):
+                compteur[phrase] += 1
+    return [phrase for phrase, n in compteur.items() if n >= REPETITION_PHRASE]
+
+
+def _retirer_phrases_repetees(pages):
+    # Clauses juridiques types : seule la première occurrence est gardée (le modèle la lit une fois)
+    for phrase in _phrases_repetees(pages):
+        motif = re.compile(r"\s+".join(re.escape(mot) for mot in phrase.split()))
+        vue = [False]
+
+        def premiere_seulement(correspondance, vue=vue):
+            if vue[0]:
+                return ""
+            vue[0] = True
+            return correspondance.group(0)
+
+        pages = [motif.sub(premiere_seulement, page) for page in pages]
+    return pages
+
+
+def nettoyer_pages(pages, marges=None):
+    # pages : texte de chaque page ; marges : pour chaque page (lignes d'en-tête, lignes
+    # de pied) d'après la mise en page, ou None (LIGNES_MARGE de chaque côté).
+    # Renvoie (pages nettoyées, {"caracteres_retires", "lignes_retirees"}).
+    # Les phrases d'abord : une clause coupée sur plusieurs lignes part en entier.
+    # Les lignes en tête et en pied de page ne sont pas touchées par ce retrait (pas de
+    # ponctuation de phrase dans un en-tête), les marges restent donc valables.
+    marges = marges or [None] * len(pages)
+    lignes_pages = [page.splitlines() for page in _retirer_phrases_repetees(pages)]
+    cles_pages = [[cles_ligne(ligne) for ligne in lignes] for lignes in lignes_pages]
+    zones_pages = []
+    for lignes, marges_page in zip(lignes_pages, marges):
+        haut, bas = marges_page or (min(LIGNES_MARGE, len(lignes) // 5),) * 2
+        zones_pages.append([rang < haut or rang >= len(lignes) - bas for rang in range(len(lignes))])
+    # Répétitions comptées séparément : sans les nombres parmi les lignes de marge (un
+    # en-tête revient en marge), texte exact pour le corps de page
+    repetitions_marge = _repetitions(
+        [[c[1] for c, en_marge in zip(cles, zones) if en_marge] for cles, zones in zip(cles_pages, zones_pages)]
+    )
+    repetitions_corps = _repetitions([[c[0] for c in cles] for cles in cles_pages])
+    total = len(pages)
+    resultat = []
+    lignes_retirees = 0
+    for numero, (lignes, cles, zones) in enumerate(zip(lignes_pages, cles_pages, zones_pages)):
+        gardees = []
+        for ligne, (exacte, sans_nombres), en_marge in zip(lignes, cles, zones):
+            if not exacte:
+                continue  # ligne vide ou vidée par le retrait des clauses
+            retirer = (
+                any(motif.search(exacte) for motif in MENTIONS)
+                or (en_marge and NUMERO_PAGE.match(exacte) is not None)
+                or (total > 1 and (
+                    _repetee(repetitions_marge[sans_nombres], numero, total, REPETITION_MARGE, 2) if en_marge
+                    else len(exacte) >= LONGUEUR_MIN_CORPS and COUVERTURE.search(exacte) is None
+                    and _repetee(repetitions_corps[exacte], numero, total, REPETITION_CORPS, 3)
+                ))
+            )
+            if retirer:
+                lignes_retirees += 1
+            else:
+                gardees.append(ligne.rstrip())
+        resultat.append("".join(ligne + "\n" for ligne in gardees))
+    return resultat, {
+        "caracteres_retires": sum(len(p) for p in pages) - sum(len(p) for p in resultat),
+        "lignes_retirees": lignes_retirees,
+    }
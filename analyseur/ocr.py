@@ -0,0 +1,171 @@
+# --- OCR parallèle : pool de processus borné partagé par toutes les sessions ---
+import multiprocessing
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from . import config
+from .mesures import enregistrer
+from .ordonnanceur import ordonnanceur_ocr
+
+_pool = None
+_verrou = threading.Lock()
+_FIN = object()
+
+
+def _contexte():
+    # « fork » depuis un serveur Streamlit multi-thread est risqué : on préfère forkserver
+    methodes = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methodes else "spawn")
+
+
+def _executeur(reinitialiser=False):
+    global _pool
+    with _verrou:
+        if reinitialiser and _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=config.OCR_WORKERS, mp_context=_contexte())
+        return _pool
+
+
+def _texte_et_confiance(donnees_ocr):
+    # Sortie de image_to_data -> (texte ligne par ligne, confiance moyenne des mots)
+    lignes = {}
+    confiances = []
+    for i, mot in enumerate(donnees_ocr["text"]):
+        confiance = float(donnees_ocr["conf"][i])
+        if confiance < 0 or not mot.strip():
+            continue
+        confiances.append(confiance)
+        cle = (donnees_ocr["block_num"][i], donnees_ocr["par_num"][i], donnees_ocr["line_num"][i])
+        lignes.setdefault(cle, []).append(mot)
+    texte = "\n".join(" ".join(mots) for _, mots in sorted(lignes.items()))
+    return texte, (sum(confiances) / len(confiances) if confiances else 0.0)
+
+
+def ocr_image(donnees, config_ocr, langue, dpi_cible=None, confiance_min=None, psm_repli=None):
+    # Exécuté dans un processus du pool : imports locaux pour garder le worker léger.
+    # Sans dpi_cible : image brute et mode de segmentation fixe (comportement d'origine).
+    # Sinon l'image est préparée (voir pretraitement) puis, si la confiance moyenne reste
+    # sous confiance_min, reconnue une seconde fois en segmentation psm_repli (mise en
+    # page automatique : colonnes, tableaux) ; le meilleur des deux essais est gardé.
+    from io import BytesIO
+
+    import pytesseract
+    from PIL import Image
+
+    image = Image.open(BytesIO(donnees))
+    if dpi_cible is None:
+        return pytesseract.image_to_string(image, config=config_ocr, lang=langue)
+
+    from .pretraitement import preparer_image
+
+    image = preparer_image(image, dpi_cible)
+    sortie = pytesseract.Output.DICT
+    meilleur = _texte_et_confiance(pytesseract.image_to_data(image, config=config_ocr, lang=langue, output_type=sortie))
+    if confiance_min is not None and psm_repli is not None and meilleur[1] < confiance_min:
+        config_repli = re.sub(r"--psm \d+", f"--psm {psm_repli}", config_ocr)
+        if config_repli == config_ocr:
+            config_repli = f"{config_ocr} --psm {psm_repli}"
+        essai = _texte_et_confiance(pytesseract.image_to_data(image, config=config_repli, lang=langue, output_type=sortie))
+        meilleur = max(meilleur, essai, key=lambda resultat: resultat[1])
+    return meilleur[0]
+
+
+def _ocr_chronometre(donnees, *parametres):
+    # Durée mesurée dans le worker : la trace de la session n'existe que dans le processus parent
+    debut = time.perf_counter()
+    try:
+        texte = ocr_image(donnees, *parametres)
+    except Exception as e:
+        # Certaines exceptions (ex. TesseractNotFoundError) ne se recréent pas dans le parent :
+        # le pool serait déclaré cassé pour toutes les sessions. On renvoie un RuntimeError.
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    return texte, time.perf_counter() - debut
+
+
+def iterer_ocr(images, en_vol=None, attente=None):
+    # images : itérable de bytes (PNG/JPEG), consommé au fil de l'eau : au plus `en_vol`
+    # images sont soumises (donc en mémoire) à la fois. Produit (index, texte) au fil
+    # des fins d'OCR, index étant la position de l'image parmi les images de l'itérable.
+    # Un élément None (rien à reconnaître, ex. page PDF avec couche texte) produit aussitôt
+    # (None, None) : l'appelant reprend la main sans attendre l'OCR en cours.
+    # Chaque soumission prend une place OCR du processus (tourniquet entre sessions) ;
+    # attente(position) est appelé tant que la session attend sans rien en cours.
+    en_vol = en_vol or config.OCR_EN_VOL
+    images = iter(images)
+    rang = 0
+    futures = {}  # future -> (index, taille, instant de soumission)
+    prochaine = None  # (index, données) de l'image lue qui attend une place
+    fini = False
+    while True:
+        # L'itérable n'est lu que lorsqu'aucune image n'attend de place
+        if prochaine is None and not fini:
+            element = next(images, _FIN)
+            if element is _FIN:
+                fini = True
+            elif element is None:
+                yield None, None
+            else:
+                prochaine = (rang, element)
+                rang += 1
+            continue
+        # Attente bloquante seulement si rien n'est en cours : sinon on laisse passer
+        # les autres sessions et on revient après la prochaine image terminée
+        if prochaine is not None and len(futures) < en_vol and ordonnanceur_ocr.acquerir(
+                attente=None if futures else attente, delai=0 if futures else None):
+            index, donnees = prochaine
+            prochaine = None
+            try:
+                future = _soumettre(donnees)
+            except BaseException:
+                ordonnanceur_ocr.liberer()
+                raise
+            future.add_done_callback(_liberer_place)
+            futures[future] = (index, len(donnees), time.perf_counter())
+            continue
+        if not futures:
+            return
+        termines, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in termines:
+            index, taille, soumis = futures.pop(future)
+            texte, duree = future.result()
+            # attente : temps passé dans la file du pool avant et après le travail de Tesseract
+            enregistrer("ocr.image", duree, octets=taille, attente=round(time.perf_counter() - soumis - duree, 3))
+            yield index, texte
+
+
+def _liberer_place(future):
+    ordonnanceur_ocr.liberer()
+
+
+def ocr_parallele(images, progression=None):
+    # Renvoie les textes dans l'ordre d'entrée ; progression(index, faits, total)
+    # est appelé dans le thread appelant à chaque image terminée.
+    total = len(images)
+    textes = [None] * total
+    for faits, (index, texte) in enumerate(iterer_ocr(images), start=1):
+        textes[index] = texte
+        if progression:
+            progression(index, faits, total)
+    return textes
+
+
+def parametres_ocr():
+    # Arguments de ocr_image après l'image, tels que configurés
+    if not config.OCR_PRETRAITEMENT:
+        return (config.OCR_CONFIG, config.OCR_LANGUE)
+    return (config.OCR_CONFIG, config.OCR_LANGUE, config.OCR_DPI_CIBLE, config.OCR_CONFIANCE_MIN, config.OCR_PSM_REPLI)
+
+
+def _soumettre(donnees):
+    # bytes() : une vue mémoire (tampon du fichier téléversé) ne se transmet pas au worker
+    donnees = bytes(donnees)
+    try:
+        return _executeur().submit(_ocr_chronometre, donnees, *parametres_ocr())
+    except BrokenProcessPool:
+        return _executeur(reinitialiser=True).submit(_ocr_chronometre, donnees, *parametres_ocr())
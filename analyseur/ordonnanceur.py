@@ -0,0 +1,118 @@
+# --- Admission des travaux OCR et IA : capacité bornée par processus, tourniquet entre sessions ---
+#
+# Chaque pool (OCR, appels IA) a un nombre fixe de places. Une demande attend son tour
+# dans la file de sa session ; les sessions sont servies à tour de rôle (une place chacune),
+# si bien qu'un gros lot n'affame pas les autres utilisateurs. La session est celle de la
+# trace de mesures courante (variable de contexte, propagée aux threads de travail).
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from . import config
+from .mesures import trace_courante
+
+
+def session_courante():
+    trace = trace_courante()
+    return trace.session if trace is not None else "anonyme"
+
+
+class Ordonnanceur:
+    def __init__(self, nom, capacite):
+        self.nom = nom
+        self.capacite = capacite
+        self._condition = threading.Condition()
+        self._en_cours = 0
+        self._files = {}  # session -> deque de tickets en attente
+        self._tour = deque()  # sessions ayant au moins un ticket, dans l'ordre de service
+
+    def acquerir(self, session=None, attente=None, delai=None):
+        # Attend une place (au plus `delai` secondes si fourni) ; renvoie True si obtenue.
+        # attente(position) est appelé (dans ce thread) à chaque changement de la position
+        # de la session dans le tourniquet (1 = prochaine servie).
+        session = session or session_courante()
+        ticket = object()
+        with self._condition:
+            self._files.setdefault(session, deque()).append(ticket)
+            if session not in self._tour:
+                self._tour.append(session)
+        fin = None if delai is None else time.monotonic() + delai
+        derniere = None
+        try:
+            while True:
+                with self._condition:
+                    if self._en_cours < self.capacite and self._tour[0] == session \
+                            and self._files[session][0] is ticket:
+                        self._servir(session)
+                        return True
+                    if fin is not None and time.monotonic() >= fin:
+                        self._retirer(session, ticket)
+                        self._condition.notify_all()
+                        return False
+                    position = self._tour.index(session) + 1
+                    if attente is None or position == derniere:
+                        self._condition.wait(0.5 if fin is None else max(0.0, min(0.5, fin - time.monotonic())))
+                        continue
+                derniere = position
+                attente(position)
+        except BaseException:
+            # Abandon (erreur, rerun Streamlit pendant l'attente) : le ticket quitte la file
+            with self._condition:
+                self._retirer(session, ticket)
+                self._condition.notify_all()
+            raise
+
+    def liberer(self):
+        with self._condition:
+            self._en_cours -= 1
+            self._condition.notify_all()
+
+    @contextmanager
+    def place(self, session=None, attente=None):
+        self.acquerir(session, attente)
+        try:
+            yield
+        finally:
+            self.liberer()
+
+    def position(self, session=None):
+        # Rang de la session dans le tourniquet (None si elle n'attend rien)
+        session = session or session_courante()
+        with self._condition:
+            return self._tour.index(session) + 1 if session in self._tour else None
+
+    def etat(self):
+        with self._condition:
+            return {
+                "capacite": self.capacite,
+                "en_cours": self._en_cours,
+                "en_attente": sum(len(file) for file in self._files.values()),
+                "sessions_en_attente": len(self._tour),
+            }
+
+    def _servir(self, session):
+        file = self._files[session]
+        file.popleft()
+        self._tour.popleft()
+        if file:
+            self._tour.append(session)  # ses autres demandes repassent après les autres sessions
+        else:
+            del self._files[session]
+        self._en_cours += 1
+        self._condition.notify_all()
+
+    def _retirer(self, session, ticket):
+        file = self._files.get(session)
+        if file is None or ticket not in file:
+            return
+        file.remove(ticket)
+        if not file:
+            del self._files[session]
+            self._tour.remove(session)
+
+
+# Places OCR : une par processus Tesseract (la file du pool reste vide, l'équité se joue ici)
+ordonnanceur_ocr = Ordonnanceur("ocr", config.ORDO_OCR_CAPACITE)
+# Places IA : requêtes simultanées vers l'API pour tout le processus
+ordonnanceur_llm = Ordonnanceur("llm", config.ORDO_LLM_CAPACITE)
@@ -0,0 +1,147 @@
+# --- Pipeline d'analyse sans interface : partagé par l'app Streamlit et le mode lot ---
+import os
+
+from . import config
+from .analyse import preparer_messages
+from .base_lca import comparer_contrat, decrire_comparaison
+from .cache import empreinte
+from .jetons import compter_jetons_messages, contexte_modele
+from .llm import cache_reponses, cle_analyse, completion
+from .mesures import etape
+from .mots_cles import analyser_mots_cles, compter, detect_doublons_par_prestation, evaluer_couverture
+from .prompts import VERSION_PROMPT, messages_mise_a_jour
+from .similarite import IndexSimilarite, empreinte_contrat, meme_contenu, passages_modifies
+
+TYPES_MIME = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+
+
+def type_mime(nom_fichier):
+    return TYPES_MIME.get(os.path.splitext(nom_fichier)[1].lower())
+
+
+def detecter_contrat(pages):
+    # Mots-clés (une passe), résumé LAMal/LCA/hospitalisation et niveau LCA le plus proche
+    with etape("detection", caracteres=sum(len(page) for page in pages)):
+        texte = "\n".join(pages)
+        occurrences = analyser_mots_cles(texte)
+        comparaison = comparer_contrat(texte, occurrences)
+        empreinte_texte = empreinte_contrat(pages)
+    return {
+        "texte": texte,
+        "occurrences": occurrences,
+        "couverture": evaluer_couverture(occurrences),
+        "comparaison": comparaison,
+        "description_comparaison": decrire_comparaison(comparaison),
+        "empreinte": empreinte_texte,
+    }
+
+
+def detecter_doublons(contrats):
+    with etape("doublons", contrats=len(contrats)):
+        return detect_doublons_par_prestation([c["occurrences"] for c in contrats])
+
+
+def detecter(pages_contrats):
+    contrats = [detecter_contrat(pages) for pages in pages_contrats]
+    doublons, explications = detecter_doublons(contrats)
+    return contrats, doublons, explications
+
+
+def cle_contrat(contrat, objectif, travail, model=None):
+    return cle_analyse(
+        contrat["texte"], objectif, travail, model or config.MODELE_ANALYSE, contrat["description_comparaison"]
+    )
+
+
+# Contrats déjà analysés par ce processus (toutes sessions) : clé d'analyse -> empreinte
+index_analyses = IndexSimilarite(config.SIMILARITE_ENTREES)
+
+
+def contexte_analyse(objectif, travail, model):
+    return empreinte("contexte_analyse", VERSION_PROMPT, model, objectif, travail)
+
+
+def memoriser_analyse(contrat, cle, objectif, travail, model=None):
+    # À appeler une fois l'analyse du contrat dans le cache des réponses (sous `cle`)
+    contexte = contexte_analyse(objectif, travail, model or config.MODELE_ANALYSE)
+    index_analyses.ajouter(cle, contrat["empreinte"]["signature"], {
+        "contexte": contexte, "empreinte": contrat["empreinte"]
+    })
+
+
+def chercher_analyse_proche(pages, contrat, objectif, travail, model=None):
+    # Contrat quasi identique déjà analysé pour le même profil et le même modèle :
+    #   {"mode": "identique", "texte": ...} : mêmes lignes une fois normalisées, l'analyse vaut telle quelle ;
+    #   {"mode": "differences", "messages": ...} : seuls les passages modifiés partent au modèle ;
+    #   None : analyse complète (rien de proche, ou trop de différences).
+    # "similarite" donne la similarité estimée avec le contrat retrouvé.
+    model = model or config.MODELE_ANALYSE
+    contexte = contexte_analyse(objectif, travail, model)
+    with etape("similarite", index=len(index_analyses)) as attributs:
+        candidats = index_analyses.chercher(
+            contrat["empreinte"]["signature"], config.SIMILARITE_MIN, filtre=lambda d: d["contexte"] == contexte
+        )
+        for score, cle, donnees in candidats:
+            analyse = cache_reponses.get(cle)
+            if analyse is None:
+                continue  # analyse sortie du cache entre-temps
+            attributs["similarite"] = round(score, 3)
+            if meme_contenu(contrat["empreinte"], donnees["empreinte"]):
+                attributs["mode"] = "identique"
+                return {"mode": "identique", "similarite": score, "texte": analyse}
+            passages, disparues = passages_modifies(pages, donnees["empreinte"])
+            modifie = sum(len(p["texte"]) for p in passages)
+            attributs["part_modifiee"] = round(modifie / max(1, len(contrat["texte"])), 3)
+            if modifie > config.SIMILARITE_PART_MODIFIEE * len(contrat["texte"]):
+                break
+            messages = messages_mise_a_jour(
+                analyse, passages, disparues, objectif, travail, contrat["description_comparaison"]
+            )
+            if compter_jetons_messages(messages, model) + config.JETONS_REPONSE > contexte_modele(model):
+                break
+            attributs["mode"] = "differences"
+            return {"mode": "differences", "similarite": score, "messages": messages}
+        attributs["mode"] = "complete"
+    return None
+
+
+def analyser_contrat(client, pages, contrat, objectif, travail, model=None, details=None):
+    # Analyse IA complète (sans streaming), servie par le cache des réponses si possible,
+    # ou reprise d'un contrat quasi identique déjà analysé. Renvoie (texte, depuis_cache).
+    # Si `details` (dict) est fourni, on y note la reprise ("mode", "similarite").
+    model = model or config.MODELE_ANALYSE
+    details = {} if details is None else details
+    cle = cle_contrat(contrat, objectif, travail, model)
+    en_cache = cache_reponses.get(cle)
+    if en_cache is not None:
+        memoriser_analyse(contrat, cle, objectif, travail, model)
+        return en_cache, True
+    proche = chercher_analyse_proche(pages, contrat, objectif, travail, model)
+    if proche is not None:
+        details.update(mode=proche["mode"], similarite=round(proche["similarite"], 3))
+    if proche is not None and proche["mode"] == "identique":
+        texte = proche["texte"]
+    else:
+        if proche is not None:
+            messages = proche["messages"]
+        else:
+            messages = preparer_messages(client, pages, objectif, travail, model, contrat["description_comparaison"])
+        texte = completion(client, messages, model, route="analyse")
+    if texte:
+        cache_reponses.set(cle, texte)
+        memoriser_analyse(contrat, cle, objectif, travail, model)
+    return texte, False
+
+
+def resume_contrat(contrat):
+    # Partie sérialisable (JSON) du résultat de détection
+    return {
+        "couverture": contrat["couverture"],
+        "mots_cles": compter(contrat["occurrences"]),
+        "comparaison": contrat["comparaison"],
+    }
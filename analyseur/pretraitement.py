@@ -0,0 +1,105 @@
+# --- Préparation des images avant OCR : niveaux de gris, résolution cible, binarisation,
+# redressement et recadrage sur la zone de texte (exécuté dans les workers OCR) ---
+import numpy as np
+from PIL import Image, ImageOps
+
+# Largeur d'une page A4 en pouces : sert à estimer la résolution d'une photo sans DPI
+LARGEUR_PAGE_POUCES = 8.27
+# Redressement : angles essayés (degrés), grossièrement puis finement autour du meilleur
+ANGLE_MAX = 5.0
+PAS_GROSSIER = 1.0
+PAS_FIN = 0.25
+# Largeur de l'image réduite sur laquelle l'angle est estimé
+LARGEUR_ESTIMATION = 600
+# Une ligne (ou colonne) appartient à la zone de texte au-delà de cette part de pixels noirs
+DENSITE_TEXTE = 0.02
+MARGE_RECADRAGE = 20
+
+
+def resolution(image):
+    # La résolution déclarée n'est crue que si elle donne une largeur de page plausible
+    # (les téléphones écrivent souvent 72 dpi quelle que soit la photo)
+    dpi = image.info.get("dpi")
+    if dpi and dpi[0] > 0 and 5 <= image.width / dpi[0] <= 14:
+        return float(dpi[0])
+    return image.width / LARGEUR_PAGE_POUCES
+
+
+def reduire(image, dpi_cible):
+    # Jamais d'agrandissement : seules les photos plus fines que nécessaire sont réduites
+    facteur = dpi_cible / resolution(image)
+    if facteur >= 1:
+        return image
+    taille = (max(1, round(image.width * facteur)), max(1, round(image.height * facteur)))
+    return image.resize(taille, Image.LANCZOS)
+
+
+def seuil_otsu(histogramme):
+    # histogramme : 256 effectifs de niveaux de gris ; seuil maximisant la variance inter-classes
+    histogramme = np.asarray(histogramme, dtype=np.float64)
+    poids = np.cumsum(histogramme)
+    sommes = np.cumsum(histogramme * np.arange(256))
+    total, somme_totale = poids[-1], sommes[-1]
+    fond = total - poids
+    with np.errstate(divide="ignore", invalid="ignore"):
+        moyenne_sombre = sommes / poids
+        moyenne_claire = (somme_totale - sommes) / fond
+        variance = poids * fond * (moyenne_sombre - moyenne_claire) ** 2
+    return int(np.nanargmax(variance))
+
+
+def binariser(image):
+    # Histogramme et table de correspondance PIL : pas de tableau de la taille de l'image
+    seuil = seuil_otsu(image.histogram())
+    return image.point([0] * (seuil + 1) + [255] * (255 - seuil))
+
+
+def _nettete_lignes(noir, angle):
+    # Variance du profil horizontal : maximale quand les lignes de texte sont horizontales
+    profil = np.asarray(noir.rotate(angle, resample=Image.NEAREST, fillcolor=0), dtype=np.float32).sum(axis=1)
+    return float(profil.var())
+
+
+def angle_inclinaison(image_binaire):
+    # Estimé sur une version réduite (texte en blanc sur noir pour que la rotation ajoute du fond)
+    facteur = min(1.0, LARGEUR_ESTIMATION / image_binaire.width)
+    petite = image_binaire.resize(
+        (max(1, int(image_binaire.width * facteur)), max(1, int(image_binaire.height * facteur))), Image.NEAREST
+    )
+    noir = ImageOps.invert(petite)
+    angles = np.arange(-ANGLE_MAX, ANGLE_MAX + PAS_GROSSIER / 2, PAS_GROSSIER)
+    meilleur = max(angles, key=lambda a: _nettete_lignes(noir, a))
+    fins = np.arange(meilleur - PAS_GROSSIER + PAS_FIN, meilleur + PAS_GROSSIER, PAS_FIN)
+    return float(max(fins, key=lambda a: _nettete_lignes(noir, a)))
+
+
+def redresser(image_binaire):
+    angle = angle_inclinaison(image_binaire)
+    if abs(angle) < PAS_FIN:
+        return image_binaire
+    return image_binaire.rotate(angle, resample=Image.NEAREST, expand=True, fillcolor=255)
+
+
+def recadrer(image_binaire):
+    # Boîte englobante des lignes et colonnes assez denses en pixels noirs (le bruit isolé est ignoré)
+    noir = np.asarray(image_binaire, dtype=np.uint8) == 0
+    lignes = np.flatnonzero(np.count_nonzero(noir, axis=1) > DENSITE_TEXTE * noir.shape[1])
+    colonnes = np.flatnonzero(np.count_nonzero(noir, axis=0) > DENSITE_TEXTE * noir.shape[0])
+    if not len(lignes) or not len(colonnes):
+        return image_binaire
+    haut = max(0, lignes[0] - MARGE_RECADRAGE)
+    bas = min(image_binaire.height, lignes[-1] + 1 + MARGE_RECADRAGE)
+    gauche = max(0, colonnes[0] - MARGE_RECADRAGE)
+    droite = min(image_binaire.width, colonnes[-1] + 1 + MARGE_RECADRAGE)
+    return image_binaire.crop((gauche, haut, droite, bas))
+
+
+def preparer_image(image, dpi_cible):
+    # Image PIL quelconque -> image binaire redressée et recadrée, à dpi_cible au plus
+    facteur = dpi_cible / resolution(image)
+    if facteur < 1 and image.format == "JPEG":
+        # Décodage JPEG directement en niveaux de gris, à l'échelle réduite la plus proche
+        image.draft("L", (int(image.width * facteur), int(image.height * facteur)))
+    image = ImageOps.exif_transpose(image)  # photos de téléphone prises de côté
+    image = reduire(image.convert("L"), dpi_cible)
+    return recadrer(redresser(binariser(image)))
@@ -0,0 +1,189 @@
+# --- Prompts envoyés au modèle ---
+
+# À incrémenter à chaque modification d'un prompt : invalide le cache des réponses
+VERSION_PROMPT = 5
+
+PROMPT_SYSTEME_ANALYSE = """
+Tu es un assistant IA expert, neutre et bienveillant, spécialisé en assurance santé suisse lamal et lca et hospitalisation.
+
+🎓 Tu n’es affilié à **aucun assureur** (ni Groupe Mutuel, ni AXA, etc.). Tu es un conseiller virtuel **100% indépendant**.
+
+🧠 Tu t'appuies sur :
+- Une base de données interne de contrats santé suisses (LAMal + LCA)
+- Des prestations types avec **montants de remboursement par niveau** (optique, hospitalisation, médecine alternative, etc.)
+- Et des connaissances générales issues du web
+
+🎯 Ta mission :
+1. **Analyser le contrat fourni**
+2. Identifier ce qu’il **couvre ou oublie**
+3. Comparer ces prestations à celles de ta **base interne**
+4. **Suggérer des pistes d'amélioration** (ex : chambre privée, soins dentaires, couverture à l’étranger)
+5. Fournir, si possible, des **montants concrets et des prestations que tu as dans ta base de donnée** (ex : "votre contrat ne couvre pas les lunettes, alors que la moyenne du marché est 150 CHF/3 ans")
+
+📋 Exemples de comparaison :
+- "Votre contrat ne couvre pas l’hospitalisation semi-privée (valeur typique : 80% jusqu’à 5000 CHF/an)"
+- "Vous avez une couverture dentaire limitée ; certains niveaux offrent 70% jusqu’à 10'000 CHF/an jusqu’à 25 ans"
+
+🗣 Ton style est :
+- Clair, pédagogique, **jamais commercial**
+- Tu **ne recommandes jamais une compagnie spécifique**
+- Tu proposes des **améliorations génériques ou par niveau** (ex : "niveau 3", "standard du marché")
+
+❌ Tu ne dois jamais dire "je travaille pour [nom assureur]"
+✅ Tu dis : "selon la base de données IA et la société mon fidele conseiller" ou "selon les standards du marché suisse"
+        """
+
+
+def construire_prompt_analyse(texte, objectif, travail, intro="Voici le contenu du contrat :", comparaison=""):
+    if comparaison:
+        comparaison = f"""
+Comparaison déjà calculée avec ta base interne (utilise-la pour comparer le contrat à ta base interne, sans la recalculer) :
+{comparaison}
+"""
+    return f"""
+Tu es un expert en assurance santé suisse. Analyse ce contrat en 3 sections :
+1. **LAMal** : quels soins sont couverts ? Montants annuels et franchises ? si la personne veut reduire le coût il doit augmenter sa franchise au maximum ou changer de model de la base
+2. **LCA** : quelles prestations complémentaires ? Exemples (dentaire, lunettes, médecines douces, etc.) ? Limites ? les remboursements 
+3. **Hospitalisation** : type de chambre, choix du médecin ou de l’hôpital, montant maximal remboursé ?
+
+- Présente les garanties **en bullet points clairs**.
+- Si une section est absente (ex : pas de LAMal), mentionne-le clairement en gras.
+- Fais une synthèse finale avec une **note sur 10 en gras** et une **recommandation personnalisée en fonction de ce que la personne veut faire dans son objectif de depart**.
+- Sois bienveillant, pédagogique, et évite le jargon.
+
+Profil de la personne :
+- Objectif principal : {objectif}
+- Travaille au moins 8h/semaine (accidents couverts par l’employeur) : {travail}
+{comparaison}
+{intro}
+{texte}
+"""
+
+
+def construire_prompt_mise_a_jour(analyse_precedente, passages, disparues, objectif, travail, comparaison=""):
+    if comparaison:
+        comparaison = f"""
+Comparaison déjà calculée avec ta base interne pour la nouvelle version :
+{comparaison}
+"""
+    modifications = "\n\n".join(f"[Page {p['page']}]\n{p['texte']}" for p in passages) or "(aucun passage nouveau)"
+    return f"""
+Voici ton analyse d’une version précédente de ce contrat, presque identique :
+{analyse_precedente}
+
+Dans la nouvelle version, seuls les passages ci-dessous sont nouveaux ou modifiés ; {disparues} ligne(s) de l’ancienne version n’y figurent plus. Tout le reste du contrat est inchangé.
+{modifications}
+
+Profil de la personne :
+- Objectif principal : {objectif}
+- Travaille au moins 8h/semaine (accidents couverts par l’employeur) : {travail}
+{comparaison}
+Réécris l’analyse complète de la nouvelle version, avec la même structure (LAMal, LCA, Hospitalisation, note sur 10 en gras et recommandation). Mets à jour tout ce que les passages modifiés changent (franchise, prestations, plafonds, division d’hospitalisation) et garde le reste tel quel.
+"""
+
+
+def messages_mise_a_jour(analyse_precedente, passages, disparues, objectif, travail, comparaison=""):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_ANALYSE},
+        {"role": "user", "content": construire_prompt_mise_a_jour(
+            analyse_precedente, passages, disparues, objectif, travail, comparaison
+        )}
+    ]
+
+
+PROMPT_SYSTEME_QUESTION = "Tu es un assistant expert en assurance suisse. Donne des réponses claires, pédagogiques et personnalisées selon les contrats analysés. Appuie-toi sur les extraits fournis et cite leur référence entre crochets (ex : [Contrat 2, page 3])."
+
+
+def messages_question(extraits, question):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_QUESTION},
+        {"role": "user", "content": f"Voici les extraits de mes contrats les plus pertinents pour ma question :\n{extraits}\nEt voici ma question :\n{question}"}
+    ]
+
+
+def messages_analyse(texte, objectif, travail, comparaison=""):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_ANALYSE},
+        {"role": "user", "content": construire_prompt_analyse(texte, objectif, travail, comparaison=comparaison)}
+    ]
+
+
+# --- Contrats longs : extraction par morceau (map) puis synthèse (reduce) ---
+
+PROMPT_SYSTEME_EXTRACTION = "Tu extrais de façon factuelle et concise les garanties d’un contrat d’assurance santé suisse. Tu n’inventes rien."
+
+
+def construire_prompt_extraction(morceau):
+    return f"""
+Voici un extrait (pages {morceau["page_debut"]} à {morceau["page_fin"]}) d’un contrat d’assurance santé.
+Relève uniquement les informations utiles, en bullet points courts, classées sous :
+- **LAMal** : franchise, modèle, soins couverts, montants
+- **LCA** : prestations complémentaires (dentaire, lunettes, médecines douces, étranger, etc.), taux, plafonds, durées
+- **Hospitalisation** : division (commune, mi-privée, privée), choix du médecin ou de l’hôpital, plafonds
+Cite les montants exacts (CHF, %, périodes). Si l’extrait ne contient rien d’utile, réponds « RAS ».
+
+Extrait :
+{morceau["texte"]}
+"""
+
+
+def messages_extraction(morceau):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_EXTRACTION},
+        {"role": "user", "content": construire_prompt_extraction(morceau)}
+    ]
+
+
+def messages_condensation(notes):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_EXTRACTION},
+        {"role": "user", "content": "Fusionne ces notes sur un même contrat en supprimant les redondances, sans perdre aucun montant ni aucune référence de page :\n\n" + notes}
+    ]
+
+
+def messages_synthese(notes, objectif, travail, comparaison=""):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_ANALYSE},
+        {"role": "user", "content": construire_prompt_analyse(
+            notes, objectif, travail,
+            intro="Le contrat étant long, voici les informations extraites de chacune de ses parties (avec les pages) :",
+            comparaison=comparaison
+        )}
+    ]
+
+
+# --- Faits de couverture relevés par le petit modèle, puis rédaction par le grand modèle ---
+
+def construire_prompt_faits(texte, morceau=None):
+    etendue = f" (pages {morceau['page_debut']} à {morceau['page_fin']})" if morceau else ""
+    return f"""
+Relève les garanties de ce contrat d’assurance santé suisse{etendue} et réponds uniquement par un objet JSON de la forme :
+{{
+  "lamal": {{"franchise_chf": nombre ou null, "modele": "médecin de famille, Telmed, HMO, libre choix… ou null", "quote_part": "… ou null", "accidents": "inclus, exclus ou null"}},
+  "lca": [{{"prestation": "…", "remboursement": "taux ou montant", "plafond": "… ou null", "page": nombre ou null}}],
+  "hospitalisation": {{"division": "commune, mi-privée, privée ou null", "choix_medecin": "… ou null", "choix_hopital": "… ou null", "plafond": "… ou null"}},
+  "autres": ["autre information utile (exclusion, délai, condition), courte"]
+}}
+Reprends les montants exacts (CHF, %, périodes). Mets null ou une liste vide pour ce qui n’apparaît pas.
+
+Contrat :
+{texte}
+"""
+
+
+def messages_faits(texte, morceau=None):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_EXTRACTION},
+        {"role": "user", "content": construire_prompt_faits(texte, morceau)}
+    ]
+
+
+def messages_analyse_faits(faits, objectif, travail, comparaison=""):
+    return [
+        {"role": "system", "content": PROMPT_SYSTEME_ANALYSE},
+        {"role": "user", "content": construire_prompt_analyse(
+            faits, objectif, travail,
+            intro="Voici les garanties du contrat, relevées au préalable (JSON) :",
+            comparaison=comparaison
+        )}
+    ]
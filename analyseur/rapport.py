@@ -0,0 +1,188 @@
+# --- Rapport PDF d'un lot d'analyses, construit depuis l'historique (ni IA ni extraction) ---
+#
+# Le rapport est produit une fois par lot dans un thread dédié (juste après l'enregistrement
+# du lot) puis gardé dans la base : le télécharger plus tard, même pour un ancien client,
+# n'est qu'une lecture SQLite.
+import argparse
+import contextvars
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+from .mesures import etape
+
+# À incrémenter à chaque modification de la mise en page : les rapports gardés sont refaits
+VERSION_RAPPORT = 2
+
+_executeur = None
+_verrou = threading.Lock()
+_REMPLACEMENTS = str.maketrans({
+    "’": "'", "‘": "'", "“": '"', "”": '"', "–": "-", "—": "-", "…": "...", "•": "-",
+    "\u202f": " ", "\u2009": " ", "✅": "Oui", "❌": "Non",
+})
+# Emoji ou autre caractère hors latin-1, avec l'espace qui le suit
+_HORS_LATIN1 = re.compile(r"[^\x00-\xff]+ ?")
+_GRAS = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+_TITRE = re.compile(r"^\s*#{1,6}\s*")
+_PUCE = re.compile(r"^(\s*)[-*+]\s+")
+
+
+def latin1(texte):
+    # Les polices standard de fpdf ne couvrent que latin-1 : typographie remplacée par
+    # son équivalent ASCII, emojis et autres caractères hors latin-1 retirés
+    return _HORS_LATIN1.sub("", str(texte).translate(_REMPLACEMENTS))
+
+
+def lignes_markdown(texte):
+    # [(niveau, texte)] : 1 titre, 2 puce, 0 paragraphe ; gras et italique retirés
+    resultat = []
+    for ligne in latin1(texte).splitlines():
+        ligne = _GRAS.sub(lambda m: m.group(1) or m.group(2), ligne).replace("*", "").rstrip()
+        if not ligne.strip():
+            resultat.append((0, ""))
+        elif _TITRE.match(ligne):
+            resultat.append((1, _TITRE.sub("", ligne)))
+        elif _PUCE.match(ligne):
+            resultat.append((2, _PUCE.sub(lambda m: m.group(1) + "- ", ligne)))
+        else:
+            resultat.append((0, ligne))
+    return resultat
+
+
+def generer_rapport(lot):
+    # lot : Stockage.lot(...). Renvoie le PDF (bytes).
+    from fpdf import FPDF, FPDF_VERSION
+
+    class RapportPDF(FPDF):
+        def footer(self):
+            self.set_y(-15)
+            self.set_font("Helvetica", "I", 8)
+            self.cell(0, 5, latin1(
+                f"Analyse IA indicative (version bêta), à confirmer par un conseiller - page {self.page_no()}"
+            ), align="C")
+
+    pdf = RapportPDF()
+    pdf.set_auto_page_break(True, margin=20)
+    pdf.add_page()
+
+    def paragraphe(texte, taille=10, style="", hauteur=5):
+        # Retour en marge gauche explicite : fpdf 1.7 et fpdf2 diffèrent après multi_cell
+        pdf.set_font("Helvetica", style, taille)
+        pdf.set_x(pdf.l_margin)
+        pdf.multi_cell(0, hauteur, latin1(texte))
+        pdf.set_x(pdf.l_margin)
+
+    paragraphe("Analyse de vos contrats d'assurance santé", 16, "B", 8)
+    date = time.strftime("%d.%m.%Y %H:%M", time.localtime(lot["cree_le"]))
+    paragraphe(f"Client : {lot['client'] or 'non renseigné'} - analyse du {date}", 9)
+    if lot.get("objectif"):
+        paragraphe(f"Objectif : {lot['objectif']} - travaille au moins 8h/semaine : {lot['travail']}", 9)
+    pdf.ln(4)
+
+    for rang, contrat in enumerate(lot["contrats"], start=1):
+        couverture = contrat["couverture"]
+        paragraphe(f"Contrat {rang}" + (f" - {contrat['nom']}" if contrat.get("nom") else ""), 13, "B", 7)
+        oui_non = lambda valeur: "oui" if valeur else "NON"  # noqa: E731
+        paragraphe(
+            f"LAMal : {oui_non(couverture['has_lamal'])}    Complémentaire (LCA) : {oui_non(couverture['has_lca'])}"
+            f"    Hospitalisation : {oui_non(couverture['has_hospital'])}    Note : {couverture['score']}/10", 10, "B"
+        )
+        comparaison = contrat.get("comparaison")
+        if comparaison:
+            manquantes = ", ".join(comparaison.get("manquantes") or [])
+            paragraphe(f"Niveau standard le plus proche : {comparaison['produit']}"
+                       + (f" (absent du contrat : {manquantes})" if manquantes else ""), 9)
+        pdf.ln(2)
+        if not contrat.get("analyse"):
+            # Modèle indiqué : l'analyse a été demandée mais a échoué (sinon lot sans IA)
+            if contrat.get("modele"):
+                paragraphe("Analyse IA non disponible : elle a échoué pour ce contrat. Relancez l'analyse "
+                           "ou faites vérifier ce contrat par un conseiller.", 10, "I")
+            else:
+                paragraphe("Analyse IA non demandée pour ce contrat (couverture détectée seulement).", 10, "I")
+            pdf.ln(5)
+            continue
+        for niveau, ligne in lignes_markdown(contrat["analyse"]):
+            if niveau == 1:
+                pdf.ln(1)
+                paragraphe(ligne, 11, "B", 6)
+            elif ligne:
+                paragraphe(ligne)
+            else:
+                pdf.ln(2)
+        pdf.ln(5)
+
+    paragraphe("Doublons de garanties", 13, "B", 7)
+    if lot["doublons"]:
+        for explication in lot["doublons"]:
+            paragraphe("- " + re.sub(r"<[^>]+>", "", explication))
+        paragraphe("Comparez les plafonds et durées de remboursement : une garantie en double se paie deux fois.", 9, "I")
+    else:
+        paragraphe("Aucun doublon significatif détecté entre les contrats analysés.")
+
+    if FPDF_VERSION.startswith("1."):
+        return pdf.output(dest="S").encode("latin-1")
+    return bytes(pdf.output())
+
+
+def rapport_lot(stockage, lot_id):
+    # PDF du lot : lu dans la base s'il a déjà été produit, sinon produit et gardé.
+    # None si le lot n'existe pas.
+    pdf = stockage.rapport(lot_id, VERSION_RAPPORT)
+    if pdf is not None:
+        return pdf
+    lot = stockage.lot(lot_id)
+    if lot is None:
+        return None
+    with etape("rapport", contrats=len(lot["contrats"])):
+        pdf = generer_rapport(lot)
+    stockage.enregistrer_rapport(lot_id, VERSION_RAPPORT, pdf)
+    return pdf
+
+
+def preparer_rapport(stockage, lot_id):
+    # Production en arrière-plan (Future) : le script de la page ne l'attend pas ; la durée
+    # est mesurée dans la trace de la session qui l'a demandée
+    global _executeur
+    with _verrou:
+        if _executeur is None:
+            _executeur = ThreadPoolExecutor(max_workers=config.RAPPORT_WORKERS, thread_name_prefix="rapport")
+    return _executeur.submit(contextvars.copy_context().run, rapport_lot, stockage, lot_id)
+
+
+def main(argv=None):
+    # python -m analyseur rapport --client <nom> [--lot <id>] [--sortie rapport.pdf] [--lister]
+    from .stockage import stockage
+
+    parser = argparse.ArgumentParser(prog="python -m analyseur rapport", description="Rapport PDF d'analyses enregistrées.")
+    parser.add_argument("--client", help="dernier lot de ce client")
+    parser.add_argument("--lot", type=int, help="identifiant du lot (voir --lister)")
+    parser.add_argument("--lister", action="store_true", help="liste les lots (du client si --client)")
+    parser.add_argument("--sortie", default="rapport.pdf")
+    options = parser.parse_args(argv)
+
+    base = stockage()
+    if base is None:
+        print("Historique désactivé (ANALYSEUR_STOCKAGE vide).", file=sys.stderr)
+        return 2
+    if options.lister:
+        for lot in base.lots(options.client, limite=100):
+            date = time.strftime("%Y-%m-%d %H:%M", time.localtime(lot["cree_le"]))
+            print(f"{lot['id']:6d}  {date}  {lot['contrats']:3d} contrat(s)  {lot['client'] or '-'}")
+        return 0
+    lot_id = options.lot if options.lot is not None else base.dernier_lot(options.client) if options.client else None
+    if lot_id is None:
+        print("Aucun lot trouvé (indiquer --client ou --lot).", file=sys.stderr)
+        return 1
+    debut = time.perf_counter()
+    pdf = rapport_lot(base, lot_id)
+    if pdf is None:
+        print(f"Lot {lot_id} introuvable.", file=sys.stderr)
+        return 1
+    with open(options.sortie, "wb") as f:
+        f.write(pdf)
+    print(f"{options.sortie} : lot {lot_id}, {len(pdf)} octets en {(time.perf_counter() - debut) * 1000:.1f} ms")
+    return 0
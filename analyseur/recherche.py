@@ -0,0 +1,96 @@
+# --- Index lexical BM25 des contrats téléversés, pour la question à l'assistant ---
+import math
+import re
+from collections import Counter, defaultdict
+
+from . import config
+from .cache import CacheLRU, empreinte
+from .mots_cles import normaliser
+
+_MOT = re.compile(r"\w+")
+
+MOTS_VIDES = frozenset("""
+a au aux avec ce ces dans de des du elle en et eux il je la le les leur lui ma mais me meme mes moi mon
+ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous
+est sont etre avoir ai as avons avez ont d l j n s c y quoi quel quelle quels quelles comment combien
+""".split())
+
+
+def termes(texte):
+    return [mot for mot in _MOT.findall(normaliser(texte)) if mot not in MOTS_VIDES and len(mot) > 1]
+
+
+def passages(pages_contrats, taille=config.RECHERCHE_MOTS_PASSAGE, recouvrement=config.RECHERCHE_MOTS_RECOUVREMENT):
+    # Fenêtres glissantes de mots, page par page, avec leur référence (contrat, page)
+    for index_contrat, pages in enumerate(pages_contrats, start=1):
+        for numero_page, page in enumerate(pages, start=1):
+            mots = page.split()
+            pas = max(taille - recouvrement, 1)
+            for debut in range(0, max(len(mots) - recouvrement, 1), pas):
+                texte = " ".join(mots[debut:debut + taille])
+                if texte:
+                    yield {"contrat": index_contrat, "page": numero_page, "texte": texte}
+
+
+class IndexBM25:
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+        self._frequences = []
+        self._longueurs = []
+        self._postings = defaultdict(list)  # terme -> [index_document]
+        for i, document in enumerate(self.documents):
+            compte = Counter(termes(document["texte"]))
+            self._frequences.append(compte)
+            self._longueurs.append(sum(compte.values()))
+            for terme in compte:
+                self._postings[terme].append(i)
+        n = len(self.documents)
+        self._longueur_moyenne = (sum(self._longueurs) / n) if n else 0.0
+        self._idf = {
+            terme: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for terme, docs in self._postings.items()
+        }
+
+    def rechercher(self, question, k=5):
+        # Seuls les documents contenant au moins un terme de la question sont évalués
+        scores = defaultdict(float)
+        for terme in set(termes(question)):
+            idf = self._idf.get(terme)
+            if idf is None:
+                continue
+            for i in self._postings[terme]:
+                tf = self._frequences[i][terme]
+                norme = 1 - self.b + self.b * self._longueurs[i] / (self._longueur_moyenne or 1)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norme)
+        meilleurs = sorted(scores.items(), key=lambda s: s[1], reverse=True)[:k]
+        return [dict(self.documents[i], score=score) for i, score in meilleurs]
+
+
+# Un index par ensemble de contrats téléversés, partagé par les reruns et les sessions
+_index = CacheLRU(32)
+
+
+def index_contrats(pages_contrats):
+    cle = empreinte("index-bm25", pages_contrats)
+    index = _index.get(cle)
+    if index is None:
+        index = IndexBM25(passages(pages_contrats))
+        _index.set(cle, index)
+    return index
+
+
+def extraits_pertinents(pages_contrats, question, k=config.RECHERCHE_EXTRAITS):
+    resultats = index_contrats(pages_contrats).rechercher(question, k)
+    # Repli si aucun mot de la question n'apparaît : début de chaque contrat
+    if not resultats:
+        premiers = {}
+        for passage in passages(pages_contrats):
+            premiers.setdefault(passage["contrat"], passage)
+        resultats = list(premiers.values())[:k]
+    return resultats
+
+
+def formater_extraits(extraits):
+    return "\n\n".join(f"[Contrat {e['contrat']}, page {e['page']}]\n{e['texte']}" for e in extraits)
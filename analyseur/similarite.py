@@ -0,0 +1,171 @@
+# --- Contrats quasi identiques : empreintes MinHash, index LSH et lignes modifiées ---
+#
+# Le texte normalisé (minuscules, sans accents, mots seuls) est découpé en suites de
+# TAILLE_BARDEAU mots ; la signature MinHash en garde NOMBRE_PERMUTATIONS minima, dont la
+# part commune estime la similarité de Jaccard entre deux contrats. L'index range chaque
+# signature dans BANDES seaux : seuls les contrats partageant un seau sont comparés.
+# Chaque empreinte garde aussi le hash de ses lignes, pour retrouver les passages modifiés.
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .mots_cles import normaliser
+
+NOMBRE_PERMUTATIONS = 128
+# 32 bandes de 4 valeurs : probabilité d'être candidat 1 - (1 - s⁴)³² pour une similarité
+# s, soit 99 % à s = 0,6, 23 % à s = 0,3 et 5 % à s = 0,2
+BANDES = 32
+TAILLE_BARDEAU = 5
+# Bardeaux hachés par bloc (mémoire bornée : NOMBRE_PERMUTATIONS × BLOC entiers)
+BLOC = 4096
+# Lignes de contexte gardées autour d'un passage modifié
+CONTEXTE_LIGNES = 1
+
+# Permutations h(x) = (a·x + b) mod p, a et b tirés uniformément dans [1, p) : avec
+# p = 2^31 - 1 et x réduit modulo p, a·x + b tient sur 64 bits sans dépassement
+_PREMIER = (1 << 31) - 1
+# Graine fixe : les signatures restent comparables d'un processus à l'autre
+_aleatoire = np.random.default_rng(1291)
+_A = _aleatoire.integers(1, _PREMIER, NOMBRE_PERMUTATIONS, dtype=np.uint64)
+_B = _aleatoire.integers(1, _PREMIER, NOMBRE_PERMUTATIONS, dtype=np.uint64)
+_MOT = re.compile(r"[a-z0-9]+")
+
+
+def mots(texte):
+    return _MOT.findall(normaliser(texte))
+
+
+def _hash(texte):
+    return zlib.crc32(texte.encode("utf-8"))
+
+
+def signature(texte):
+    # Tableau de NOMBRE_PERMUTATIONS entiers 32 bits, None pour un texte vide
+    liste = mots(texte)
+    if not liste:
+        return None
+    bardeaux = np.fromiter(
+        {_hash(" ".join(liste[i:i + TAILLE_BARDEAU])) for i in range(max(1, len(liste) - TAILLE_BARDEAU + 1))},
+        dtype=np.uint64
+    ) % _PREMIER
+    minima = np.full(NOMBRE_PERMUTATIONS, _PREMIER, dtype=np.uint64)
+    for debut in range(0, len(bardeaux), BLOC):
+        valeurs = (np.outer(_A, bardeaux[debut:debut + BLOC]) + _B[:, None]) % _PREMIER
+        np.minimum(minima, valeurs.min(axis=1), out=minima)
+    return minima.astype(np.uint32)
+
+
+def similarite(signature_a, signature_b):
+    # Estimation de la similarité de Jaccard (0 à 1)
+    if signature_a is None or signature_b is None:
+        return 0.0
+    return float(np.count_nonzero(signature_a == signature_b)) / NOMBRE_PERMUTATIONS
+
+
+def lignes(pages):
+    # [(page, texte de la ligne, hash de la ligne normalisée)] pour les lignes non vides
+    resultat = []
+    for numero, page in enumerate(pages, start=1):
+        for ligne in page.splitlines():
+            normalisee = " ".join(mots(ligne))
+            if normalisee:
+                resultat.append((numero, ligne.strip(), _hash(normalisee)))
+    return resultat
+
+
+def empreinte_contrat(pages):
+    lignes_contrat = lignes(pages)
+    return {
+        "signature": signature("\n".join(pages)),
+        # Hashs triés et dédoublonnés : quelques Ko par contrat, recherche par np.isin
+        "lignes": np.unique(np.fromiter((h for _, _, h in lignes_contrat), dtype=np.uint32, count=len(lignes_contrat))),
+    }
+
+
+def meme_contenu(empreinte_a, empreinte_b):
+    # Mêmes lignes une fois normalisées (ex. même PDF réenregistré, espaces ou casse différents)
+    return np.array_equal(empreinte_a["lignes"], empreinte_b["lignes"])
+
+
+def passages_modifies(pages, empreinte_precedente):
+    # Passages (avec la page) dont les lignes n'existent pas dans la version précédente,
+    # et nombre de lignes de la version précédente qui ont disparu
+    lignes_contrat = lignes(pages)
+    hashs = np.fromiter((h for _, _, h in lignes_contrat), dtype=np.uint32, count=len(lignes_contrat))
+    nouvelles = np.flatnonzero(~np.isin(hashs, empreinte_precedente["lignes"]))
+    disparues = int(np.count_nonzero(~np.isin(empreinte_precedente["lignes"], hashs)))
+    passages = []
+    for indice in nouvelles:
+        debut = max(0, indice - CONTEXTE_LIGNES)
+        fin = min(len(lignes_contrat), indice + CONTEXTE_LIGNES + 1)
+        if passages and debut <= passages[-1][1]:
+            passages[-1][1] = fin
+        else:
+            passages.append([debut, fin])
+    return [
+        {"page": lignes_contrat[debut][0], "texte": "\n".join(l[1] for l in lignes_contrat[debut:fin])}
+        for debut, fin in passages
+    ], disparues
+
+
+class IndexSimilarite:
+    # Index LSH borné (les entrées les moins récemment ajoutées ou retrouvées sortent en premier)
+    def __init__(self, capacite):
+        self.capacite = capacite
+        self._entrees = OrderedDict()  # clé -> (signature, données)
+        self._seaux = {}  # (bande, valeurs de la bande) -> ensemble de clés
+        self._verrou = threading.Lock()
+
+    @staticmethod
+    def _bandes(signature):
+        rangs = NOMBRE_PERMUTATIONS // BANDES
+        return [(b, signature[b * rangs:(b + 1) * rangs].tobytes()) for b in range(BANDES)]
+
+    def ajouter(self, cle, signature, donnees):
+        if signature is None:
+            return
+        with self._verrou:
+            self._retirer(cle)
+            self._entrees[cle] = (signature, donnees)
+            for seau in self._bandes(signature):
+                self._seaux.setdefault(seau, set()).add(cle)
+            while len(self._entrees) > self.capacite:
+                self._retirer(next(iter(self._entrees)))
+
+    def chercher(self, signature, seuil, filtre=None):
+        # [(similarité, clé, données)] au-delà du seuil, la plus proche d'abord
+        if signature is None:
+            return []
+        with self._verrou:
+            candidats = set()
+            for seau in self._bandes(signature):
+                candidats |= self._seaux.get(seau, set())
+            resultats = []
+            for cle in candidats:
+                signature_candidat, donnees = self._entrees[cle]
+                if filtre is not None and not filtre(donnees):
+                    continue
+                score = similarite(signature, signature_candidat)
+                if score >= seuil:
+                    resultats.append((score, cle, donnees))
+            resultats.sort(key=lambda r: -r[0])
+            for _, cle, _ in resultats[:1]:
+                self._entrees.move_to_end(cle)
+        return resultats
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def _retirer(self, cle):
+        entree = self._entrees.pop(cle, None)
+        if entree is None:
+            return
+        for seau in self._bandes(entree[0]):
+            cles = self._seaux.get(seau)
+            if cles is not None:
+                cles.discard(cle)
+                if not cles:
+                    del self._seaux[seau]
@@ -0,0 +1,157 @@
+# --- Historique des analyses : base SQLite partagée entre sessions, workers et mode lot ---
+#
+# Un lot = les contrats analysés ensemble pour un client (un téléversement, une entrée du
+# mode lot) et les doublons trouvés entre eux. Chaque contrat garde le hash de son texte
+# extrait, l'analyse IA, la couverture détectée et le niveau LCA le plus proche. Le rapport
+# PDF d'un lot est produit une fois puis gardé dans la base (voir rapport.py).
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from . import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lots (
+    id INTEGER PRIMARY KEY,
+    client TEXT,
+    cree_le REAL NOT NULL,
+    objectif TEXT,
+    travail TEXT,
+    doublons TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lots_client ON lots (client, cree_le);
+CREATE INDEX IF NOT EXISTS lots_date ON lots (cree_le);
+CREATE TABLE IF NOT EXISTS contrats (
+    id INTEGER PRIMARY KEY,
+    lot_id INTEGER NOT NULL REFERENCES lots (id) ON DELETE CASCADE,
+    rang INTEGER NOT NULL,
+    nom TEXT,
+    hash_texte TEXT NOT NULL,
+    pages INTEGER,
+    has_lamal INTEGER NOT NULL,
+    has_lca INTEGER NOT NULL,
+    has_hospital INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    comparaison TEXT,
+    modele TEXT,
+    analyse TEXT
+);
+CREATE INDEX IF NOT EXISTS contrats_lot ON contrats (lot_id, rang);
+CREATE INDEX IF NOT EXISTS contrats_hash ON contrats (hash_texte);
+CREATE TABLE IF NOT EXISTS rapports (
+    lot_id INTEGER PRIMARY KEY REFERENCES lots (id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    pdf BLOB NOT NULL
+);
+"""
+
+
+class Stockage:
+    # Une connexion par thread (sqlite3 ne les partage pas) ; journal WAL : les lectures
+    # (rapports, historique) ne bloquent pas l'écriture d'un lot par un autre worker
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self._local = threading.local()
+        with self._connexion() as connexion:
+            connexion.executescript(SCHEMA)
+
+    def _connexion(self):
+        connexion = getattr(self._local, "connexion", None)
+        if connexion is None:
+            if os.path.dirname(self.chemin):
+                os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+            connexion = sqlite3.connect(self.chemin, timeout=30)
+            connexion.row_factory = sqlite3.Row
+            connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.execute("PRAGMA synchronous=NORMAL")
+            connexion.execute("PRAGMA foreign_keys=ON")
+            self._local.connexion = connexion
+        return connexion
+
+    def enregistrer_lot(self, contrats, doublons=(), client=None, objectif=None, travail=None):
+        # contrats : [{"nom", "hash_texte", "pages", "couverture", "comparaison", "modele", "analyse"}]
+        # doublons : explications des doublons détectés entre ces contrats. Renvoie l'id du lot.
+        with self._connexion() as connexion:
+            lot_id = connexion.execute(
+                "INSERT INTO lots (client, cree_le, objectif, travail, doublons) VALUES (?, ?, ?, ?, ?)",
+                (client or None, time.time(), objectif, travail, json.dumps(list(doublons), ensure_ascii=False))
+            ).lastrowid
+            connexion.executemany(
+                "INSERT INTO contrats (lot_id, rang, nom, hash_texte, pages, has_lamal, has_lca, has_hospital, "
+                "score, comparaison, modele, analyse) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (lot_id, rang, c.get("nom"), c["hash_texte"], c.get("pages"),
+                     c["couverture"]["has_lamal"], c["couverture"]["has_lca"], c["couverture"]["has_hospital"],
+                     c["couverture"]["score"], json.dumps(c.get("comparaison"), ensure_ascii=False),
+                     c.get("modele"), c.get("analyse") or None)
+                    for rang, c in enumerate(contrats, start=1)
+                ]
+            )
+        return lot_id
+
+    def lots(self, client=None, depuis=None, limite=20):
+        # Lots les plus récents (d'un client si fourni), sans le détail des contrats
+        conditions, parametres = [], []
+        if client is not None:
+            conditions.append("l.client = ?")
+            parametres.append(client)
+        if depuis is not None:
+            conditions.append("l.cree_le >= ?")
+            parametres.append(depuis)
+        requete = (
+            "SELECT l.id, l.client, l.cree_le, l.objectif, l.travail, "
+            "(SELECT COUNT(*) FROM contrats c WHERE c.lot_id = l.id) AS contrats FROM lots l"
+            + (" WHERE " + " AND ".join(conditions) if conditions else "")
+            + " ORDER BY l.cree_le DESC LIMIT ?"
+        )
+        return [dict(ligne) for ligne in self._connexion().execute(requete, (*parametres, limite))]
+
+    def lot(self, lot_id):
+        # {"id", "client", "cree_le", "objectif", "travail", "doublons", "contrats": [...]} ou None
+        connexion = self._connexion()
+        ligne = connexion.execute("SELECT * FROM lots WHERE id = ?", (lot_id,)).fetchone()
+        if ligne is None:
+            return None
+        lot = dict(ligne, doublons=json.loads(ligne["doublons"]))
+        lot["contrats"] = []
+        for contrat in connexion.execute("SELECT * FROM contrats WHERE lot_id = ? ORDER BY rang", (lot_id,)):
+            contrat = dict(contrat)
+            contrat["couverture"] = {cle: contrat.pop(cle) for cle in ("has_lamal", "has_lca", "has_hospital", "score")}
+            for cle in ("has_lamal", "has_lca", "has_hospital"):
+                contrat["couverture"][cle] = bool(contrat["couverture"][cle])
+            contrat["comparaison"] = json.loads(contrat["comparaison"]) if contrat["comparaison"] else None
+            lot["contrats"].append(contrat)
+        return lot
+
+    def dernier_lot(self, client):
+        lots = self.lots(client, limite=1)
+        return lots[0]["id"] if lots else None
+
+    def rapport(self, lot_id, version):
+        ligne = self._connexion().execute(
+            "SELECT pdf FROM rapports WHERE lot_id = ? AND version = ?", (lot_id, version)
+        ).fetchone()
+        return bytes(ligne["pdf"]) if ligne is not None else None
+
+    def enregistrer_rapport(self, lot_id, version, pdf):
+        with self._connexion() as connexion:
+            connexion.execute(
+                "INSERT OR REPLACE INTO rapports (lot_id, version, pdf) VALUES (?, ?, ?)", (lot_id, version, pdf)
+            )
+
+
+_stockage = None
+_verrou = threading.Lock()
+
+
+def stockage():
+    # Base du processus (None si ANALYSEUR_STOCKAGE est vide : historique désactivé)
+    global _stockage
+    if not config.STOCKAGE:
+        return None
+    with _verrou:
+        if _stockage is None or _stockage.chemin != config.STOCKAGE:
+            _stockage = Stockage(config.STOCKAGE)
+        return _stockage
@@ -1,12 +1,18 @@
 import streamlit as st
-import fitz  # PyMuPDF
-from openai import OpenAI
-from io import BytesIO
-from PIL import Image
-import pytesseract
+import hmac
 import re
-import smtplib
-from email.message import EmailMessage
+import time
+from functools import partial
+
+from analyseur import config
+from analyseur.cache import empreinte
+from analyseur.envoi import file_envoi
+from analyseur.graphe import Graphe
+from analyseur.mesures import Trace, activer_trace, enregistrer, etape, servir_prometheus
+from analyseur.prompts import messages_question
+from analyseur.recherche import extraits_pertinents, formater_extraits
+
+debut_script = time.perf_counter()
 
 # Configuration de la page Streamlit
 st.set_page_config(page_title="Assistant IA Assurance Santé", layout="centered")
@@ -59,8 +65,19 @@ st.markdown("""
 </a>
 """, unsafe_allow_html=True)
 
-# Clé API sécurisée
-client = OpenAI(api_key=st.secrets["openai_api_key"])
+# Clé API sécurisée ; un seul client (et pool de connexions keep-alive) pour tout le processus
+@st.cache_resource
+def client_ia():
+    from analyseur.client_ia import creer_client
+
+    return creer_client(st.secrets["openai_api_key"])
+
+
+# Mesures de la session (durées, jetons, coût) et export Prometheus si configuré
+if "trace" not in st.session_state:
+    st.session_state["trace"] = Trace()
+activer_trace(st.session_state["trace"])
+servir_prometheus()
 # Objectif de l'utilisateur
 objectif = st.radio("🎯 **Quel est votre objectif principal** ?", [
     "📉 Réduire les coûts",
@@ -71,6 +88,9 @@ objectif = st.radio("🎯 **Quel est votre objectif principal** ?", [
 # Statut professionnel
 travail = st.radio("💼 **Travaillez-vous au moins 8h/semaine** ?", ["Oui", "Non"], index=0)
 
+# Référence du client : retrouver son rapport plus tard (historique des analyses)
+client_reference = st.text_input("👤 Nom ou référence du client (facultatif)").strip()
+
 # Téléversement des fichiers
 uploaded_files = st.file_uploader(
     "📂 Téléversez vos contrats (PDF ou images JPG/PNG)",
@@ -79,129 +99,110 @@ uploaded_files = st.file_uploader(
 )
 if not uploaded_files:
     st.warning("📤 Merci de téléverser au moins un contrat pour démarrer l’analyse.")
+    # Page d'accueil affichée : durée du script jusqu'ici (voir bench/demarrage.py pour le démarrage à froid)
+    enregistrer("rendu_accueil", time.perf_counter() - debut_script)
     st.stop()
-# Initialisation de la liste des textes extraits
-contract_texts = []
 
-# Extraction OCR ou texte selon type de fichier
+# Modules lourds (PyMuPDF, numpy, tiktoken, openai) : chargés au premier contrat téléversé
+from analyseur.analyse import preparer_messages  # noqa: E402
+from analyseur.extraction import DocumentTropVolumineux, iterer_pages, parametres_extraction  # noqa: E402
+from analyseur.llm import cache_reponses, flux_completion, iterer_flux  # noqa: E402
+from analyseur.pipeline import (  # noqa: E402
+    chercher_analyse_proche, cle_contrat, detecter_contrat, detecter_doublons, memoriser_analyse
+)
+from analyseur.rapport import preparer_rapport, rapport_lot  # noqa: E402
+from analyseur.similarite import meme_contenu  # noqa: E402
+from analyseur.stockage import stockage  # noqa: E402
+
+client = client_ia()
 for i, file in enumerate(uploaded_files):
     st.subheader(f"📑 Contrat {i+1}")
     if file.type.startswith("image"):
         st.image(file, caption=f"Aperçu de l’image {file.name}")
-        image = Image.open(file)
-        config_ocr = '--oem 3 --psm 6'
-        text = pytesseract.image_to_string(image, config=config_ocr, lang='fra+eng')
-    else:
-        buffer = BytesIO(file.read())
-        doc = fitz.open(stream=buffer.read(), filetype="pdf")
-        text = "\n".join(page.get_text() for page in doc)
-
-    contract_texts.append(text)
-def detect_doublons_par_prestation(textes):
-    prestations_reconnues = [
-        "dentaire", "orthodontie", "lunettes", "optique",
-        "hospitalisation", "privée", "mi-privée", "chambre",
-        "check-up", "bilan santé", "médecine alternative",
-        "ambulance", "transport", "sauvetage", "étranger"
-    ]
-
-    groupes_prestations = []
-    explications = []
-
-    for index, texte in enumerate(textes):
-        texte_base = texte.lower()
-        groupe = set()
-
-        for mot in prestations_reconnues:
-            if mot in texte_base:
-                groupe.add(mot)
-
-        groupes_prestations.append((index + 1, groupe))
-
-    doublons_intercontrats = []
-    for i in range(len(groupes_prestations)):
-        for j in range(i + 1, len(groupes_prestations)):
-            communs = groupes_prestations[i][1].intersection(groupes_prestations[j][1])
-            for prestation in communs:
-                explications.append(
-                    f"🔁 Prestation « {prestation} » présente à la fois dans le contrat {groupes_prestations[i][0]} et le contrat {groupes_prestations[j][0]}"
-                )
-                doublons_intercontrats.append(prestation)
 
-    return list(set(doublons_intercontrats)), explications
+# --- Graphe d'étapes : téléversement → extraction → détection → analyse → affichage ---
+# Chaque résultat est mémorisé dans la session par fichier (file_id), avec l'empreinte de
+# ses entrées : un rerun (widget modifié, question tapée, fichier ajouté) ne recalcule que
+# les étapes dont une entrée a changé, et seulement pour les fichiers concernés.
+if "graphe" not in st.session_state:
+    st.session_state["graphe"] = Graphe()
+graphe = st.session_state["graphe"]
+ids_fichiers = [file.file_id for file in uploaded_files]
+graphe.elaguer(ids_fichiers)
+signatures_extraction = [
+    graphe.signature("extraction", fid, file.size, parametres_extraction())
+    for fid, file in zip(ids_fichiers, uploaded_files)
+]
+signatures_detection = [graphe.signature("detection", fid, sig) for fid, sig in zip(ids_fichiers, signatures_extraction)]
+pages_contrats = [graphe.lire("extraction", fid, sig) for fid, sig in zip(ids_fichiers, signatures_extraction)]
+contrats = [graphe.lire("detection", fid, sig) for fid, sig in zip(ids_fichiers, signatures_detection)]
+for i, pages in enumerate(pages_contrats):
+    if pages is not None and contrats[i] is None:
+        contrats[i] = graphe.ecrire("detection", ids_fichiers[i], signatures_detection[i], detecter_contrat(pages))
+
+# Extraction page par page des seuls nouveaux fichiers (cache par hash du contenu, pages
+# scannées et images réparties sur un pool de processus OCR). Chaque contrat passe à la
+# détection des mots-clés (réutilisés pour le résumé, les doublons et la comparaison avec
+# le niveau standard le plus proche de la base LCA interne) dès que ses pages sont lues.
+nouveaux = [i for i, pages in enumerate(pages_contrats) if pages is None]
+if nouveaux:
+    barre_extraction = st.progress(0.0, text="📄 Extraction du texte des contrats...")
+    with etape("lecture_upload", fichiers=len(nouveaux)) as attributs:
+        # Vue sur le tampon du fichier téléversé : le contenu n'est pas copié
+        documents = [(uploaded_files[i].getbuffer(), uploaded_files[i].type) for i in nouveaux]
+        attributs["octets"] = sum(len(donnees) for donnees, _ in documents)
+    pages_lues = 0
+    termines = 0
+
+    def attente_ocr(position):
+        # Pages scannées en attente d'une place OCR (partagée avec les autres utilisateurs)
+        barre_extraction.progress(
+            termines / len(nouveaux), text=f"⏳ Lecture des scans en file d'attente : position {position}"
+        )
+
+    try:
+        for j, numero, donnee in iterer_pages(documents, attente=attente_ocr):
+            i = nouveaux[j]
+            if numero is not None:
+                pages_lues += 1
+            else:
+                pages_contrats[i] = graphe.ecrire("extraction", ids_fichiers[i], signatures_extraction[i], donnee)
+                contrats[i] = graphe.ecrire(
+                    "detection", ids_fichiers[i], signatures_detection[i], detecter_contrat(donnee)
+                )
+                termines += 1
+            barre_extraction.progress(
+                termines / len(nouveaux),
+                text=f"📄 Extraction du texte : {termines}/{len(nouveaux)} fichier(s), {pages_lues} page(s) lue(s)"
+            )
+    except DocumentTropVolumineux as e:
+        barre_extraction.empty()
+        st.error(f"📄 Document trop volumineux : {e}. Merci de le scinder ou de n'envoyer que les pages utiles.")
+        st.stop()
+    barre_extraction.empty()
+contract_texts = [contrat["texte"] for contrat in contrats]
 # --- Analyse IA pour chaque contrat ---
-doublons_detectés, explications_doublons = detect_doublons_par_prestation(contract_texts)
-
+signature_doublons = graphe.signature("doublons", None, *signatures_detection)
+resultat_doublons = graphe.lire("doublons", None, signature_doublons)
+if resultat_doublons is None:
+    resultat_doublons = graphe.ecrire("doublons", None, signature_doublons, detecter_doublons(contrats))
+doublons_detectés, explications_doublons = resultat_doublons
+couvertures = [contrat["couverture"] for contrat in contrats]
+comparaisons = [contrat["comparaison"] for contrat in contrats]
+
+# Chaque contrat reçoit sa zone d'analyse, remplie plus bas dès que la réponse arrive
+zones_analyse = []
 for i, texte in enumerate(contract_texts):
-    with st.spinner("🧠 Analyse IA du contrat en cours..."):
-        prompt = f"""
-Tu es un expert en assurance santé suisse. Analyse ce contrat en 3 sections :
-1. **LAMal** : quels soins sont couverts ? Montants annuels et franchises ? si la personne veut reduire le coût il doit augmenter sa franchise au maximum ou changer de model de la base
-2. **LCA** : quelles prestations complémentaires ? Exemples (dentaire, lunettes, médecines douces, etc.) ? Limites ? les remboursements 
-3. **Hospitalisation** : type de chambre, choix du médecin ou de l’hôpital, montant maximal remboursé ?
-
-- Présente les garanties **en bullet points clairs**.
-- Si une section est absente (ex : pas de LAMal), mentionne-le clairement en gras.
-- Fais une synthèse finale avec une **note sur 10 en gras** et une **recommandation personnalisée en fonction de ce que la personne veut faire dans son objectif de depart**.
-- Sois bienveillant, pédagogique, et évite le jargon.
-
-Voici le contenu du contrat :
-{texte[:3000]}
-"""
-        try:
-            reponse = client.chat.completions.create(
-    model="gpt-4",
-    messages=[
-        {"role": "system", "content": """
-Tu es un assistant IA expert, neutre et bienveillant, spécialisé en assurance santé suisse lamal et lca et hospitalisation.
-
-🎓 Tu n’es affilié à **aucun assureur** (ni Groupe Mutuel, ni AXA, etc.). Tu es un conseiller virtuel **100% indépendant**.
-
-🧠 Tu t'appuies sur :
-- Une base de données interne de contrats santé suisses (LAMal + LCA)
-- Des prestations types avec **montants de remboursement par niveau** (optique, hospitalisation, médecine alternative, etc.)
-- Et des connaissances générales issues du web
-
-🎯 Ta mission :
-1. **Analyser le contrat fourni**
-2. Identifier ce qu’il **couvre ou oublie**
-3. Comparer ces prestations à celles de ta **base interne**
-4. **Suggérer des pistes d'amélioration** (ex : chambre privée, soins dentaires, couverture à l’étranger)
-5. Fournir, si possible, des **montants concrets et des prestations que tu as dans ta base de donnée** (ex : "votre contrat ne couvre pas les lunettes, alors que la moyenne du marché est 150 CHF/3 ans")
-
-📋 Exemples de comparaison :
-- "Votre contrat ne couvre pas l’hospitalisation semi-privée (valeur typique : 80% jusqu’à 5000 CHF/an)"
-- "Vous avez une couverture dentaire limitée ; certains niveaux offrent 70% jusqu’à 10'000 CHF/an jusqu’à 25 ans"
-
-🗣 Ton style est :
-- Clair, pédagogique, **jamais commercial**
-- Tu **ne recommandes jamais une compagnie spécifique**
-- Tu proposes des **améliorations génériques ou par niveau** (ex : "niveau 3", "standard du marché")
-
-❌ Tu ne dois jamais dire "je travaille pour [nom assureur]"
-✅ Tu dis : "selon la base de données IA et la société mon fidele conseiller" ou "selon les standards du marché suisse"
-        """},
-        {"role": "user", "content": prompt}
-    ]
-)
-
-            resultat = reponse.choices[0].message.content
-        except Exception as e:
-            st.error(f"Erreur IA : {e}")
-            resultat = ""
-
     st.markdown(f"### 🧾 Détails de l’analyse IA du Contrat {i+1}")
-    st.markdown(resultat)
+    zone = st.empty()
+    zone.info("🧠 Analyse IA du contrat en cours...")
+    zones_analyse.append(zone)
 
     # Résumé synthétique
-    has_lamal = "lamal" in texte.lower()
-    has_lca = any(m in texte.lower() for m in ["complémentaire", "lca", "lunettes", "dentaire", "médecine alternative", "orthodontie"])
-    has_hospital = "hospitalisation" in texte.lower() or "chambre" in texte.lower()
-
-    score = 0
-    if has_lamal: score += 2
-    if has_lca: score += 3
-    if has_hospital: score += 1
+    has_lamal = couvertures[i]["has_lamal"]
+    has_lca = couvertures[i]["has_lca"]
+    has_hospital = couvertures[i]["has_hospital"]
+    score = couvertures[i]["score"]
 
     st.markdown("---")
     st.markdown(f"""
@@ -211,14 +212,137 @@ Tu es un assistant IA expert, neutre et bienveillant, spécialisé en assurance
     <li><strong>LAMal détectée :</strong> {"✅ Oui" if has_lamal else "<span style='color:red;'>❌ Non</span>"}</li>
     <li><strong>Complémentaire (LCA) détectée :</strong> {"✅ Oui" if has_lca else "<span style='color:red;'>❌ Non</span>"}</li>
     <li><strong>Hospitalisation :</strong> {"✅ Oui" if has_hospital else "<span style='color:red;'>❌ Non</span>"}</li>
+    <li><strong>Niveau standard le plus proche :</strong> {comparaisons[i]["produit"]}{" — absent du contrat : " + ", ".join(comparaisons[i]["manquantes"]) if comparaisons[i]["manquantes"] else ""}</li>
 </ul>
 <p style='font-size: 1.3em;'><strong>Note finale :</strong> {score}/10</p>
 <p><em>Conseil IA :</em> {"Pensez à compléter votre protection avec une complémentaire ou une meilleure hospitalisation." if score < 6 else "Votre couverture santé semble équilibrée selon les informations lues."}</p>
 </div>
 """, unsafe_allow_html=True)
-# --- Analyse des doublons (après avoir analysé tous les contrats) ---
-doublons_detectés, explications_doublons = detect_doublons_par_prestation(contract_texts)
 
+# Les analyses déjà faites dans la session ou connues du cache (même contrat, prompt,
+# modèle et profil) s'affichent directement. Un contrat quasi identique à un contrat déjà
+# analysé (même police en PDF et en photo, version de l'année suivante) reprend son analyse
+# telle quelle ou n'envoie au modèle que les passages modifiés ; deux copies d'un même
+# contrat dans le téléversement ne sont analysées qu'une fois. Les autres partent en même
+# temps (concurrence bornée, retry indépendant par contrat) et s'affichent token par token
+# dans leur zone ; le texte complet est ensuite mémorisé et mis en cache.
+analyses_ia = [""] * len(contract_texts)
+derniere_maj = [0.0] * len(contract_texts)
+signatures_analyse = [
+    graphe.signature("analyse", fid, sig, objectif, travail, config.MODELE_ANALYSE, config.MODELE_FAITS)
+    for fid, sig in zip(ids_fichiers, signatures_detection)
+]
+cles_analyse = [None] * len(contract_texts)
+notes_reprise = [""] * len(contract_texts)
+copies = {}  # contrat analysé -> copies identiques du même téléversement
+a_analyser = []
+messages_analyses = []
+
+
+def terminer_analyse(i, texte):
+    analyses_ia[i] = texte
+    zones_analyse[i].markdown(notes_reprise[i] + texte)
+    if texte:
+        cache_reponses.set(cles_analyse[i], texte)
+        memoriser_analyse(contrats[i], cles_analyse[i], objectif, travail)
+        graphe.ecrire("analyse", ids_fichiers[i], signatures_analyse[i], texte)
+
+
+for i, signature in enumerate(signatures_analyse):
+    en_cache = graphe.lire("analyse", ids_fichiers[i], signature)
+    if en_cache is None:
+        cles_analyse[i] = cle_contrat(contrats[i], objectif, travail)
+        en_cache = cache_reponses.get(cles_analyse[i])
+        if en_cache is not None:
+            memoriser_analyse(contrats[i], cles_analyse[i], objectif, travail)
+            graphe.ecrire("analyse", ids_fichiers[i], signature, en_cache)
+    if en_cache is not None:
+        analyses_ia[i] = en_cache
+        zones_analyse[i].markdown(en_cache)
+        continue
+    original = next((k for k in a_analyser if meme_contenu(contrats[k]["empreinte"], contrats[i]["empreinte"])), None)
+    if original is not None:
+        copies.setdefault(original, []).append(i)
+        notes_reprise[i] = f"♻️ *Même contenu que le contrat {original + 1} : analyse reprise.*\n\n"
+        zones_analyse[i].info(f"♻️ Même contenu que le contrat {original + 1} : son analyse sera reprise.")
+        continue
+    proche = chercher_analyse_proche(pages_contrats[i], contrats[i], objectif, travail)
+    if proche is not None and proche["mode"] == "identique":
+        notes_reprise[i] = f"♻️ *Contrat identique à un contrat déjà analysé ({proche['similarite']:.0%}) : analyse reprise.*\n\n"
+        terminer_analyse(i, proche["texte"])
+        continue
+    a_analyser.append(i)
+    if proche is not None:
+        notes_reprise[i] = f"♻️ *Version proche d'un contrat déjà analysé ({proche['similarite']:.0%}) : seuls les passages modifiés ont été analysés.*\n\n"
+        messages_analyses.append(proche["messages"])
+    else:
+        # Les contrats trop longs pour le modèle sont d'abord résumés par morceaux (dans le thread du contrat)
+        messages_analyses.append(partial(
+            preparer_messages, client, pages_contrats[i], objectif, travail, config.MODELE_ANALYSE,
+            contrats[i]["description_comparaison"]
+        ))
+
+for j, evenement, donnee in iterer_flux(client, messages_analyses, model=config.MODELE_ANALYSE, route="analyse"):
+    i = a_analyser[j]
+    if evenement == "delta":
+        analyses_ia[i] += donnee
+        # Limite le nombre de messages envoyés au navigateur
+        if time.monotonic() - derniere_maj[i] > 0.05:
+            zones_analyse[i].markdown(notes_reprise[i] + analyses_ia[i] + "▌")
+            derniere_maj[i] = time.monotonic()
+    elif evenement == "attente":
+        zones_analyse[i].info(f"⏳ Analyse en file d'attente : position {donnee}")
+    elif evenement == "fin":
+        terminer_analyse(i, donnee[0])
+        for copie in copies.get(i, []):
+            terminer_analyse(copie, donnee[0])
+    else:
+        # Début de réponse éventuel écarté : le contrat est enregistré sans analyse
+        analyses_ia[i] = ""
+        zones_analyse[i].error(f"Erreur IA : {donnee}")
+        for copie in copies.get(i, []):
+            zones_analyse[copie].error(f"Erreur IA : {donnee}")
+
+stats_cache = cache_reponses.statistiques()
+st.caption(
+    f"💾 Analyses réutilisées : {len(contract_texts) - len(a_analyser)}/{len(contract_texts)} "
+    f"(cache IA depuis le démarrage : {stats_cache['succes']} succès, {stats_cache['absent']} absences)"
+)
+# --- Historique : le lot (analyses, couverture, doublons) est enregistré une fois, son
+# rapport PDF produit en arrière-plan ; le téléchargement ne fait que le relire.
+# Un contrat dont l'analyse a échoué est enregistré sans analyse (signalé dans le rapport) ;
+# s'il est analysé à un rerun suivant, un nouveau lot est enregistré ---
+base_analyses = stockage()
+if base_analyses is not None:
+    signature_lot = graphe.signature(
+        "stockage", None, client_reference, signature_doublons, *signatures_analyse, [bool(t) for t in analyses_ia]
+    )
+    lot_id = graphe.lire("stockage", None, signature_lot)
+    if lot_id is None:
+        with etape("stockage", contrats=len(contrats)):
+            lot_id = base_analyses.enregistrer_lot(
+                [
+                    {
+                        "nom": file.name,
+                        "hash_texte": empreinte(contrat["texte"]),
+                        "pages": len(pages),
+                        "couverture": contrat["couverture"],
+                        "comparaison": contrat["comparaison"],
+                        "modele": config.MODELE_ANALYSE,
+                        "analyse": texte or None,
+                    }
+                    for file, contrat, pages, texte in zip(uploaded_files, contrats, pages_contrats, analyses_ia)
+                ],
+                explications_doublons if doublons_detectés else [],
+                client=client_reference, objectif=objectif, travail=travail
+            )
+        graphe.ecrire("stockage", None, signature_lot, lot_id)
+        preparer_rapport(base_analyses, lot_id)
+    st.download_button(
+        "📄 Télécharger le rapport PDF", data=partial(rapport_lot, base_analyses, lot_id),
+        file_name=f"rapport_analyse_{lot_id}.pdf", mime="application/pdf"
+    )
+# --- Analyse des doublons (calculée une seule fois, avant l'analyse IA) ---
 if len(contract_texts) > 1 and doublons_detectés:
     st.markdown("""
     <div style='background-color:#fff3cd;border-left:6px solid #ffa502;padding:1em;border-radius:10px;margin-top:1em;'>
@@ -260,15 +384,22 @@ else:
     if st.button("Obtenir une réponse de l’IA"):
         if question_utilisateur:
             try:
-                reponse_chat = client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "Tu es un assistant expert en assurance suisse. Donne des réponses claires, pédagogiques et personnalisées selon les contrats analysés."},
-                        {"role": "user", "content": f"Voici ce que contient mon contrat :\n{contract_texts[0][:2000]}\nEt voici ma question :\n{question_utilisateur}"}
-                    ]
-                )
                 st.markdown("### 🧠 Réponse de l’assistant IA")
-                st.markdown(reponse_chat.choices[0].message.content)
+                zone_reponse = st.empty()
+                reponse_chat = ""
+                # Seuls les passages les plus pertinents de tous les contrats partent dans le prompt
+                extraits = extraits_pertinents(pages_contrats, question_utilisateur)
+                messages = messages_question(formater_extraits(extraits), question_utilisateur)
+                for delta in flux_completion(
+                    client, messages, model=config.MODELE_QUESTION, route="question",
+                    attente=lambda position: zone_reponse.info(f"⏳ Question en file d'attente : position {position}")
+                ):
+                    reponse_chat += delta
+                    zone_reponse.markdown(reponse_chat + "▌")
+                zone_reponse.markdown(reponse_chat)
+                st.caption("📚 Sources : " + ", ".join(
+                    f"contrat {e['contrat']} p. {e['page']}" for e in extraits
+                ))
             except Exception as e:
                 st.error(f"Erreur IA lors de la réponse : {e}")
         else:
@@ -283,22 +414,24 @@ else:
     👤 Contact recommandé : <strong>Mon Fidèle Conseiller</strong> via <a href="mailto:info@monfideleconseiller.ch">info@monfideleconseiller.ch</a>.
     </div>
     """, unsafe_allow_html=True)
-    # Envoi des fichiers analysés par mail
-    for i, file in enumerate(uploaded_files):
-        try:
-            file.seek(0)
-            msg = EmailMessage()
-            msg["Subject"] = f"Analyse contrat santé - Contrat {i+1}"
-            msg["From"] = st.secrets["email_user"]
-            msg["To"] = st.secrets["email_user"]
-            msg.set_content("Une analyse IA d’un contrat d’assurance a été effectuée. Voir fichier joint.")
-            msg.add_attachment(file.read(), maintype='application', subtype='pdf', filename=f"contrat_{i+1}.pdf")
-
-            with smtplib.SMTP_SSL("smtp.hostinger.com", 465) as smtp:
-                smtp.login(st.secrets["email_user"], st.secrets["email_password"])
-                smtp.send_message(msg)
-        except Exception as e:
-            st.warning(f"📨 Erreur lors de l'envoi de l'email pour le contrat {i+1} : {e}")
+    # Archivage des fichiers analysés par mail : confié à une file en arrière-plan
+    # (connexion SMTP réutilisée, un seul message par lot). Pas de renvoi aux reruns : la
+    # file ignore les fichiers en attente ou déjà envoyés, et ne les marque qu'une fois
+    # l'envoi réussi (après un échec, le rerun suivant les soumet de nouveau)
+    try:
+        envoi = file_envoi(
+            st.secrets.get("smtp_host", "smtp.hostinger.com"),
+            int(st.secrets.get("smtp_port", 465)),
+            st.secrets["email_user"],
+            st.secrets["email_password"],
+            ssl=st.secrets.get("smtp_ssl", True)
+        )
+        envoi.soumettre([
+            (f"contrat_{i+1}.{fichier.name.rsplit('.', 1)[-1].lower()}", fichier.type, fichier.getvalue())
+            for i, fichier in enumerate(uploaded_files)
+        ])
+    except Exception as e:
+        st.warning(f"📨 Erreur lors de la mise en file de l'email : {e}")
 # --- Bouton WhatsApp flottant toujours visible ---
 st.markdown("""
 <style>
@@ -329,259 +462,6 @@ st.markdown("""
     <a href="https://wa.me/41797896193" target="_blank">💬 WhatsApp</a>
 </div>
 """, unsafe_allow_html=True)
-# --- Données LCA structurées pour enrichir l'analyse IA ---
-base_lca_prestations = {
-    "Global Niveau 1": {
-        "lunettes": None,
-        "etranger": "100000 CHF/an (MUNDO)",
-        "checkup": None,
-        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
-        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
-        "transport_sauvetage": "60% jusqu’à 1000 CHF",
-        "hospitalisation": "Chambre commune",
-        "medicaments": "70% jusqu’à 800 CHF (hors-liste)",
-        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Global Niveau 2": {
-        "lunettes": None,
-        "etranger": "100000 CHF/an (MUNDO)",
-        "checkup": None,
-        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
-        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
-        "transport_sauvetage": "80% jusqu’à 1000 CHF",
-        "hospitalisation": "Chambre commune",
-        "medicaments": "90% jusqu’à 800 CHF (hors-liste)",
-        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Global Niveau 3": {
-        "lunettes": None,
-        "etranger": "100000 CHF/an (MUNDO)",
-        "checkup": None,
-        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
-        "medecine_alternative": "70 CHF/séance, max 3000 CHF/an",
-        "transport_sauvetage": "80% jusqu’à 2500 CHF",
-        "hospitalisation": "Mi-privée",
-        "medicaments": "90% illimité (hors-liste)",
-        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Global Niveau 4": {
-        "lunettes": None,
-        "etranger": "100000 CHF/an (MUNDO)",
-        "checkup": None,
-        "promotion_sante": "30 CHF/an (0-18 ans uniquement)",
-        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
-        "transport_sauvetage": "80% jusqu’à 5000 CHF",
-        "hospitalisation": "Privée",
-        "medicaments": "90% illimité (hors-liste)",
-        "moyens_auxiliaires": "70 CHF/séance jusqu’à 6000 CHF",
-        "dentaire": None,
-        "orthodontie": None
-    }
-}
-base_lca_prestations.update({
-    "Global Mi-Privé": {
-        "lunettes": None,
-        "etranger": "100000 CHF/an (MUNDO)",
-        "checkup": "90% illimité",
-        "promotion_sante": "30 CHF/an",
-        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
-        "transport_sauvetage": "80% jusqu’à 5000 CHF",
-        "hospitalisation": "Mi-privée (90%)",
-        "medicaments": "90% illimité",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Global Privé": {
-        "lunettes": None,
-        "etranger": "100000 CHF/an (MUNDO)",
-        "checkup": "100% illimité",
-        "promotion_sante": "30 CHF/an",
-        "medecine_alternative": "70 CHF/séance, max 6000 CHF/an",
-        "transport_sauvetage": "80% jusqu’à 5000 CHF",
-        "hospitalisation": "Privée (90%)",
-        "medicaments": "90% illimité",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Global Classic Plus": {
-        "lunettes": "150 CHF/3 ans",
-        "etranger": None,
-        "checkup": "90% tous les 3 ans",
-        "promotion_sante": "50% jusqu’à 200 CHF",
-        "medecine_alternative": "80% jusqu’à 10000 CHF",
-        "transport_sauvetage": "5000 CHF/an",
-        "hospitalisation": "Commune Suisse",
-        "medicaments": "90% illimité",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    }
-})
-base_lca_prestations.update({
-    "Helsana Top": {
-        "lunettes": "90% jusqu’à 150 CHF/an",
-        "etranger": "100000 CHF",
-        "checkup": "100% max 8 semaines/an",
-        "promotion_sante": None,
-        "medecine_alternative": "75% jusqu’à 5000 CHF (avec prescription)",
-        "transport_sauvetage": None,
-        "hospitalisation": "90% jusqu’à 1000 CHF",
-        "medicaments": "75% jusqu’à 10000 CHF",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Completa": {
-        "lunettes": None,
-        "etranger": None,
-        "checkup": "90% jusqu’à 300 CHF/an",
-        "promotion_sante": "100% illimité",
-        "medecine_alternative": "75% jusqu’à 5000 CHF (avec prescription)",
-        "transport_sauvetage": "100000 CHF",
-        "hospitalisation": "90% jusqu’à 1000 CHF",
-        "medicaments": "90% jusqu’à 1500 CHF",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Completa Extra": {
-        "lunettes": None,
-        "etranger": None,
-        "checkup": None,
-        "promotion_sante": None,
-        "medecine_alternative": "90% jusqu’à 1000 CHF (surplus)",
-        "transport_sauvetage": "100% transport, 20000 CHF sauvetage",
-        "hospitalisation": "50% jusqu’à 300 CHF/an",
-        "medicaments": "90% jusqu’à 500 CHF (surplus)",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    }
-})
-base_lca_prestations.update({
-    "Medna": {
-        "lunettes": None,
-        "etranger": None,
-        "checkup": None,
-        "promotion_sante": None,
-        "medecine_alternative": "80 CHF/séance, illimité, franchise 200 CHF",
-        "transport_sauvetage": None,
-        "hospitalisation": None,
-        "medicaments": "80% jusqu’à 2000 CHF (Swissmedic)",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Visana": {
-        "lunettes": None,
-        "etranger": None,
-        "checkup": "90% jusqu’à 200 CHF/an enfants, 300 CHF/3 ans adultes",
-        "promotion_sante": "100% max 8 semaines/an",
-        "medecine_alternative": None,
-        "transport_sauvetage": "90% jusqu’à 4000 CHF",
-        "hospitalisation": "90% jusqu’à 20000 CHF",
-        "medicaments": "90% jusqu’à 1000 CHF",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Diversa": {
-        "lunettes": None,
-        "etranger": None,
-        "checkup": None,
-        "promotion_sante": None,
-        "medecine_alternative": None,
-        "transport_sauvetage": "Illimité transport, 20000 CHF sauvetage",
-        "hospitalisation": {
-            "Care": "15000 CHF",
-            "Plus": "20000 CHF",
-            "Premium": "25000 CHF",
-            "Diversa": "10000 CHF"
-        },
-        "medicaments": None,
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    }
-})
-base_lca_prestations.update({
-    "Natura": {
-        "lunettes": None,
-        "etranger": None,
-        "checkup": None,
-        "promotion_sante": "90% jusqu’à 500 CHF/an, 50%/200 CHF/sport (max 500 CHF)",
-        "medecine_alternative": {
-            "Natura": "75% jusqu’à 4000 CHF/an",
-            "Natura Plus": "75% jusqu’à 6000 CHF/an"
-        },
-        "transport_sauvetage": None,
-        "hospitalisation": None,
-        "medicaments": None,
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Santé Vital": {
-        "lunettes": None,
-        "etranger": None,
-        "checkup": "100% jusqu’à 300 CHF/3 ans",
-        "promotion_sante": "100% illimité",
-        "medecine_alternative": "80% jusqu’à 500 CHF",
-        "transport_sauvetage": None,
-        "hospitalisation": "100% illimité / 90% illimité / 50% jusqu’à 10000 CHF avant 20 ans",
-        "medicaments": None,
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Sympany Plus": {
-        "lunettes": "270 CHF <18 ans, 300 CHF/an adultes",
-        "etranger": None,
-        "checkup": "100% illimité",
-        "promotion_sante": "50% jusqu’à 3000 CHF / 6000 CHF avec Natura",
-        "medecine_alternative": None,
-        "transport_sauvetage": "100% illimité",
-        "hospitalisation": None,
-        "medicaments": None,
-        "moyens_auxiliaires": "50%/250 CHF pour contrôle, 90% dents de sagesse",
-        "dentaire": "70% jusqu’à 10000 CHF jusqu’à 25 ans",
-        "orthodontie": None
-    },
-    "Sympany Premium": {
-        "lunettes": "420 CHF <18 ans, 600 CHF/an adultes",
-        "etranger": None,
-        "checkup": "100% jusqu’à 600 CHF/3 ans",
-        "promotion_sante": "80% jusqu’à 1500 CHF",
-        "medecine_alternative": "400 CHF/sport jusqu’à 800 CHF",
-        "transport_sauvetage": None,
-        "hospitalisation": "70% jusqu’à 15000 CHF jusqu’à 25 ans",
-        "medicaments": None,
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    },
-    "Assura Completa Extra": {
-        "lunettes": None,
-        "etranger": "100 CHF/an, cumulable jusqu’à 500 CHF",
-        "checkup": None,
-        "promotion_sante": None,
-        "medecine_alternative": "100% transport, 20000 CHF sauvetage",
-        "transport_sauvetage": None,
-        "hospitalisation": "Division commune en Suisse, plafond 50000 CHF total",
-        "medicaments": "1000 CHF/an avec franchise 500 CHF",
-        "moyens_auxiliaires": None,
-        "dentaire": None,
-        "orthodontie": None
-    }
-})
 # --- Bouton WhatsApp flottant ---
 whatsapp_html = """
 <style>
@@ -602,3 +482,57 @@ whatsapp_html = """
     </a>
 </div>
 """
+# --- Panneau d'administration : répartition des temps et coûts de la session (?admin=<admin_token>) ---
+jeton_admin = st.secrets.get("admin_token")
+if jeton_admin and hmac.compare_digest(st.query_params.get("admin", ""), jeton_admin):
+    repartition = st.session_state["trace"].repartition()
+    with st.sidebar:
+        st.subheader("⏱️ Mesures de la session")
+        st.dataframe([
+            {
+                "étape": nom,
+                "appels": valeurs["nombre"],
+                "secondes": round(valeurs["secondes"], 3),
+                "jetons prompt": valeurs["jetons_prompt"],
+                "jetons réponse": valeurs["jetons_reponse"],
+                "coût CHF": round(valeurs["cout_chf"], 4),
+            }
+            for nom, valeurs in repartition.items()
+        ], hide_index=True)
+        st.caption(
+            f"Session {st.session_state['trace'].session} — coût IA estimé : "
+            f"{sum(v['cout_chf'] for v in repartition.values()):.4f} CHF"
+        )
+        routes = st.session_state["trace"].par_route()
+        if routes:
+            st.subheader("🧭 Appels IA par route")
+            st.dataframe([
+                {
+                    "route": nom,
+                    "modèle(s)": valeurs["modeles"],
+                    "appels": valeurs["appels"],
+                    "p50 (s)": round(valeurs["p50_s"], 2),
+                    "p95 (s)": round(valeurs["p95_s"], 2),
+                    "1er token p50 (s)": round(valeurs["premier_token_p50_s"], 2)
+                    if valeurs["premier_token_p50_s"] is not None else None,
+                    "coût CHF": round(valeurs["cout_chf"], 4),
+                }
+                for nom, valeurs in routes.items()
+            ], hide_index=True)
+        if base_analyses is not None:
+            st.subheader("🗂️ Rapports enregistrés")
+            client_recherche = st.text_input("Client", key="admin_client").strip()
+            for lot in base_analyses.lots(client_recherche or None, limite=10):
+                st.download_button(
+                    f"Lot {lot['id']} — {time.strftime('%d.%m.%Y %H:%M', time.localtime(lot['cree_le']))} — "
+                    f"{lot['client'] or 'sans référence'} ({lot['contrats']} contrat(s))",
+                    data=partial(rapport_lot, base_analyses, lot["id"]),
+                    file_name=f"rapport_analyse_{lot['id']}.pdf", mime="application/pdf", key=f"rapport_{lot['id']}"
+                )
+        from analyseur.ordonnanceur import ordonnanceur_llm, ordonnanceur_ocr
+        for ordonnanceur in (ordonnanceur_ocr, ordonnanceur_llm):
+            etat = ordonnanceur.etat()
+            st.caption(
+                f"File {ordonnanceur.nom} (processus) : {etat['en_cours']}/{etat['capacite']} en cours, "
+                f"{etat['en_attente']} en attente ({etat['sessions_en_attente']} session(s))"
+            )
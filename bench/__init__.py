@@ -0,0 +1 @@
+# Benchmarks des étapes de l'analyseur (corpus synthétique, client OpenAI factice)
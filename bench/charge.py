@@ -0,0 +1,359 @@
+# --- Test de charge : l'app Streamlit réelle face à N sessions simulées ---
+#
+#   python -m bench.charge --sessions 20 --concurrence 5 --latence 1.0 --taux-429 0.05
+#
+# Démarre un serveur compatible OpenAI local (latence et refus 429 réglables), un puits
+# SMTP et `streamlit run app.py` dans un répertoire temporaire (secrets factices, cache
+# vide : les vraies clés ne sont jamais lues). Chaque session ouvre le websocket comme un
+# navigateur, téléverse des contrats synthétiques puis attend la fin du script.
+# Mesure la latence de la page (téléversement terminé -> fin du script, analyses
+# comprises) en p50/p95/p99, le débit et la mémoire du worker (processus OCR compris).
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from bench.corpus import generer_pdf
+from bench.puits_smtp import PuitsSMTP
+from bench.serveur_openai import ServeurOpenAI
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SECRETS = """openai_api_key = "sk-charge"
+email_user = "charge@example.invalid"
+email_password = "charge"
+smtp_host = "127.0.0.1"
+smtp_port = {port}
+smtp_ssl = false
+"""
+
+
+# --- Mémoire du worker (/proc : Linux) ---
+
+def _descendants(pid):
+    enfants = {}
+    for entree in os.listdir("/proc"):
+        if entree.isdigit():
+            try:
+                with open(f"/proc/{entree}/stat") as f:
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            enfants.setdefault(parent, []).append(int(entree))
+    resultat, a_voir = [], [pid]
+    while a_voir:
+        courant = a_voir.pop()
+        resultat.append(courant)
+        a_voir.extend(enfants.get(courant, []))
+    return resultat
+
+
+def rss_octets(pid):
+    # (RSS du processus, RSS du processus et de ses descendants)
+    total = principal = 0
+    for numero in _descendants(pid):
+        try:
+            with open(f"/proc/{numero}/status") as f:
+                ligne = next(l for l in f if l.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            continue
+        octets = int(ligne.split()[1]) * 1024
+        total += octets
+        if numero == pid:
+            principal = octets
+    return principal, total
+
+
+class Echantillonneur(threading.Thread):
+    def __init__(self, pid, intervalle=0.25):
+        super().__init__(name="echantillonneur-rss", daemon=True)
+        self.pid = pid
+        self.intervalle = intervalle
+        self.pic = self.pic_total = 0
+        self._arret = threading.Event()
+
+    def run(self):
+        while not self._arret.wait(self.intervalle):
+            principal, total = rss_octets(self.pid)
+            self.pic = max(self.pic, principal)
+            self.pic_total = max(self.pic_total, total)
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+
+
+# --- Session simulée (protocole websocket du navigateur) ---
+
+def _rerun(etats=()):
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+
+    msg = BackMsg()
+    msg.rerun_script.query_string = ""
+    msg.rerun_script.widget_states.widgets.extend(etats)
+    return msg.SerializeToString()
+
+
+async def _jusqu_a_fin(ws, session):
+    # Lit les messages jusqu'à la fin du script ; relève l'id du téléverseur et les erreurs
+    from streamlit.proto.Alert_pb2 import Alert
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+    while True:
+        msg = ForwardMsg()
+        msg.ParseFromString(await ws.recv())
+        genre = msg.WhichOneof("type")
+        if genre == "new_session":
+            session["id"] = msg.new_session.initialize.session_id
+        elif genre == "file_urls_response":
+            session["urls"] = list(msg.file_urls_response.file_urls)
+            return
+        elif genre == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            element = msg.delta.new_element
+            type_element = element.WhichOneof("type")
+            if type_element == "file_uploader":
+                session["televerseur"] = element.file_uploader.id
+            elif type_element == "exception":
+                session["erreurs"].append(f"{element.exception.type}: {element.exception.message}")
+            elif type_element == "alert" and element.alert.format == Alert.ERROR:
+                session["erreurs"].append(element.alert.body)
+        elif genre == "script_finished":
+            if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return
+
+
+async def simuler_session(numero, url, fichiers, http):
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.Common_pb2 import UploadedFileInfo
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    session = {"numero": numero, "erreurs": []}
+    debut = time.perf_counter()
+    async with websockets.connect(
+        url.replace("http", "ws", 1) + "/_stcore/stream", subprotocols=["streamlit"], max_size=None
+    ) as ws:
+        # Page d'accueil (sans fichier)
+        await ws.send(_rerun())
+        await _jusqu_a_fin(ws, session)
+        session["accueil_s"] = time.perf_counter() - debut
+
+        # Téléversement : URLs demandées au serveur, puis PUT de chaque fichier
+        demande = BackMsg()
+        demande.file_urls_request.request_id = uuid.uuid4().hex
+        demande.file_urls_request.session_id = session["id"]
+        demande.file_urls_request.file_names.extend(os.path.basename(c) for c in fichiers)
+        await ws.send(demande.SerializeToString())
+        await _jusqu_a_fin(ws, session)
+        debut = time.perf_counter()
+        infos = []
+        for chemin, urls in zip(fichiers, session["urls"]):
+            with open(chemin, "rb") as f:
+                donnees = f.read()
+            reponse = await http.put(
+                url + urls.upload_url, files={"file": (os.path.basename(chemin), donnees, "application/pdf")}
+            )
+            reponse.raise_for_status()
+            infos.append(UploadedFileInfo(
+                name=os.path.basename(chemin), size=len(donnees), file_id=urls.file_id, file_urls=urls
+            ))
+        session["televersement_s"] = time.perf_counter() - debut
+
+        # Rerun avec les fichiers : la page est terminée à la fin du script
+        etat = WidgetState(id=session["televerseur"])
+        etat.file_uploader_state_value.uploaded_file_info.extend(infos)
+        debut = time.perf_counter()
+        await ws.send(_rerun([etat]))
+        await _jusqu_a_fin(ws, session)
+        session["page_s"] = time.perf_counter() - debut
+    return session
+
+
+# --- Orchestration ---
+
+def _attendre_pret(url, processus, delai=60):
+    import httpx
+
+    fin = time.monotonic() + delai
+    while time.monotonic() < fin:
+        if processus.poll() is not None:
+            raise RuntimeError(f"streamlit s'est arrêté (code {processus.returncode})")
+        try:
+            if httpx.get(url + "/_stcore/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("streamlit ne répond pas")
+
+
+def _port_libre():
+    import socket
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def preparer_contrats(repertoire, sessions, pages, distincts):
+    # Contrats de chaque session ; distincts : contenu propre à chaque session (sinon les
+    # caches d'extraction et d'analyse servent toutes les sessions après la première)
+    contrats = []
+    for numero in range(sessions):
+        graine = 1000 * (numero if distincts else 0)
+        contrats.append([
+            generer_pdf(os.path.join(repertoire, f"session{graine}_{p}p.pdf"), p, graine + p)
+            for p in pages
+        ])
+    return contrats
+
+
+def _pages(chemin):
+    import fitz
+
+    with fitz.open(chemin) as doc:
+        return doc.page_count
+
+
+async def _rejouer(url, contrats, concurrence):
+    import httpx
+
+    limite = asyncio.Semaphore(concurrence)
+
+    async def une(numero, fichiers, http):
+        async with limite:
+            try:
+                return await simuler_session(numero, url, fichiers, http)
+            except Exception as e:
+                return {"numero": numero, "erreurs": [f"{type(e).__name__}: {e}"]}
+
+    async with httpx.AsyncClient(timeout=60) as http:
+        return await asyncio.gather(*(une(n, f, http) for n, f in enumerate(contrats)))
+
+
+def quantiles(valeurs):
+    if not valeurs:
+        return {}
+    valeurs = sorted(valeurs)
+    q = statistics.quantiles(valeurs, n=100, method="inclusive") if len(valeurs) > 1 else valeurs * 99
+    return {"p50_s": round(q[49], 3), "p95_s": round(q[94], 3), "p99_s": round(q[98], 3), "max_s": round(valeurs[-1], 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.charge")
+    parser.add_argument("--app", default=os.path.join(RACINE, "app.py"))
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--concurrence", type=int, default=5, help="sessions ouvertes en même temps")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5], help="contrats téléversés par session (pages)")
+    parser.add_argument("--memes-contrats", action="store_true", help="toutes les sessions envoient les mêmes fichiers")
+    parser.add_argument("--latence", type=float, default=0.5, help="serveur IA : secondes avant le premier token")
+    parser.add_argument("--latence-token", type=float, default=0.02)
+    parser.add_argument("--taux-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--sortie", default=os.path.join("bench", "resultats", "charge.json"))
+    options = parser.parse_args(argv)
+
+    serveur_ia = ServeurOpenAI(latence=options.latence, latence_token=options.latence_token,
+                               taux_429=options.taux_429, retry_after=options.retry_after).demarrer()
+    puits = PuitsSMTP().demarrer()
+    with tempfile.TemporaryDirectory(prefix="analyseur-charge-") as repertoire:
+        os.makedirs(os.path.join(repertoire, ".streamlit"))
+        with open(os.path.join(repertoire, ".streamlit", "secrets.toml"), "w", encoding="utf-8") as f:
+            f.write(SECRETS.format(port=puits.port))
+        os.makedirs(os.path.join(repertoire, "contrats"))
+        contrats = preparer_contrats(os.path.join(repertoire, "contrats"), options.sessions, options.pages,
+                                     not options.memes_contrats)
+        pages_session = sum(_pages(c) for c in contrats[0])
+
+        port = _port_libre()
+        url = f"http://127.0.0.1:{port}"
+        environnement = {**os.environ, "OPENAI_BASE_URL": serveur_ia.url,
+                         "ANALYSEUR_CACHE_DIR": os.path.join(repertoire, "cache"),
+                         "ANALYSEUR_STOCKAGE": os.path.join(repertoire, "analyses.sqlite3")}
+        environnement.pop("OPENAI_API_KEY", None)
+        processus = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.abspath(options.app),
+             "--server.headless", "true", "--server.port", str(port), "--server.address", "127.0.0.1",
+             "--server.enableXsrfProtection", "false", "--server.enableCORS", "false",
+             "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+            cwd=repertoire, env=environnement, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+        )
+        try:
+            _attendre_pret(url, processus)
+            rss_repos = rss_octets(processus.pid)
+            echantillonneur = Echantillonneur(processus.pid)
+            echantillonneur.start()
+            debut = time.perf_counter()
+            sessions = asyncio.run(_rejouer(url, contrats, options.concurrence))
+            duree = time.perf_counter() - debut
+            echantillonneur.arreter()
+            # Laisse la file d'envoi vider les emails mis en attente par les dernières sessions
+            time.sleep(2)
+            rss_fin = rss_octets(processus.pid)
+        finally:
+            processus.terminate()
+            try:
+                _, journal = processus.communicate(timeout=10)
+            except subprocess.TimeoutExpired:
+                processus.kill()
+                _, journal = processus.communicate()
+    serveur_ia.shutdown()
+    puits.shutdown()
+
+    reussies = [s for s in sessions if "page_s" in s and not s["erreurs"]]
+    mo = 1024 * 1024
+    resultats = {
+        "horodatage": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parametres": {k: v for k, v in vars(options).items() if k not in ("app", "sortie")},
+        "sessions": len(sessions),
+        "sessions_reussies": len(reussies),
+        "duree_s": round(duree, 3),
+        "debit_sessions_s": round(len(reussies) / duree, 3),
+        "debit_pages_s": round(len(reussies) * pages_session / duree, 3),
+        "latence_page": quantiles([s["page_s"] for s in reussies]),
+        "latence_accueil": quantiles([s["accueil_s"] for s in reussies]),
+        "televersement": quantiles([s["televersement_s"] for s in reussies]),
+        "memoire_mo": {
+            "repos": round(rss_repos[0] / mo, 1),
+            "pic": round(echantillonneur.pic / mo, 1),
+            "fin": round(rss_fin[0] / mo, 1),
+            "pic_avec_ocr": round(echantillonneur.pic_total / mo, 1),
+        },
+        "serveur_ia": serveur_ia.compteurs,
+        "smtp": puits.compteurs,
+        "erreurs": sorted({e for s in sessions for e in s["erreurs"]}),
+    }
+
+    print(f"{resultats['sessions_reussies']}/{resultats['sessions']} sessions en {duree:.1f} s "
+          f"(concurrence {options.concurrence}, {pages_session} page(s) par session)")
+    for nom in ("latence_page", "latence_accueil", "televersement"):
+        q = resultats[nom]
+        if q:
+            print(f"{nom:16s} p50 {q['p50_s']:7.2f} s  p95 {q['p95_s']:7.2f} s  p99 {q['p99_s']:7.2f} s")
+    print(f"débit            {resultats['debit_sessions_s']:.2f} session/s, {resultats['debit_pages_s']:.2f} page/s")
+    memoire = resultats["memoire_mo"]
+    print(f"mémoire worker   repos {memoire['repos']} Mo, pic {memoire['pic']} Mo, fin {memoire['fin']} Mo "
+          f"(pic avec OCR {memoire['pic_avec_ocr']} Mo)")
+    print(f"serveur IA       {serveur_ia.compteurs['requetes']} requête(s), {serveur_ia.compteurs['refus_429']} refus 429, "
+          f"{serveur_ia.compteurs['en_cours_max']} simultanée(s) au plus")
+    print(f"SMTP             {puits.compteurs['messages']} email(s) reçu(s)")
+    for erreur in resultats["erreurs"]:
+        print(f"⚠️  {erreur}")
+    if not reussies and journal:
+        print(journal[-2000:], file=sys.stderr)
+
+    os.makedirs(os.path.dirname(options.sortie) or ".", exist_ok=True)
+    with open(options.sortie, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2, ensure_ascii=False)
+    return 1 if resultats["erreurs"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
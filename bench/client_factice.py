@@ -0,0 +1,52 @@
+# --- Client OpenAI factice : même interface que openai.OpenAI pour chat.completions ---
+import time
+from types import SimpleNamespace
+
+REPONSE_TYPE = (
+    "### 1. LAMal\n- Franchise 300 CHF, modèle médecin de famille\n"
+    "### 2. LCA\n- Lunettes 150 CHF/3 ans\n- Médecine alternative 75% jusqu'à 5000 CHF\n"
+    "### 3. Hospitalisation\n- Division commune\n\n**Note : 6/10**\n"
+)
+# Réponse aux requêtes en mode JSON (relevé des faits de couverture)
+REPONSE_FAITS = (
+    '{"lamal": {"franchise_chf": 300, "modele": "médecin de famille", "quote_part": "10% jusqu\'à 700 CHF", '
+    '"accidents": "inclus"}, "lca": [{"prestation": "lunettes", "remboursement": "150 CHF", "plafond": "3 ans", '
+    '"page": 1}], "hospitalisation": {"division": "commune", "choix_medecin": null, "choix_hopital": null, '
+    '"plafond": null}, "autres": []}'
+)
+
+
+class _Completions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, messages, stream=False, **options):
+        client = self._client
+        client.appels += 1
+        time.sleep(client.latence)
+        json_demande = options.get("response_format", {}).get("type") == "json_object"
+        reponse = client.reponse_faits if json_demande else client.reponse
+        mots = reponse.split(" ")
+        jetons_prompt = sum(len(m["content"].split()) for m in messages)
+        usage = SimpleNamespace(prompt_tokens=jetons_prompt, completion_tokens=len(mots), total_tokens=jetons_prompt + len(mots))
+        if not stream:
+            message = SimpleNamespace(content=reponse, role="assistant")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=usage, model=model)
+        return self._flux(mots, usage)
+
+    def _flux(self, mots, usage):
+        for i, mot in enumerate(mots):
+            time.sleep(self._client.latence_token)
+            delta = SimpleNamespace(content=mot if i == 0 else " " + mot)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)], usage=None)
+        yield SimpleNamespace(choices=[], usage=usage)
+
+
+class ClientFactice:
+    def __init__(self, latence=0.0, latence_token=0.0, reponse=REPONSE_TYPE, reponse_faits=REPONSE_FAITS):
+        self.latence = latence
+        self.latence_token = latence_token
+        self.reponse = reponse
+        self.reponse_faits = reponse_faits
+        self.appels = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
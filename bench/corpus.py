@@ -0,0 +1,158 @@
+# --- Générateur de contrats synthétiques LAMal/LCA (PDF texte, scans PDF et photos) ---
+#
+#   python -m bench.corpus --sortie bench/corpus --pages 1 5 20
+import argparse
+import os
+import random
+
+from analyseur.base_lca import base_lca_prestations
+
+ASSUREURS = ["Assurance Alpha SA", "Caisse Beta", "Mutuelle Gamma"]
+FRANCHISES = [300, 500, 1000, 1500, 2000, 2500]
+MODELES = ["médecin de famille", "Telmed", "HMO", "libre choix"]
+
+BOILERPLATE = (
+    "Les présentes conditions particulières complètent les conditions générales d'assurance (CGA) "
+    "et les conditions complémentaires. En cas de divergence, les conditions particulières prévalent. "
+    "Toute modification doit être communiquée par écrit dans un délai de 30 jours."
+)
+
+
+def _latin1(texte):
+    # Les polices standard de fpdf ne couvrent que latin-1
+    return texte.replace("’", "'").encode("latin-1", "replace").decode("latin-1")
+
+
+def sections_contrat(rng, pages):
+    produits = list(base_lca_prestations)
+    yield "CONDITIONS PARTICULIÈRES", f"Assuré : Client {rng.randint(1000, 9999)}. Début : 01.01.2025."
+    yield "Art. 1 Assurance obligatoire des soins (LAMal)", (
+        f"Franchise annuelle : {rng.choice(FRANCHISES)} CHF. Modèle : {rng.choice(MODELES)}. "
+        "Quote-part de 10% jusqu'à 700 CHF par an. Couverture accidents : "
+        + rng.choice(["incluse", "exclue (assuré auprès de l'employeur)"]) + "."
+    )
+    numero = 2
+    while numero < 2 + pages * 12:
+        produit = rng.choice(produits)
+        for prestation, valeur in base_lca_prestations[produit].items():
+            if isinstance(valeur, dict):
+                valeur = next(iter(valeur.values()))
+            if valeur and rng.random() < 0.6:
+                libelle = prestation.replace("_", " ")
+                yield f"Art. {numero} Assurance complémentaire (LCA) - {libelle}", (
+                    f"Produit {produit} : {libelle} remboursé {valeur}. " + BOILERPLATE
+                )
+                numero += 1
+        yield f"Art. {numero} Hospitalisation", (
+            f"Division {rng.choice(['commune', 'mi-privée', 'privée'])} dans toute la Suisse, "
+            f"choix du médecin {rng.choice(['libre', 'limité'])}. Plafond {rng.choice([10000, 20000, 50000])} CHF par an."
+        )
+        numero += 1
+
+
+def generer_pdf(chemin, pages, graine=0):
+    from fpdf import FPDF
+
+    rng = random.Random(graine)
+    assureur = rng.choice(ASSUREURS)
+
+    class ContratPDF(FPDF):
+        # En-tête et pied répétés sur chaque page, comme les courriers d'assureurs
+        def header(self):
+            self.set_font("Helvetica", "B", 9)
+            self.cell(0, 5, _latin1(f"{assureur} - Police d'assurance maladie"))
+            self.ln(8)
+
+        def footer(self):
+            self.set_y(-15)
+            self.set_font("Helvetica", size=8)
+            self.cell(0, 5, _latin1(f"Page {self.page_no()} - {assureur}, case postale, 1000 Lausanne"), align="C")
+
+    pdf = ContratPDF()
+    pdf.set_auto_page_break(True, margin=20)
+    pdf.add_page()
+    for titre, corps in sections_contrat(rng, pages):
+        if pdf.page_no() >= pages and pdf.get_y() > 230:
+            break
+        # Retour en marge gauche explicite : fpdf 1.7 et fpdf2 diffèrent après multi_cell
+        pdf.set_font("Helvetica", "B", 11)
+        pdf.multi_cell(0, 6, _latin1(titre))
+        pdf.set_x(pdf.l_margin)
+        pdf.set_font("Helvetica", size=10)
+        pdf.multi_cell(0, 5, _latin1(corps))
+        pdf.set_x(pdf.l_margin)
+        pdf.ln(2)
+    pdf.output(chemin)
+    return chemin
+
+
+def rasteriser(chemin_pdf, dpi=200, rotation=1.5, bruit=0.02, graine=0):
+    # Simule une photo de téléphone : rendu de chaque page, légère rotation, bruit
+    from io import BytesIO
+
+    import fitz
+    from PIL import Image
+
+    rng = random.Random(graine)
+    images = []
+    with fitz.open(chemin_pdf) as doc:
+        for page in doc:
+            image = Image.open(BytesIO(page.get_pixmap(dpi=dpi).tobytes("png"))).convert("L")
+            image = image.rotate(rng.uniform(-rotation, rotation), expand=True, fillcolor=255)
+            pixels = image.load()
+            largeur, hauteur = image.size
+            for _ in range(int(largeur * hauteur * bruit)):
+                pixels[rng.randrange(largeur), rng.randrange(hauteur)] = rng.choice((0, 255))
+            images.append(image)
+    return images
+
+
+def generer_scan_pdf(chemin_pdf, chemin_sortie, dpi=150):
+    # PDF sans couche texte (pages scannées) pour exercer le repli OCR
+    from io import BytesIO
+
+    import fitz
+
+    with fitz.open() as scan:
+        for image in rasteriser(chemin_pdf, dpi=dpi):
+            tampon = BytesIO()
+            image.save(tampon, format="PNG")
+            page = scan.new_page(width=595, height=842)
+            page.insert_image(page.rect, stream=tampon.getvalue())
+        scan.save(chemin_sortie)
+    return chemin_sortie
+
+
+def generer_corpus(sortie, tailles=(1, 5, 20), photos=(1200, 2400, 4000), graine=0):
+    # Renvoie {"pdf": [...], "scans": [...], "photos": [...]} (chemins)
+    os.makedirs(sortie, exist_ok=True)
+    corpus = {"pdf": [], "scans": [], "photos": []}
+    for pages in tailles:
+        chemin = os.path.join(sortie, f"contrat_{pages}p.pdf")
+        corpus["pdf"].append(generer_pdf(chemin, pages, graine + pages))
+    reference = corpus["pdf"][0]
+    corpus["scans"].append(generer_scan_pdf(reference, os.path.join(sortie, "contrat_scan.pdf")))
+    page = rasteriser(reference, dpi=300, graine=graine)[0]
+    for largeur in photos:
+        image = page.resize((largeur, int(largeur * page.height / page.width)))
+        chemin = os.path.join(sortie, f"photo_{largeur}px.jpg")
+        image.save(chemin, quality=90)
+        corpus["photos"].append(chemin)
+    return corpus
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.corpus")
+    parser.add_argument("--sortie", default=os.path.join("bench", "corpus"))
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--photos", type=int, nargs="+", default=[1200, 2400, 4000], help="largeurs en pixels")
+    parser.add_argument("--graine", type=int, default=0)
+    options = parser.parse_args(argv)
+    corpus = generer_corpus(options.sortie, options.pages, options.photos, options.graine)
+    for type_, chemins in corpus.items():
+        for chemin in chemins:
+            print(f"{type_:7s} {chemin}")
+
+
+if __name__ == "__main__":
+    main()
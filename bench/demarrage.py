@@ -0,0 +1,89 @@
+# --- Démarrage à froid de l'app et temps jusqu'au premier rendu de la page d'accueil ---
+#
+#   python -m bench.demarrage --repetitions 5
+#
+# Chaque mesure tourne dans un processus neuf (modules non importés) : premier passage
+# du script Streamlit sans fichier téléversé (= page d'accueil), puis un rerun à chaud.
+# Relève aussi les modules lourds chargés à ce stade et leur coût d'import isolé.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES_LOURDS = ["fitz", "pytesseract", "PIL.Image", "numpy", "tiktoken", "openai"]
+
+MESURE_APP = """
+import json, sys, time
+debut = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import_streamlit = time.perf_counter() - debut
+at = AppTest.from_file({app!r}, default_timeout=120)
+at.secrets["openai_api_key"] = "sk-bench"
+debut = time.perf_counter()
+at.run()
+premier_rendu = time.perf_counter() - debut
+debut = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - debut
+print(json.dumps({{
+    "import_streamlit_s": import_streamlit,
+    "premier_rendu_s": premier_rendu,
+    "rerun_s": rerun,
+    "erreurs": [str(e.value) for e in at.exception],
+    "modules_lourds_charges": [m for m in {modules!r} if m in sys.modules],
+}}))
+"""
+
+MESURE_IMPORT = """
+import json, time
+debut = time.perf_counter()
+import {module}
+print(json.dumps(time.perf_counter() - debut))
+"""
+
+
+def _executer(code):
+    sortie = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(sortie.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.demarrage")
+    parser.add_argument("--app", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py"))
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--sortie", default=os.path.join("bench", "resultats", "demarrage.json"))
+    options = parser.parse_args(argv)
+
+    mesures = [_executer(MESURE_APP.format(app=options.app, modules=MODULES_LOURDS)) for _ in range(options.repetitions)]
+    resultats = {
+        cle: round(statistics.median(m[cle] for m in mesures), 4)
+        for cle in ("import_streamlit_s", "premier_rendu_s", "rerun_s")
+    }
+    resultats["modules_lourds_charges"] = mesures[-1]["modules_lourds_charges"]
+    resultats["erreurs"] = mesures[-1]["erreurs"]
+    resultats["imports_s"] = {}
+    for module in MODULES_LOURDS:
+        try:
+            resultats["imports_s"][module] = round(_executer(MESURE_IMPORT.format(module=module)), 4)
+        except subprocess.CalledProcessError:
+            resultats["imports_s"][module] = None  # non installé
+
+    print(f"import streamlit          {resultats['import_streamlit_s'] * 1000:8.1f} ms")
+    print(f"premier rendu (à froid)   {resultats['premier_rendu_s'] * 1000:8.1f} ms")
+    print(f"rerun (à chaud)           {resultats['rerun_s'] * 1000:8.1f} ms")
+    print("modules lourds chargés à l'accueil : " + (", ".join(resultats["modules_lourds_charges"]) or "aucun"))
+    for module, duree in resultats["imports_s"].items():
+        print(f"  import {module:18s} " + (f"{duree * 1000:8.1f} ms" if duree is not None else "non installé"))
+    for erreur in resultats["erreurs"]:
+        print(f"⚠️  {erreur}")
+
+    os.makedirs(os.path.dirname(options.sortie) or ".", exist_ok=True)
+    with open(options.sortie, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2, ensure_ascii=False)
+    return 1 if resultats["erreurs"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
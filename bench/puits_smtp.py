@@ -0,0 +1,73 @@
+# --- Puits SMTP local : accepte (sans TLS) tous les messages et les compte ---
+#
+# Suffisant pour smtplib : EHLO avec AUTH, MAIL, RCPT, DATA, NOOP, RSET, QUIT.
+# L'app doit être configurée avec smtp_ssl = false et smtp_host/smtp_port du puits.
+import socketserver
+import threading
+
+
+class PuitsSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, adresse=("127.0.0.1", 0)):
+        super().__init__(adresse, _Session)
+        self._verrou = threading.Lock()
+        self.compteurs = {"connexions": 0, "messages": 0, "octets": 0}
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def demarrer(self):
+        threading.Thread(target=self.serve_forever, name="puits-smtp", daemon=True).start()
+        return self
+
+    def _compter(self, **increments):
+        with self._verrou:
+            for cle, valeur in increments.items():
+                self.compteurs[cle] += valeur
+
+
+class _Session(socketserver.StreamRequestHandler):
+    def _repondre(self, ligne):
+        self.wfile.write(ligne.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self.server._compter(connexions=1)
+        self._repondre("220 puits-smtp ESMTP")
+        while True:
+            ligne = self.rfile.readline()
+            if not ligne:
+                return
+            commande = ligne.decode("utf-8", "replace").strip()
+            verbe = commande.split(" ", 1)[0].upper()
+            if verbe == "EHLO":
+                self._repondre("250-puits-smtp")
+                self._repondre("250-AUTH PLAIN LOGIN")
+                self._repondre("250 8BITMIME")
+            elif verbe == "HELO":
+                self._repondre("250 puits-smtp")
+            elif verbe == "AUTH":
+                # Tout identifiant est accepté (AUTH LOGIN : deux échanges base64 d'abord)
+                if commande.upper().startswith("AUTH LOGIN"):
+                    for _ in range(2 - len(commande.split()[2:])):
+                        self._repondre("334 ")
+                        self.rfile.readline()
+                self._repondre("235 2.7.0 Authentication successful")
+            elif verbe == "DATA":
+                self._repondre("354 End data with <CR><LF>.<CR><LF>")
+                octets = 0
+                for ligne in self.rfile:
+                    if ligne in (b".\r\n", b".\n"):
+                        break
+                    octets += len(ligne)
+                self.server._compter(messages=1, octets=octets)
+                self._repondre("250 2.0.0 Ok: queued")
+            elif verbe == "QUIT":
+                self._repondre("221 2.0.0 Bye")
+                return
+            elif verbe in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._repondre("250 2.0.0 Ok")
+            else:
+                self._repondre("502 5.5.2 Command not recognized")
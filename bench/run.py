@@ -0,0 +1,288 @@
+# --- Benchmarks des étapes critiques, avec résultats JSON comparables entre versions ---
+#
+#   python -m bench.run --tolerance 0.2              # compare à bench/reference.json (versionnée)
+#   python -m bench.run --comparer ""                # sans comparaison
+#   python -m bench.run --sortie bench/reference.json  # met la référence à jour
+#
+# Les caches (extraction et réponses IA) sont neutralisés : chaque mesure refait le travail.
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+
+os.environ.setdefault("ANALYSEUR_CACHE_DIR", tempfile.mkdtemp(prefix="analyseur-bench-"))
+
+from PIL import Image  # noqa: E402
+
+from analyseur import analyse, config, extraction, llm, pipeline  # noqa: E402
+from analyseur.mots_cles import analyser_mots_cles, detect_doublons_par_prestation  # noqa: E402
+
+from .client_factice import ClientFactice  # noqa: E402
+from .corpus import generer_corpus  # noqa: E402
+
+# Référence versionnée (étapes mesurées sur la machine de référence), comparée par défaut
+REFERENCE = os.path.join(os.path.dirname(__file__), "reference.json")
+
+
+class CacheInactif:
+    def get(self, cle):
+        return None
+
+    def set(self, cle, valeur):
+        pass
+
+    def statistiques(self):
+        return {}
+
+
+def _rss_max_mo():
+    # ru_maxrss : kilo-octets sous Linux, octets sous macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def mesurer(fonction, repetitions):
+    # Temps sur `repetitions` exécutions, puis une exécution sous tracemalloc pour
+    # le pic mémoire Python (les allocations internes de MuPDF/Tesseract n'y figurent
+    # pas : le RSS maximal du processus est relevé à côté)
+    fonction()  # échauffement (imports, pool de processus)
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    tracemalloc.start()
+    fonction()
+    _, pic = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "repetitions": repetitions,
+        "secondes_min": round(min(durees), 6),
+        "secondes_mediane": round(statistics.median(durees), 6),
+        "memoire_pic_mo": round(pic / 1024 / 1024, 3),
+        "rss_max_mo": round(_rss_max_mo(), 1),
+    }
+
+
+def version_tesseract():
+    # None si Tesseract (ou pytesseract) est absent : les étapes OCR ne sont pas mesurées
+    try:
+        import pytesseract
+
+        return str(pytesseract.get_tesseract_version())
+    except Exception as e:
+        print(f"Tesseract indisponible ({type(e).__name__}) : étapes OCR ignorées", file=sys.stderr)
+        return None
+
+
+def etapes(corpus, client, ocr=True):
+    # (nom, fonction) pour chaque mesure ; les données sont lues une seule fois
+    lire = lambda chemin: open(chemin, "rb").read()  # noqa: E731
+    pdfs = {os.path.basename(c): lire(c) for c in corpus["pdf"]}
+    scans = {os.path.basename(c): lire(c) for c in corpus["scans"]}
+    photos = {os.path.basename(c): lire(c) for c in corpus["photos"]}
+
+    for nom, donnees in pdfs.items():
+        yield f"extraction_pdf[{nom}]", lambda d=donnees: extraction.lire_pdf(d)
+
+    from analyseur.ocr import ocr_image, ocr_parallele, parametres_ocr
+    from analyseur.pretraitement import preparer_image
+
+    # « brut » : image telle quelle, segmentation fixe (avant préparation des images)
+    pages_scan = [png for d in scans.values() for png in extraction.lire_pdf(d)[1].values()]
+    images = {**photos, **{f"scan_p{i + 1}.png": png for i, png in enumerate(pages_scan)}}
+    for nom, donnees in images.items():
+        if ocr:
+            yield f"ocr_image_brut[{nom}]", lambda d=donnees: ocr_image(d, config.OCR_CONFIG, config.OCR_LANGUE)
+        yield f"pretraitement[{nom}]", lambda d=donnees: preparer_image(Image.open(BytesIO(d)), config.OCR_DPI_CIBLE)
+        if ocr:
+            yield f"ocr_image[{nom}]", lambda d=donnees: ocr_image(d, *parametres_ocr())
+    if ocr:
+        yield "ocr_parallele[photos]", lambda: ocr_parallele(list(photos.values()))
+        for nom, donnees in scans.items():
+            yield f"extraction_scan[{nom}]", lambda d=donnees: extraction.extraire_pages([(d, "application/pdf")])
+
+    from analyseur.nettoyage import nettoyer_pages
+
+    for nom, donnees in pdfs.items():
+        brutes = [(texte, marges) for _, texte, _, marges in extraction.iterer_pdf(donnees)]
+        yield f"nettoyage[{nom}]", lambda b=brutes: nettoyer_pages([t for t, _ in b], [m for _, m in b])
+
+    textes = ["\n".join(extraction.lire_pdf(d)[0]) for d in pdfs.values()]
+    yield "mots_cles[corpus]", lambda: [analyser_mots_cles(t) for t in textes]
+    # 200 contrats : vérifie que la détection de doublons reste linéaire
+    occurrences = [analyser_mots_cles(t) for t in textes] * 67
+    yield "doublons[200]", lambda: detect_doublons_par_prestation(occurrences[:200])
+
+    def pipeline_complet(d):
+        pages = extraction.extraire_pages([(d, "application/pdf")])[0]
+        contrat = pipeline.detecter_contrat(pages)
+        return pipeline.analyser_contrat(client, pages, contrat, "❓ Je ne sais pas encore", "Oui")
+
+    for nom, donnees in pdfs.items():
+        yield f"pipeline[{nom}]", lambda d=donnees: pipeline_complet(d)
+
+    # Rapport PDF d'un lot enregistré : production, puis relecture depuis l'historique
+    from analyseur.rapport import generer_rapport, rapport_lot
+    from analyseur.stockage import Stockage
+
+    from .client_factice import REPONSE_TYPE
+
+    base = Stockage(os.path.join(config.REPERTOIRE_CACHE, "bench.sqlite3"))
+    contrats = [pipeline.detecter_contrat(extraction.lire_pdf(d)[0]) for d in pdfs.values()]
+    lot_id = base.enregistrer_lot([
+        {"nom": nom, "hash_texte": nom, "couverture": c["couverture"], "comparaison": c["comparaison"], "analyse": REPONSE_TYPE}
+        for nom, c in zip(pdfs, contrats)
+    ], pipeline.detecter_doublons(contrats)[1])
+    yield "rapport_generation[lot]", lambda: generer_rapport(base.lot(lot_id))
+    yield "rapport_lecture[lot]", lambda: rapport_lot(base, lot_id)
+
+
+def jetons_nettoyage(corpus):
+    # Jetons du prompt d'analyse par contrat, texte brut puis nettoyé (en-têtes, clauses répétées)
+    from analyseur.jetons import compter_jetons_messages
+    from analyseur.nettoyage import nettoyer_pages
+    from analyseur.prompts import messages_analyse
+
+    resultats = {}
+    for chemin in corpus["pdf"]:
+        with open(chemin, "rb") as f:
+            brutes = [(texte, marges) for _, texte, _, marges in extraction.iterer_pdf(f.read())]
+        pages, rapport = nettoyer_pages([t for t, _ in brutes], [m for _, m in brutes])
+        avant = compter_jetons_messages(messages_analyse("\n".join(t for t, _ in brutes), "", ""), config.MODELE_ANALYSE)
+        apres = compter_jetons_messages(messages_analyse("\n".join(pages), "", ""), config.MODELE_ANALYSE)
+        resultats[os.path.basename(chemin)] = {"jetons_avant": avant, "jetons_apres": apres, **rapport}
+    return resultats
+
+
+def routage(corpus):
+    # Jetons et coût estimé par route et par contrat, sans puis avec le petit modèle pour
+    # les faits (client factice : les jetons suivent la taille réelle des prompts)
+    from analyseur.mesures import Trace, activer_trace
+
+    resultats = {}
+    modele_faits = config.MODELE_FAITS
+    for mode, faits in (("texte_complet", ""), ("faits", modele_faits or "gpt-4o-mini")):
+        config.MODELE_FAITS = faits
+        resultats[mode] = {}
+        try:
+            for chemin in corpus["pdf"]:
+                with open(chemin, "rb") as f:
+                    pages = extraction.extraire_pages([(f.read(), "application/pdf")])[0]
+                trace = activer_trace(Trace(session="bench"))
+                pipeline.analyser_contrat(
+                    ClientFactice(), pages, pipeline.detecter_contrat(pages), "❓ Je ne sais pas encore", "Oui"
+                )
+                resultats[mode][os.path.basename(chemin)] = {
+                    route: {"modeles": v["modeles"], "appels": v["appels"], "jetons": v["jetons"],
+                            "cout_chf": round(v["cout_chf"], 6)}
+                    for route, v in trace.par_route().items()
+                }
+        finally:
+            config.MODELE_FAITS = modele_faits
+            activer_trace(None)
+    return resultats
+
+
+def comparer(actuel, reference, tolerance):
+    # Renvoie les lignes de régression (temps médian ou pic mémoire au-delà de la tolérance)
+    regressions = []
+    for nom, mesure in actuel["etapes"].items():
+        avant = reference.get("etapes", {}).get(nom)
+        if not avant:
+            continue
+        for cle in ("secondes_mediane", "memoire_pic_mo"):
+            if avant[cle] and mesure[cle] > avant[cle] * (1 + tolerance):
+                regressions.append(f"{nom} : {cle} {avant[cle]} -> {mesure[cle]} (+{(mesure[cle] / avant[cle] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.run")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "analyseur-bench-corpus"))
+    parser.add_argument("--repetitions", type=int, default=5)
+    parser.add_argument("--filtre", default="", help="ne mesure que les étapes dont le nom contient ce texte")
+    parser.add_argument("--sortie", default=os.path.join("bench", "resultats", "dernier.json"))
+    parser.add_argument("--comparer", default=REFERENCE, help="fichier JSON de référence (vide : pas de comparaison)")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    options = parser.parse_args(argv)
+
+    # Chaque mesure refait tout le travail : pas de cache
+    extraction._cache = CacheInactif()
+    llm.cache_reponses = pipeline.cache_reponses = analyse.cache_reponses = CacheInactif()
+
+    corpus = generer_corpus(options.corpus)
+    tesseract = version_tesseract()
+    resultats = {
+        "horodatage": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": {
+            "python": platform.python_version(),
+            "plateforme": platform.platform(),
+            "coeurs": os.cpu_count(),
+            "ocr_workers": config.OCR_WORKERS,
+            "tesseract": tesseract,
+        },
+        "etapes": {},
+    }
+    for nom, fonction in etapes(corpus, ClientFactice(), ocr=tesseract is not None):
+        if options.filtre not in nom:
+            continue
+        resultats["etapes"][nom] = mesure = mesurer(fonction, options.repetitions)
+        print(f"{nom:40s} {mesure['secondes_mediane'] * 1000:10.2f} ms  {mesure['memoire_pic_mo']:8.2f} Mo", flush=True)
+
+    # Secondes par image avant / après la préparation des images pour l'OCR
+    for nom, mesure in resultats["etapes"].items():
+        if nom.startswith("ocr_image_brut["):
+            apres = resultats["etapes"].get(nom.replace("ocr_image_brut[", "ocr_image["))
+            if not apres:
+                continue
+            image = nom[len("ocr_image_brut["):-1]
+            avant_s, apres_s = mesure["secondes_mediane"], apres["secondes_mediane"]
+            resultats.setdefault("ocr_avant_apres", {})[image] = {"avant_s": avant_s, "apres_s": apres_s}
+            print(f"OCR {image:25s} avant {avant_s:7.2f} s  après {apres_s:7.2f} s "
+                  f"({(apres_s / max(avant_s, 1e-9) - 1) * 100:+.0f}%)")
+
+    # Jetons envoyés par contrat avant / après le nettoyage du texte
+    resultats["nettoyage_jetons"] = jetons_nettoyage(corpus)
+    for nom, valeurs in resultats["nettoyage_jetons"].items():
+        print(f"jetons {nom:25s} avant {valeurs['jetons_avant']:7d}  après {valeurs['jetons_apres']:7d} "
+              f"({(valeurs['jetons_apres'] / max(valeurs['jetons_avant'], 1) - 1) * 100:+.0f}%), "
+              f"{valeurs['caracteres_retires']} caractères retirés")
+
+    # Coût IA par contrat : grand modèle sur le texte complet, puis faits par le petit modèle
+    resultats["routage"] = routage(corpus)
+    for nom in resultats["routage"]["faits"]:
+        couts = {
+            mode: sum(route["cout_chf"] for route in par_contrat[nom].values())
+            for mode, par_contrat in resultats["routage"].items()
+        }
+        print(f"coût IA {nom:24s} texte complet {couts['texte_complet']:.4f} CHF  faits {couts['faits']:.4f} CHF "
+              f"({(couts['faits'] / max(couts['texte_complet'], 1e-9) - 1) * 100:+.0f}%)")
+
+    os.makedirs(os.path.dirname(options.sortie) or ".", exist_ok=True)
+    with open(options.sortie, "w", encoding="utf-8") as f:
+        json.dump(resultats, f, indent=2, ensure_ascii=False)
+    print(f"Résultats : {options.sortie}")
+
+    # Pas de comparaison quand on vient de réécrire la référence elle-même
+    if options.comparer and os.path.abspath(options.comparer) != os.path.abspath(options.sortie):
+        if not os.path.exists(options.comparer):
+            print(f"Pas de référence {options.comparer} : comparaison ignorée.")
+            return 0
+        with open(options.comparer, encoding="utf-8") as f:
+            regressions = comparer(resultats, json.load(f), options.tolerance)
+        for ligne in regressions:
+            print(f"⚠️  régression {ligne}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
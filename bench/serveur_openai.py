@@ -0,0 +1,151 @@
+# --- Serveur HTTP local compatible OpenAI (chat.completions) pour les tests de charge ---
+#
+#   python -m bench.serveur_openai --port 8900 --latence 0.5 --latence-token 0.02 --taux-429 0.05
+#
+# Latence avant la réponse (ou le premier token), latence par token en streaming, et une
+# part des requêtes refusées en 429 avec Retry-After, comme l'API quand le quota est atteint.
+# Les requêtes en mode JSON reçoivent les faits de couverture, les autres une analyse type.
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.client_factice import REPONSE_FAITS, REPONSE_TYPE
+
+
+class ServeurOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, adresse=("127.0.0.1", 0), latence=0.0, latence_token=0.0, taux_429=0.0,
+                 retry_after=1, reponse=REPONSE_TYPE, reponse_faits=REPONSE_FAITS, graine=None):
+        super().__init__(adresse, _Requete)
+        self.latence = latence
+        self.latence_token = latence_token
+        self.taux_429 = taux_429
+        self.retry_after = retry_after
+        self.reponse = reponse
+        self.reponse_faits = reponse_faits
+        self._aleatoire = random.Random(graine)
+        self._verrou = threading.Lock()
+        self.compteurs = {"requetes": 0, "refus_429": 0, "flux": 0, "en_cours_max": 0}
+        self._en_cours = 0
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def demarrer(self):
+        threading.Thread(target=self.serve_forever, name="serveur-openai", daemon=True).start()
+        return self
+
+    def _admettre(self):
+        # False : requête refusée (429)
+        with self._verrou:
+            self.compteurs["requetes"] += 1
+            if self._aleatoire.random() < self.taux_429:
+                self.compteurs["refus_429"] += 1
+                return False
+            self._en_cours += 1
+            self.compteurs["en_cours_max"] = max(self.compteurs["en_cours_max"], self._en_cours)
+            return True
+
+    def _terminer(self):
+        with self._verrou:
+            self._en_cours -= 1
+
+
+class _Requete(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, comme l'API
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        corps = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": f"route inconnue : {self.path}", "type": "invalid_request_error"}})
+        serveur = self.server
+        if not serveur._admettre():
+            return self._json(
+                429, {"error": {"message": "Rate limit reached (serveur de test)", "type": "requests", "code": "rate_limit_exceeded"}},
+                {"Retry-After": str(serveur.retry_after)}
+            )
+        try:
+            time.sleep(serveur.latence)
+            json_demande = (corps.get("response_format") or {}).get("type") == "json_object"
+            texte = serveur.reponse_faits if json_demande else serveur.reponse
+            modele = corps.get("model", "gpt-4")
+            mots = texte.split(" ")
+            jetons_prompt = sum(len(str(m.get("content", "")).split()) for m in corps.get("messages", []))
+            usage = {"prompt_tokens": jetons_prompt, "completion_tokens": len(mots),
+                     "total_tokens": jetons_prompt + len(mots)}
+            identifiant = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            if corps.get("stream"):
+                with serveur._verrou:
+                    serveur.compteurs["flux"] += 1
+                self._flux(identifiant, modele, mots, usage, (corps.get("stream_options") or {}).get("include_usage"))
+            else:
+                self._json(200, {
+                    "id": identifiant, "object": "chat.completion", "created": int(time.time()), "model": modele,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": texte}, "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+        finally:
+            serveur._terminer()
+
+    def _json(self, statut, donnees, entetes=None):
+        contenu = json.dumps(donnees).encode("utf-8")
+        self.send_response(statut)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(contenu)))
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        self.end_headers()
+        self.wfile.write(contenu)
+
+    def _flux(self, identifiant, modele, mots, usage, avec_usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def envoyer(donnees):
+            ligne = f"data: {donnees if isinstance(donnees, str) else json.dumps(donnees)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(ligne):x}\r\n".encode("ascii") + ligne + b"\r\n")
+            self.wfile.flush()
+
+        base = {"id": identifiant, "object": "chat.completion.chunk", "created": int(time.time()), "model": modele}
+        for i, mot in enumerate(mots):
+            if i:
+                time.sleep(self.server.latence_token)
+            envoyer({**base, "choices": [{"index": 0, "delta": {"content": mot if i == 0 else " " + mot}, "finish_reason": None}]})
+        envoyer({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if avec_usage:
+            envoyer({**base, "choices": [], "usage": usage})
+        envoyer("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.serveur_openai")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latence", type=float, default=0.5, help="secondes avant la réponse ou le premier token")
+    parser.add_argument("--latence-token", type=float, default=0.02)
+    parser.add_argument("--taux-429", type=float, default=0.0, help="part des requêtes refusées (0 à 1)")
+    parser.add_argument("--retry-after", type=int, default=1)
+    options = parser.parse_args(argv)
+    serveur = ServeurOpenAI(("127.0.0.1", options.port), options.latence, options.latence_token,
+                            options.taux_429, options.retry_after)
+    print(f"OPENAI_BASE_URL={serveur.url}")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import math
+
+import numpy as np
+import pytest
+
+from analyseur.base_lca import _aplatir, analyser_valeur, base_lca_prestations, comparer_contrat, index_lca
+from analyseur.mots_cles import analyser_mots_cles
+
+NAN = math.nan
+
+# Valeurs réelles de la base : (taux, plafond, période en années, division)
+VALEURS = [
+    ("70 CHF/séance, max 6000 CHF/an", (NAN, 6000, 1, 0)),
+    ("150 CHF/3 ans", (NAN, 150, 3, 0)),
+    ("90% tous les 3 ans", (0.9, NAN, 3, 0)),
+    ("90% illimité (hors-liste)", (0.9, math.inf, NAN, 0)),
+    ("60% jusqu’à 1000 CHF", (0.6, 1000, NAN, 0)),
+    ("100% jusqu’à 300 CHF/3 ans", (1.0, 300, 3, 0)),
+    ("1000 CHF/an avec franchise 500 CHF", (NAN, 1000, 1, 0)),
+    ("Division commune en Suisse, plafond 50000 CHF total", (NAN, 50000, NAN, 1)),
+    ("Chambre commune", (NAN, NAN, NAN, 1)),
+    ("Mi-privée (90%)", (0.9, NAN, NAN, 2)),
+    ("Privée (90%)", (0.9, NAN, NAN, 3)),
+    # Séparateurs de milliers
+    ("1'500 CHF/an", (NAN, 1500, 1, 0)),
+    ("80% jusqu’à 10 000 CHF", (0.8, 10000, NAN, 0)),
+]
+
+
+def identiques(a, b):
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+
+@pytest.mark.parametrize("valeur, attendu", VALEURS)
+def test_analyser_valeur(valeur, attendu):
+    resultat = analyser_valeur(valeur)
+    assert all(identiques(r, a) for r, a in zip(resultat, attendu)), resultat
+
+
+def test_variantes_en_produits_distincts():
+    produits = dict(_aplatir(base_lca_prestations))
+    assert {"Diversa", "Diversa Care", "Diversa Plus", "Diversa Premium", "Natura", "Natura Plus"} <= set(produits)
+    assert "Natura Natura Plus" not in produits
+    assert produits["Diversa Plus"]["hospitalisation"] == "20000 CHF"
+    assert produits["Natura Plus"]["medecine_alternative"] == "75% jusqu’à 6000 CHF/an"
+    # Les prestations sans variante sont reprises telles quelles
+    assert produits["Diversa Care"]["transport_sauvetage"] == "Illimité transport, 20000 CHF sauvetage"
+
+
+def test_produit_de_la_base_proche_de_lui_meme():
+    i = index_lca.produits.index("Global Niveau 3")
+    profil = {"couvert": index_lca.couvert[i], "taux": index_lca.taux[i], "plafond": index_lca.plafond[i],
+              "division": int(index_lca.division[i])}
+    (produit, distance), *_ = index_lca.proches(profil)
+    assert (produit, distance) == ("Global Niveau 3", 0.0)
+    assert np.isinf(index_lca.plafond[i, index_lca.prestations.index("medicaments")])
+
+
+def test_comparer_contrat():
+    texte = "Complémentaire. Hospitalisation en division privée. Médecine alternative 75% jusqu'à 6000 CHF par an."
+    comparaison = comparer_contrat(texte, analyser_mots_cles(texte))
+    assert comparaison["produit"] == "Natura Plus"
+    assert comparaison["manquantes"] == ["promotion de la santé"]
+    assert comparaison["en_plus"] == ["hospitalisation"]
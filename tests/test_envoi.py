@@ -0,0 +1,65 @@
+import os
+import socket
+
+from analyseur.envoi import FileEnvoi
+from bench.puits_smtp import PuitsSMTP
+
+PIECE = ("contrat.pdf", "application/pdf", b"%PDF contrat")
+
+
+def port_ferme():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def file_envoi(port, repertoire, **options):
+    return FileEnvoi("127.0.0.1", port, "archive@example.ch", None, ssl=False,
+                     repertoire_envois=str(repertoire), **options)
+
+
+def test_marqueur_ecrit_apres_envoi_reussi(tmp_path):
+    puits = PuitsSMTP().demarrer()
+    envoi = file_envoi(puits.port, tmp_path)
+    assert envoi.soumettre([PIECE]) == 1
+    assert envoi.soumettre([PIECE]) == 0
+    assert envoi.attendre(10)
+    assert puits.compteurs["messages"] == 1
+    assert len(os.listdir(tmp_path)) == 1
+    # Autre worker : le contenu déjà envoyé est ignoré
+    assert file_envoi(puits.port, tmp_path).soumettre([PIECE]) == 0
+    puits.shutdown()
+
+
+def test_echec_d_envoi_sans_marqueur(tmp_path):
+    envoi = file_envoi(port_ferme(), tmp_path)
+    assert envoi.soumettre([PIECE]) == 1
+    assert envoi.attendre(10)
+    assert not os.listdir(tmp_path)
+    assert envoi.soumettre([PIECE]) == 1
+    envoi.attendre(10)
+
+
+def test_marqueur_expire(tmp_path):
+    puits = PuitsSMTP().demarrer()
+    envoi = file_envoi(puits.port, tmp_path, ttl=0)
+    envoi.soumettre([PIECE])
+    envoi.attendre(10)
+    assert envoi.soumettre([PIECE]) == 1
+    assert envoi.attendre(10)
+    assert puits.compteurs["messages"] == 2
+    puits.shutdown()
+
+
+def test_envoi_echoue_soumis_de_nouveau_au_rerun(tmp_path):
+    # Serveur SMTP indisponible au premier passage, revenu au suivant
+    port = port_ferme()
+    envoi = file_envoi(port, tmp_path)
+    assert envoi.soumettre([PIECE]) == 1
+    assert envoi.attendre(10)
+    puits = PuitsSMTP(("127.0.0.1", port)).demarrer()
+    assert envoi.soumettre([PIECE]) == 1
+    assert envoi.attendre(10)
+    assert puits.compteurs["messages"] == 1
+    assert envoi.soumettre([PIECE]) == 0
+    puits.shutdown()
@@ -0,0 +1,74 @@
+import pickle
+from concurrent.futures import Future
+
+import fitz
+
+from analyseur import extraction, ocr
+
+
+class CacheVide:
+    def get(self, cle):
+        return None
+
+    def set(self, cle, valeur):
+        pass
+
+
+def pdf_texte(pages):
+    with fitz.open() as doc:
+        for n in range(pages):
+            doc.new_page().insert_text((72, 72), f"Page {n}. " + "Texte du contrat assez long pour la couche texte. " * 3)
+        return doc.tobytes()
+
+
+def test_page_texte_produite_des_sa_lecture(monkeypatch):
+    monkeypatch.setattr(extraction, "_cache", CacheVide())
+    monkeypatch.setattr(extraction, "cle_extraction", lambda donnees, type_fichier: "cle")
+    lues = []
+    lire = extraction.iterer_pdf
+
+    def iterer_pdf(donnees):
+        for page in lire(donnees):
+            lues.append(page[0])
+            yield page
+
+    monkeypatch.setattr(extraction, "iterer_pdf", iterer_pdf)
+    evenements = extraction.iterer_pages([(pdf_texte(5), "application/pdf")])
+    i, numero, texte = next(evenements)
+    assert (i, numero) == (0, 0) and "Page 0." in texte
+    assert lues == [0]
+    reste = list(evenements)
+    assert [numero for _, numero, _ in reste] == [1, 2, 3, 4, None]
+    assert len(reste[-1][2]) == 5
+
+
+def test_element_sans_image_rend_la_main_pendant_l_ocr(monkeypatch):
+    futures = []
+
+    def soumettre(donnees):
+        futures.append(Future())
+        return futures[-1]
+
+    monkeypatch.setattr(ocr, "_soumettre", soumettre)
+    flux = ocr.iterer_ocr(iter([b"image", None, None]), en_vol=2)
+    assert next(flux) == (None, None)
+    assert next(flux) == (None, None)
+    assert len(futures) == 1 and not futures[0].done()
+    futures[0].set_result(("texte", 0.0))
+    assert list(flux) == [(0, "texte")]
+
+
+def test_erreur_du_worker_transmissible(monkeypatch):
+    class ErreurTesseract(EnvironmentError):
+        def __init__(self):
+            super().__init__("tesseract absent")
+
+    def ocr_image(donnees, *parametres):
+        raise ErreurTesseract()
+
+    monkeypatch.setattr(ocr, "ocr_image", ocr_image)
+    try:
+        ocr._ocr_chronometre(b"image")
+    except RuntimeError as e:
+        erreur = pickle.loads(pickle.dumps(e))
+    assert str(erreur) == "ErreurTesseract: tesseract absent"
@@ -0,0 +1,29 @@
+import time
+
+from analyseur import llm
+from analyseur.ordonnanceur import ordonnanceur_llm
+from bench.client_factice import ClientFactice
+
+
+def test_flux_abandonne_n_attend_pas_les_requetes_en_cours():
+    # Trois réponses de 4 s (80 mots à 50 ms) : un rerun ne doit pas attendre leur fin
+    client = ClientFactice(latence_token=0.05, reponse=" ".join(["mot"] * 80))
+    messages = [[{"role": "user", "content": f"contrat {n}"}] for n in range(3)]
+    evenements = llm.iterer_flux(client, messages, concurrence=3)
+    while next(evenements)[1] != "delta":
+        pass
+    debut = time.perf_counter()
+    evenements.close()
+    assert time.perf_counter() - debut < 0.5
+    # Les flux s'arrêtent au morceau suivant et rendent leur place IA
+    fin = time.monotonic() + 2
+    while ordonnanceur_llm.etat()["en_cours"] and time.monotonic() < fin:
+        time.sleep(0.02)
+    assert ordonnanceur_llm.etat()["en_cours"] == 0
+
+
+def test_flux_complet():
+    client = ClientFactice(reponse="Note : 6/10")
+    messages = [[{"role": "user", "content": f"contrat {n}"}] for n in range(2)]
+    fins = {j: donnee[0] for j, evenement, donnee in llm.iterer_flux(client, messages) if evenement == "fin"}
+    assert fins == {0: "Note : 6/10", 1: "Note : 6/10"}
@@ -0,0 +1,53 @@
+import argparse
+import io
+import json
+
+import fitz
+
+from analyseur import config, extraction, lot
+
+
+class CacheVide:
+    def get(self, cle):
+        return None
+
+    def set(self, cle, valeur):
+        pass
+
+
+def pdf_texte(pages):
+    with fitz.open() as doc:
+        for n in range(pages):
+            doc.new_page().insert_text((72, 72), f"Page {n}. " + "Contrat d'assurance LAMal et complémentaire. " * 3)
+        return doc.tobytes()
+
+
+def executer(tmp_path, monkeypatch, entrees):
+    monkeypatch.setattr(config, "STOCKAGE", "")
+    monkeypatch.setattr(extraction, "_cache", CacheVide())
+    monkeypatch.setattr(extraction, "cle_extraction", lambda donnees, type_fichier: "cle")
+    manifeste = tmp_path / "m.jsonl"
+    manifeste.write_text("".join(json.dumps(entree) + "\n" for entree in entrees), encoding="utf-8")
+    options = argparse.Namespace(source=str(manifeste), sortie=str(tmp_path / "resultats.jsonl"), workers=2,
+                                 objectif=lot.OBJECTIFS[2], travail="Oui", sans_ia=True)
+    stats = lot.executer_lot(options, journal=io.StringIO())
+    with open(options.sortie, encoding="utf-8") as f:
+        resultats = {r["chemin"].rsplit("/", 1)[-1]: r for r in map(json.loads, f)}
+    return stats, resultats
+
+
+def test_chemin_absent_ecrit_une_erreur(tmp_path, monkeypatch):
+    (tmp_path / "a.pdf").write_bytes(pdf_texte(2))
+    stats, resultats = executer(tmp_path, monkeypatch, [{"chemin": "absent.pdf"}, {"chemin": "a.pdf"}])
+    assert stats["ok"] == 1 and stats["erreur"] == 1
+    assert resultats["absent.pdf"]["statut"] == "erreur"
+    assert resultats["absent.pdf"]["erreur"].startswith("FileNotFoundError")
+    assert resultats["a.pdf"]["statut"] == "ok" and resultats["a.pdf"]["pages"] == 2
+
+
+def test_fichier_trop_volumineux(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "EXTRACTION_OCTETS_MAX", 100)
+    (tmp_path / "gros.pdf").write_bytes(b"%PDF" + b"0" * 200)
+    stats, resultats = executer(tmp_path, monkeypatch, [{"chemin": "gros.pdf"}])
+    assert stats["erreur"] == 1
+    assert resultats["gros.pdf"]["erreur"].startswith("DocumentTropVolumineux")
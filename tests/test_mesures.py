@@ -0,0 +1,27 @@
+import socket
+import urllib.request
+
+from analyseur import config, mesures
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_metriques_desactivees_sans_port(monkeypatch):
+    monkeypatch.setattr(config, "METRIQUES_PORT", 0)
+    assert mesures.servir_prometheus() is None
+
+
+def test_metriques_servies_en_local_par_defaut(monkeypatch):
+    monkeypatch.setattr(mesures, "_serveur", None)
+    serveur = mesures.servir_prometheus(port=port_libre())
+    try:
+        assert serveur.server_address[0] == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{serveur.server_address[1]}/metrics", timeout=5) as reponse:
+            assert reponse.status == 200
+    finally:
+        serveur.shutdown()
+        serveur.server_close()
@@ -0,0 +1,40 @@
+from analyseur.mots_cles import (
+    DetecteurMotsCles, analyser_mots_cles, compter, detect_doublons_par_prestation, evaluer_couverture
+)
+
+
+def test_accents_et_majuscules_ignores():
+    occurrences = analyser_mots_cles("HOSPITALISATION en division privee ; Medecine Alternative ; soins à l'ÉTRANGER")
+    assert {"hospitalisation", "privée", "médecine alternative", "étranger"} <= set(occurrences)
+
+
+def test_pluriels_en_s_et_x():
+    detecteur = DetecteurMotsCles(["lunettes", "soin", "hôpital", "bijou"])
+    assert compter(detecteur.positions("Soins dentaires, bijoux et lunettes")) == {"soin": 1, "bijou": 1, "lunettes": 1}
+    assert "hôpital" not in detecteur.positions("hôpitaux")  # pluriel irrégulier : non reconnu
+
+
+def test_frontieres_de_mots():
+    occurrences = analyser_mots_cles("transports, transportable ; optiques ; ambulancier ; lcas")
+    assert compter(occurrences) == {"transport": 1, "optique": 1, "lca": 1}
+
+
+def test_mots_imbriques_tous_trouves():
+    occurrences = analyser_mots_cles("Hospitalisation en division mi-privée.")
+    assert compter(occurrences) == {"hospitalisation": 1, "mi-privée": 1, "privée": 1}
+    assert occurrences["privée"][0] > occurrences["mi-privée"][0]
+
+
+def test_espaces_internes_souples():
+    occurrences = analyser_mots_cles("Un bilan\n santé annuel et la médecine   alternative")
+    assert compter(occurrences) == {"bilan santé": 1, "médecine alternative": 1}
+
+
+def test_couverture_et_doublons():
+    contrats = [analyser_mots_cles("LAMal de base"), analyser_mots_cles("Complémentaire : lunettes et dentaire"),
+                analyser_mots_cles("Assurance dentaire et lunettes, chambre commune")]
+    assert evaluer_couverture(contrats[0])["score"] == 2
+    assert evaluer_couverture(contrats[2]) == {"has_lamal": False, "has_lca": True, "has_hospital": True, "score": 4}
+    doublons, explications = detect_doublons_par_prestation(contrats)
+    assert doublons == ["dentaire", "lunettes"]
+    assert "contrat 2 et le contrat 3" in explications[0]
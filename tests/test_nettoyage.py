@@ -0,0 +1,49 @@
+from analyseur.nettoyage import nettoyer_pages
+
+CLAUSE = "La prise en charge s'élève à 75% des frais, au maximum 1000 CHF par année civile."
+RENVOI_CGA = (
+    "Les présentes conditions particulières complètent les conditions générales d'assurance (CGA) "
+    "et les conditions complémentaires."
+)
+
+
+def test_clause_repetee_sous_plusieurs_garanties_gardee():
+    page = "".join(
+        f"Art. {n} {titre}\nPrestation {titre.lower()} reconnue. {CLAUSE}\n"
+        for n, titre in [(3, "Lunettes"), (4, "Médecine alternative"), (5, "Dentaire")]
+    )
+    pages, rapport = nettoyer_pages([page])
+    assert pages[0].count(CLAUSE) == 3
+    assert rapport["caracteres_retires"] == 0
+
+
+def test_ligne_de_couverture_repetee_sur_chaque_page_gardee():
+    pages = [f"Art. {n} Garantie {n}\n{CLAUSE}\nTexte propre à la page {n}.\n" for n in range(10)]
+    nettoyees, _ = nettoyer_pages(pages)
+    assert all(CLAUSE in page for page in nettoyees)
+
+
+def test_renvoi_aux_cga_garde_une_fois():
+    page = "".join(f"Art. {n} Garantie {n}\nTexte de l'article {n}. {RENVOI_CGA}\n" for n in range(4))
+    pages, rapport = nettoyer_pages([page])
+    assert pages[0].count(RENVOI_CGA) == 1
+    assert all(f"Texte de l'article {n}." in pages[0] for n in range(4))
+    assert rapport["caracteres_retires"] > 0
+
+
+GARANTIES = ["Lunettes", "Dentaire", "Hospitalisation", "Transport", "Étranger", "Fitness", "Check-up", "Ambulance"]
+
+
+def test_en_tete_et_numero_de_page_retires():
+    pages = [
+        f"Assurance Alpha SA - Police d'assurance maladie\nArt. {n} {garantie}\n"
+        + "".join(f"{garantie} : condition {i}\n" for i in range(8))
+        + f"Page {n + 1} sur 8\n"
+        for n, garantie in enumerate(GARANTIES)
+    ]
+    nettoyees, _ = nettoyer_pages(pages)
+    for n, (page, garantie) in enumerate(zip(nettoyees, GARANTIES)):
+        assert "Assurance Alpha SA" not in page
+        assert f"Page {n + 1}" not in page
+        assert f"Art. {n} {garantie}" in page
+        assert f"{garantie} : condition 7" in page
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+from analyseur import llm
+from analyseur.ordonnanceur import Ordonnanceur, ordonnanceur_llm
+from bench.client_factice import ClientFactice
+
+
+def attendre_tickets(ordonnanceur, nombre):
+    fin = time.monotonic() + 2
+    while ordonnanceur.etat()["en_attente"] < nombre:
+        assert time.monotonic() < fin
+        time.sleep(0.005)
+
+
+def demander(ordonnanceur, session, servies, tenir=None, **options):
+    def travail():
+        ordonnanceur.acquerir(session, **options)
+        servies.append(session)
+        if tenir is not None:
+            tenir.wait(2)
+        ordonnanceur.liberer()
+
+    thread = threading.Thread(target=travail)
+    thread.start()
+    return thread
+
+
+def test_delai_nul_ne_bloque_pas():
+    ordonnanceur = Ordonnanceur("test", 1)
+    assert ordonnanceur.acquerir("a", delai=0)
+    debut = time.monotonic()
+    assert not ordonnanceur.acquerir("b", delai=0)
+    assert time.monotonic() - debut < 0.1
+    # Le ticket refusé ne reste pas dans la file
+    assert ordonnanceur.etat() == {"capacite": 1, "en_cours": 1, "en_attente": 0, "sessions_en_attente": 0}
+    ordonnanceur.liberer()
+    assert ordonnanceur.acquerir("b", delai=0)
+
+
+def test_positions_signalees_pendant_l_attente():
+    ordonnanceur = Ordonnanceur("test", 1)
+    ordonnanceur.acquerir("a")
+    servies, positions = [], []
+    tenir = threading.Event()
+    premier = demander(ordonnanceur, "b", servies, tenir)
+    attendre_tickets(ordonnanceur, 1)
+    second = demander(ordonnanceur, "c", servies, attente=positions.append)
+    attendre_tickets(ordonnanceur, 2)
+    assert ordonnanceur.position("c") == 2
+    ordonnanceur.liberer()
+    # « b » servie et tenant la place : « c » passe en tête du tourniquet
+    fin = time.monotonic() + 2
+    while positions[-1:] != [1] and time.monotonic() < fin:
+        time.sleep(0.005)
+    tenir.set()
+    premier.join(2)
+    second.join(2)
+    assert servies == ["b", "c"]
+    assert positions == [2, 1]
+
+
+def test_tourniquet_entre_sessions():
+    # Capacité 1 : la session « lot » a trois demandes, « page » une seule arrivée après
+    ordonnanceur = Ordonnanceur("test", 1)
+    ordonnanceur.acquerir("lot")
+    servies, threads = [], []
+    for n, session in enumerate(["lot", "lot", "page"], start=1):
+        threads.append(demander(ordonnanceur, session, servies))
+        attendre_tickets(ordonnanceur, n)
+    ordonnanceur.liberer()
+    for thread in threads:
+        thread.join(2)
+    assert servies == ["lot", "page", "lot"]
+    assert ordonnanceur.etat()["en_cours"] == 0
+
+
+def test_place_liberee_sur_exception():
+    ordonnanceur = Ordonnanceur("test", 1)
+    with pytest.raises(ValueError):
+        with ordonnanceur.place("a"):
+            raise ValueError()
+    assert ordonnanceur.etat()["en_cours"] == 0
+
+
+def test_attente_abandonnee_retire_le_ticket():
+    ordonnanceur = Ordonnanceur("test", 1)
+    ordonnanceur.acquerir("a")
+
+    def interrompre(position):
+        raise KeyboardInterrupt  # ex. rerun Streamlit pendant l'attente
+
+    with pytest.raises(KeyboardInterrupt):
+        ordonnanceur.acquerir("b", attente=interrompre)
+    assert ordonnanceur.etat()["en_attente"] == 0
+    ordonnanceur.liberer()
+    assert ordonnanceur.acquerir("c", delai=0)
+
+
+def test_flux_ferme_libere_la_place_ia():
+    client = ClientFactice(reponse="une réponse de plusieurs mots")
+    flux = llm.flux_completion(client, [{"role": "user", "content": "contrat"}])
+    next(flux)
+    assert ordonnanceur_llm.etat()["en_cours"] == 1
+    flux.close()
+    assert ordonnanceur_llm.etat()["en_cours"] == 0
@@ -0,0 +1,29 @@
+import fitz
+
+from analyseur.rapport import VERSION_RAPPORT, rapport_lot
+from analyseur.stockage import Stockage
+
+COUVERTURE = {"has_lamal": True, "has_lca": True, "has_hospital": False, "score": 5}
+
+
+def texte_pdf(pdf):
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        return " ".join(" ".join(page.get_text().split()) for page in doc)
+
+
+def test_lot_avec_analyse_echouee(tmp_path):
+    base = Stockage(str(tmp_path / "analyses.sqlite3"))
+    lot_id = base.enregistrer_lot([
+        {"nom": "a.pdf", "hash_texte": "a", "couverture": COUVERTURE, "modele": "gpt-4",
+         "analyse": "### LCA\n- Lunettes 150 CHF/3 ans"},
+        {"nom": "b.pdf", "hash_texte": "b", "couverture": COUVERTURE, "modele": "gpt-4", "analyse": None},
+        {"nom": "c.pdf", "hash_texte": "c", "couverture": COUVERTURE, "modele": None, "analyse": None},
+    ], client="client-1")
+    lot = base.lot(lot_id)
+    assert [c["analyse"] for c in lot["contrats"]][1:] == [None, None]
+    texte = texte_pdf(rapport_lot(base, lot_id))
+    assert "Lunettes 150 CHF/3 ans" in texte
+    assert "Contrat 2 - b.pdf" in texte and "elle a échoué pour ce contrat" in texte
+    assert "Analyse IA non demandée" in texte
+    # Le rapport est gardé dans la base
+    assert base.rapport(lot_id, VERSION_RAPPORT) is not None
@@ -0,0 +1,53 @@
+import random
+import statistics
+
+from analyseur.similarite import TAILLE_BARDEAU, IndexSimilarite, mots, signature, similarite
+
+VOCABULAIRE = [f"mot{i}" for i in range(5000)]
+
+
+def bardeaux(texte):
+    liste = mots(texte)
+    return {" ".join(liste[i:i + TAILLE_BARDEAU]) for i in range(len(liste) - TAILLE_BARDEAU + 1)}
+
+
+def jaccard(a, b):
+    a, b = bardeaux(a), bardeaux(b)
+    return len(a & b) / len(a | b)
+
+
+def paires(nombre=60, graine=7):
+    # Textes de 2000 mots et une version dont une part variable des mots est remplacée
+    rng = random.Random(graine)
+    for _ in range(nombre):
+        texte = [rng.choice(VOCABULAIRE) for _ in range(2000)]
+        modifie = list(texte)
+        for i in rng.sample(range(len(texte)), int(len(texte) * rng.uniform(0.0, 0.25))):
+            modifie[i] = rng.choice(VOCABULAIRE)
+        yield " ".join(texte), " ".join(modifie)
+
+
+def test_estimation_proche_du_jaccard_exact():
+    erreurs = [similarite(signature(a), signature(b)) - jaccard(a, b) for a, b in paires()]
+    # 128 permutations indépendantes : écart-type théorique au plus 0,044
+    assert abs(statistics.mean(erreurs)) < 0.02
+    assert statistics.pstdev(erreurs) < 0.06
+    assert max(abs(e) for e in erreurs) < 0.15
+
+
+def test_textes_identiques_et_disjoints():
+    a, b = next(paires(1))
+    assert similarite(signature(a), signature(a)) == 1.0
+    autre = " ".join(f"autre{i}" for i in range(2000))
+    assert similarite(signature(a), signature(autre)) < 0.05
+
+
+def test_index_retrouve_une_version_proche_seulement():
+    index = IndexSimilarite(10)
+    originaux = [a for a, _ in paires(5, graine=3)]
+    for i, texte in enumerate(originaux):
+        index.ajouter(i, signature(texte), {"rang": i})
+    mots_original = originaux[2].split()
+    proche = " ".join(mots_original[:1800] + [f"neuf{i}" for i in range(200)])
+    resultats = index.chercher(signature(proche), 0.6)
+    assert [cle for _, cle, _ in resultats] == [2]